@@ -0,0 +1,164 @@
+"""Adaptive detection rate and input size control.
+
+The frame-skip interval and the 416x416 model input used to be fixed, whether
+the machine was idle or overloaded.  ``AdaptiveController`` watches measured
+inference latency (and queue depth, where there is a queue) and adjusts two
+knobs:
+
+* ``input_size`` (e.g. 320/416/640) to keep a smoothed inference latency
+  under ``target_latency_ms``;
+* ``detect_every`` (run detection on every Nth frame) so detection keeps up
+  with the frame rate or the queue drains.
+
+Both knobs use hysteresis: a step down happens only when the latency is
+clearly above target, a step up only when the *predicted* cost after the step
+is clearly below it, and every change is followed by a cool-down period.
+"""
+import threading
+import time
+from collections import deque
+
+import config
+
+
+def parse_sizes(spec):
+    """Parse '320,416,640' into a sorted tuple of ints"""
+    return tuple(sorted(int(size) for size in spec.split(',') if size.strip()))
+
+
+class AdaptiveController:
+    """Pick the model input size and detection interval from measured load"""
+
+    def __init__(self, target_latency_ms=100.0, input_sizes=(320, 416, 640), initial_size=416,
+                 max_detect_every=10, initial_detect_every=3, queue_high=2,
+                 upper_ratio=1.2, lower_ratio=0.8, smoothing=0.2, cooldown=10, enabled=True):
+        self.target_latency_ms = target_latency_ms
+        self.input_sizes = tuple(sorted(input_sizes))
+        self.max_detect_every = max(1, max_detect_every)
+        self.queue_high = queue_high
+        self.upper_ratio = upper_ratio
+        self.lower_ratio = lower_ratio
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.enabled = enabled
+
+        if initial_size in self.input_sizes:
+            self._size_index = self.input_sizes.index(initial_size)
+        else:
+            self._size_index = len(self.input_sizes) // 2
+        self.detect_every = max(1, min(initial_detect_every, self.max_detect_every))
+
+        self.latency_ms = None
+        self.queue_depth = 0
+        self.frame_interval_ms = None
+        self.samples = 0
+        self._size_changed_at = 0
+        self._rate_changed_at = 0
+        self.history = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    @property
+    def input_size(self):
+        return self.input_sizes[self._size_index]
+
+    def reachable_sizes(self):
+        """Input sizes the controller may run at (only the initial one when disabled)"""
+        return self.input_sizes if self.enabled else (self.input_size,)
+
+    def record(self, inference_ms, queue_depth=0, frame_interval_ms=None):
+        """Feed one measurement and return the (possibly updated) (input_size, detect_every)"""
+        with self._lock:
+            self.samples += 1
+            if self.latency_ms is None:
+                self.latency_ms = inference_ms
+            else:
+                self.latency_ms += self.smoothing * (inference_ms - self.latency_ms)
+            self.queue_depth = queue_depth
+            if frame_interval_ms:
+                self.frame_interval_ms = frame_interval_ms
+            if self.enabled:
+                self._adjust_size()
+                self._adjust_rate()
+            return self.input_size, self.detect_every
+
+    def _adjust_size(self):
+        if self.samples - self._size_changed_at < self.cooldown:
+            return
+        latency = self.latency_ms
+        target = self.target_latency_ms
+        if latency > target * self.upper_ratio and self._size_index > 0:
+            self._change_size(-1, f'latency {latency:.0f} ms > {target:.0f} ms')
+        elif self._size_index + 1 < len(self.input_sizes):
+            # Inference cost grows roughly with the number of input pixels
+            growth = (self.input_sizes[self._size_index + 1] / self.input_size) ** 2
+            if latency * growth < target * self.lower_ratio:
+                self._change_size(1, f'predicted {latency * growth:.0f} ms < {target:.0f} ms')
+
+    def _change_size(self, step, reason):
+        old = self.input_size
+        self._size_index += step
+        # Cost estimate follows the new input size until new samples arrive
+        self.latency_ms *= (self.input_size / old) ** 2
+        self._size_changed_at = self.samples
+        self._log('input_size', old, self.input_size, reason)
+
+    def _adjust_rate(self):
+        if self.samples - self._rate_changed_at < self.cooldown:
+            return
+        overloaded = self.queue_depth >= self.queue_high
+        underloaded = self.queue_depth == 0
+        if self.frame_interval_ms:
+            # Detection budget per run is the time between detected frames
+            budget = self.frame_interval_ms * self.detect_every
+            overloaded = overloaded or self.latency_ms > budget * self.upper_ratio
+            smaller_budget = self.frame_interval_ms * (self.detect_every - 1)
+            underloaded = underloaded and self.latency_ms < smaller_budget * self.lower_ratio
+        else:
+            underloaded = underloaded and self.latency_ms < self.target_latency_ms * self.lower_ratio
+        if overloaded and self.detect_every < self.max_detect_every:
+            self._change_rate(1, f'overloaded (latency {self.latency_ms:.0f} ms, queue {self.queue_depth})')
+        elif underloaded and self.detect_every > 1:
+            self._change_rate(-1, f'headroom (latency {self.latency_ms:.0f} ms, queue {self.queue_depth})')
+
+    def _change_rate(self, step, reason):
+        old = self.detect_every
+        self.detect_every += step
+        self._rate_changed_at = self.samples
+        self._log('detect_every', old, self.detect_every, reason)
+
+    def _log(self, knob, old, new, reason):
+        self.history.append({
+            'knob': knob,
+            'from': old,
+            'to': new,
+            'reason': reason,
+            'timestamp': time.time(),
+        })
+
+    def decisions(self):
+        """Current decisions and the measurements behind them"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'input_size': self.input_size,
+                'detect_every': self.detect_every,
+                'target_latency_ms': self.target_latency_ms,
+                'latency_ms': round(self.latency_ms, 2) if self.latency_ms is not None else None,
+                'queue_depth': self.queue_depth,
+                'frame_interval_ms': round(self.frame_interval_ms, 2) if self.frame_interval_ms else None,
+                'samples': self.samples,
+                'history': list(self.history),
+            }
+
+
+def create_controller(**overrides):
+    """Build a controller from the YOLO_ADAPTIVE_* settings in config.py"""
+    settings = {
+        'target_latency_ms': config.ADAPTIVE_TARGET_LATENCY_MS,
+        'input_sizes': parse_sizes(config.ADAPTIVE_INPUT_SIZES),
+        'max_detect_every': config.ADAPTIVE_MAX_DETECT_EVERY,
+        'cooldown': config.ADAPTIVE_COOLDOWN,
+        'enabled': config.ADAPTIVE_CONTROL,
+    }
+    settings.update(overrides)
+    return AdaptiveController(**settings)
@@ -1,73 +1,262 @@
-from flask import Flask, request, jsonify, send_from_directory
+# Imported first so startup timings start before the heavier imports below
+from model_manager import ModelManager, ModelNotReady, parse_shapes
+from flask import Flask, Request, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
 import os
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
-from ultralytics import YOLO
-from PIL import Image
 import base64
 import io
 import json
+import multiprocessing
+
+import codec
+import config
+from async_writer import AsyncFileWriter
+from backends import configured_model_name, load_configured_backend
+from job_queue import JobQueue
+from metrics import create_registry
+from postprocess import Detections
+from result_cache import ResultCache, make_cache_key
+from tiling import TiledDetector
+
+class InMemoryRequest(Request):
+    """Request that keeps uploaded files in memory instead of spooling them to temp files"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Bounded by MAX_CONTENT_LENGTH
+        return io.BytesIO()
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 CORS(app)
 
-# Initialize YOLO model
-model = YOLO('yolov8n.pt')  # Using nano version for faster inference
+# YOLO model loads and warms up in the background so the server can bind immediately.
+# Backend and weights (nano by default) come from config.
+MODEL_NAME = configured_model_name()
+model_manager = ModelManager(
+    load_configured_backend,
+    warmup_shapes=parse_shapes(config.MODEL_WARMUP_SHAPES),
+    warmup_runs=config.MODEL_WARMUP_RUNS,
+)
+if config.MODEL_PRELOAD and multiprocessing.current_process().name == 'MainProcess':
+    # Job worker processes re-import this module and load their own model
+    model_manager.start()
+
+def get_model():
+    """Return the loaded model, raising ModelNotReady while it is still loading"""
+    # Without preloading, the first request starts the load (start() is idempotent)
+    model_manager.start()
+    return model_manager.get(timeout=config.MODEL_READY_WAIT_SECONDS)
+
+def model_not_ready_response(error):
+    """503 response telling the client which loading phase the model is in"""
+    return jsonify({'error': str(error), 'phase': error.phase}), 503
 
-# Create uploads directory
+# Optional persistence of uploads and results, written off the request path
 UPLOAD_FOLDER = 'uploads'
 RESULTS_FOLDER = 'results'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(RESULTS_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['RESULTS_FOLDER'] = RESULTS_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-def process_image(image_path):
-    """Process image with YOLO model and return detection results"""
+persist_writer = AsyncFileWriter(config.PERSIST_MAX_PENDING) if config.PERSIST_FILES else None
+
+# Cache of finished responses keyed on image bytes, model and thresholds
+result_cache = None
+if config.RESULT_CACHE_ENABLED:
+    result_cache = ResultCache(
+        memory_entries=config.RESULT_CACHE_MEMORY_ENTRIES,
+        memory_bytes=config.RESULT_CACHE_MEMORY_BYTES,
+        disk_directory=config.RESULT_CACHE_DIR,
+        disk_bytes=config.RESULT_CACHE_DISK_BYTES,
+    )
+
+def cache_result(cache_key, payload):
+    """Store a response in the result cache; a failed write only costs the cache entry"""
     try:
+        result_cache.put(cache_key, payload)
+    except OSError as e:
+        print(f"⚠️ Could not write result cache entry: {e}")
+
+def cache_job_result(job):
+    """Store a finished job's response in the result cache"""
+    if result_cache is not None and job.cache_key is not None:
+        cache_result(job.cache_key, json.dumps(job.result).encode('utf-8'))
+
+# Worker processes for asynchronous jobs, spawned on the first submission
+job_queue = JobQueue(
+    config.JOB_WORKERS,
+    load_configured_backend,
+    conf=config.DETECTION_CONF,
+    iou=config.DETECTION_IOU,
+    max_retained=config.JOB_RETENTION,
+    on_complete=cache_job_result,
+)
+
+# Per-stage latency histograms, error counts and queue gauges served on /metrics
+metrics = create_registry()
+metrics.gauge('job_queue_depth', 'Jobs waiting for a worker process', lambda: job_queue.stats()['queue_depth'])
+if persist_writer is not None:
+    metrics.gauge('persist_queue_depth', 'Files waiting to be written', lambda: persist_writer.stats()['pending'])
+
+def extract_detections(result, names):
+    """Convert a YOLO result into a list of detection dicts"""
+    return Detections.from_result(result, names).to_list()
+
+TILING_MODES = ('off', 'auto', 'on')
+
+# Tiled results are drawn with cached label sprites rather than result.plot()
+tile_annotator = codec.Annotator()
+
+def parse_tiling(value):
+    """Validate a tiling mode from a form field or config"""
+    mode = (value or 'off').lower()
+    if mode not in TILING_MODES:
+        raise ValueError(f"tiling must be one of: {', '.join(TILING_MODES)}")
+    return mode
+
+def tiling_cache_params(tiling):
+    """Extra result cache key parameters for a tiling mode (none when tiling is off)"""
+    if tiling == 'off':
+        return {}
+    return {
+        'tiling': tiling,
+        'tile_size': config.TILE_SIZE,
+        'tile_overlap': config.TILE_OVERLAP,
+        'tile_merge': (config.TILE_MERGE_METRIC, config.TILE_MERGE_THRESHOLD),
+        'tile_full_pass': config.TILE_FULL_IMAGE_PASS,
+        'tile_max_pixels': config.TILE_MAX_IMAGE_PIXELS,
+    }
+
+# 'list' is the usual list of detection dicts, 'columns' one list per field
+DETECTION_FORMATS = ('list', 'columns')
+
+def parse_detection_format(value):
+    """Validate the detections format requested from /api/detect"""
+    detection_format = (value or 'list').lower()
+    if detection_format not in DETECTION_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(DETECTION_FORMATS)}")
+    return detection_format
+
+def serialize_detections(detections, detection_format):
+    """Detections object in the requested response shape"""
+    if detection_format == 'columns':
+        return detections.to_columns()
+    return detections.to_list()
+
+def wants_tiles(detector, image, tiling):
+    """Whether an image should go through the tiled path"""
+    return tiling == 'on' or (tiling == 'auto' and detector.wants_tiles(image))
+
+def decode_image(image_bytes, max_pixels=0):
+    """Decode uploaded image bytes into a BGR array without touching disk.
+    
+    Returns (image, scale).  With max_pixels, larger images are decoded at
+    1/2, 1/4 or 1/8 scale and scale maps boxes back to the original size.
+    """
+    with metrics.time('decode'):
+        if max_pixels:
+            return codec.decode_image(image_bytes, max_pixels=max_pixels)
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError('Could not decode image')
+    return image, 1
+
+def process_image_tiled(detector, image, scale=1):
+    """Detect over overlapping tiles of a large image; draws onto image in place"""
+    started = time.perf_counter()
+    detections, tiles = detector.detect(image)
+    model_manager.record_inference((time.perf_counter() - started) * 1000)
+    
+    with metrics.time('draw'):
+        tile_annotator.draw(image, detections.to_list())
+    with metrics.time('encode'):
+        result_image = codec.encode_jpeg(image)
+    
+    detections = detections.rescale(scale, scale)
+    return {
+        'success': True,
+        'detections': detections,
+        'result_image': result_image,
+        'total_detections': len(detections),
+        'tiles': tiles
+    }
+
+def process_image(image, tiling='off', scale=1):
+    """Process image (BGR array or file path) with YOLO model and return detection results.
+    
+    'detections' in the result is a postprocess.Detections object.
+    """
+    try:
+        model = get_model()
+        
+        if tiling != 'off':
+            detector = TiledDetector.from_config(model, metrics)
+            if wants_tiles(detector, image, tiling):
+                return process_image_tiled(detector, image, scale)
+        
         # Run YOLO detection
-        results = model(image_path)
+        started = time.perf_counter()
+        results = model(image, conf=config.DETECTION_CONF, iou=config.DETECTION_IOU)
+        inference_s = time.perf_counter() - started
+        model_manager.record_inference(inference_s * 1000)
+        metrics.observe('inference', inference_s)
         
         # Get the first result
         result = results[0]
         
         # Extract detection data
-        detections = []
-        if result.boxes is not None:
-            boxes = result.boxes.xyxy.cpu().numpy()  # Get bounding boxes
-            confidences = result.boxes.conf.cpu().numpy()  # Get confidences
-            class_ids = result.boxes.cls.cpu().numpy()  # Get class IDs
-            
-            for i in range(len(boxes)):
-                detection = {
-                    'bbox': boxes[i].tolist(),
-                    'confidence': float(confidences[i]),
-                    'class_id': int(class_ids[i]),
-                    'class_name': model.names[int(class_ids[i])]
-                }
-                detections.append(detection)
+        with metrics.time('postprocess'):
+            detections = Detections.from_result(result, model.names).rescale(scale, scale)
         
-        # Save annotated image
-        annotated_img = result.plot()
-        result_path = os.path.join(app.config['RESULTS_FOLDER'], f'result_{os.path.basename(image_path)}')
-        cv2.imwrite(result_path, annotated_img)
+        # Encode annotated image in memory
+        with metrics.time('draw'):
+            annotated_img = result.plot()
+        with metrics.time('encode'):
+            ok, buffer = cv2.imencode('.jpg', annotated_img)
+        if not ok:
+            raise ValueError('Could not encode result image')
         
         return {
             'success': True,
             'detections': detections,
-            'result_image': result_path,
+            'result_image': buffer.tobytes(),
             'total_detections': len(detections)
         }
         
     except Exception as e:
+        metrics.error('detection')
         return {
             'success': False,
             'error': str(e)
         }
 
+@app.before_request
+def track_request_start():
+    """Count the request as in flight"""
+    metrics.in_flight.inc()
+
+@app.teardown_request
+def track_request_end(error=None):
+    """Request finished (or failed with an unhandled exception)"""
+    metrics.in_flight.dec()
+    if error is not None:
+        metrics.error('unhandled')
+
+@app.after_request
+def count_error_responses(response):
+    """Count 4xx/5xx responses by status code"""
+    if response.status_code >= 400:
+        metrics.error(f'http_{response.status_code}')
+    return response
+
 @app.route('/')
 def serve_frontend():
     """Serve the React frontend"""
@@ -89,36 +278,375 @@ def detect_objects():
         if file.filename == '':
             return jsonify({'error': 'No image file selected'}), 400
         
+        try:
+            tiling = parse_tiling(request.form.get('tiling', config.TILING))
+            detection_format = parse_detection_format(request.form.get('format') or request.args.get('format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         if file:
-            # Save uploaded file
-            filename = file.filename
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            image_bytes = file.read()
             
-            # Process image
-            result = process_image(file_path)
+            # Serve repeated images straight from the cache
+            cache_key = None
+            if result_cache is not None:
+                cache_key = make_cache_key(image_bytes, MODEL_NAME,
+                                           conf=config.DETECTION_CONF, iou=config.DETECTION_IOU,
+                                           **tiling_cache_params(tiling),
+                                           **({'format': detection_format} if detection_format != 'list' else {}))
+                cached = result_cache.get(cache_key)
+                if cached is not None:
+                    return app.response_class(cached, mimetype='application/json')
+            
+            # Cache misses need the model
+            get_model()
+            
+            # Decode and process the image entirely in memory; tiled mode caps
+            # the decoded size so huge uploads cannot exhaust memory
+            max_pixels = config.TILE_MAX_IMAGE_PIXELS if tiling != 'off' else 0
+            try:
+                image, scale = decode_image(image_bytes, max_pixels)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            result = process_image(image, tiling, scale)
             
             if result['success']:
+                if persist_writer is not None:
+                    filename = secure_filename(file.filename) or 'upload'
+                    persist_writer.submit(os.path.join(app.config['UPLOAD_FOLDER'], filename), image_bytes)
+                    persist_writer.submit(os.path.join(app.config['RESULTS_FOLDER'], f'result_{os.path.splitext(filename)[0]}.jpg'),
+                                          result['result_image'])
+                
                 # Convert result image to base64 for frontend
-                with open(result['result_image'], 'rb') as img_file:
-                    img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
+                with metrics.time('serialize'):
+                    img_base64 = base64.b64encode(result['result_image']).decode('utf-8')
+                    
+                    response = {
+                        'success': True,
+                        'detections': serialize_detections(result['detections'], detection_format),
+                        'result_image': f"data:image/jpeg;base64,{img_base64}",
+                        'total_detections': result['total_detections']
+                    }
+                    if 'tiles' in result:
+                        response['tiles'] = result['tiles']
+                    payload = json.dumps(response).encode('utf-8')
+                if cache_key is not None:
+                    cache_result(cache_key, payload)
                 
-                return jsonify({
-                    'success': True,
-                    'detections': result['detections'],
-                    'result_image': f"data:image/jpeg;base64,{img_base64}",
-                    'total_detections': result['total_detections']
-                })
+                return app.response_class(payload, mimetype='application/json')
             else:
                 return jsonify({'error': result['error']}), 500
                 
+    except ModelNotReady as e:
+        return model_not_ready_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+def read_archive_entry(archive, info, max_bytes):
+    """Bytes of a zip entry, or None when it is (or inflates to) more than max_bytes"""
+    if info.file_size > max_bytes:
+        return None
+    # The declared size can lie, so never inflate more than one byte past the limit
+    with archive.open(info) as entry:
+        data = entry.read(max_bytes + 1)
+    return data if len(data) <= max_bytes else None
+
+def iter_batch_sources(files, max_entry_bytes):
+    """Yield (name, bytes) for every uploaded image, expanding zip archives lazily.
+    
+    Archive entries larger than max_entry_bytes are yielded with None instead of their bytes.
+    """
+    for file in files:
+        if not file or file.filename == '':
+            continue
+        if file.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(file.stream) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    yield info.filename, read_archive_entry(archive, info, max_entry_bytes)
+        else:
+            yield file.filename, file.read()
+
+def decode_upload(name, image_bytes, max_pixels=0):
+    """Decode image bytes on a worker thread, timing the decode.
+    
+    Returns (name, frame, decode_ms, scale); frame is None when decoding fails.
+    """
+    started = time.perf_counter()
+    scale = 1
+    if max_pixels:
+        try:
+            frame, scale = codec.decode_image(image_bytes, max_pixels=max_pixels)
+        except ValueError:
+            frame = None
+    else:
+        frame = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    decode_ms = (time.perf_counter() - started) * 1000
+    metrics.observe('decode', decode_ms / 1000)
+    return name, frame, decode_ms, scale
+
+def encode_record_image(frame):
+    """Annotated frame as a base64 data URL for NDJSON records"""
+    with metrics.time('encode'):
+        ok, buffer = cv2.imencode('.jpg', frame)
+    if not ok:
+        return None
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer).decode('utf-8')
+
+def run_detection_batch(model, batch, include_image):
+    """Run one batched forward pass and build a result record per image"""
+    records = [None] * len(batch)
+    frames = []
+    for index, (name, frame, decode_ms, scale) in enumerate(batch):
+        if frame is None:
+            records[index] = {'filename': name, 'success': False, 'error': 'Could not decode image'}
+        else:
+            frames.append((index, name, frame, decode_ms, scale))
+    
+    if frames:
+        started = time.perf_counter()
+        results = model([frame for _, _, frame, _, _ in frames], conf=config.DETECTION_CONF,
+                        iou=config.DETECTION_IOU, verbose=False)
+        batch_ms = (time.perf_counter() - started) * 1000
+        model_manager.record_inference(batch_ms)
+        metrics.observe('inference', batch_ms / 1000)
+        
+        for (index, name, frame, decode_ms, scale), result in zip(frames, results):
+            with metrics.time('postprocess'):
+                detections = codec.scale_detections(extract_detections(result, model.names), scale)
+            record = {
+                'filename': name,
+                'success': True,
+                'detections': detections,
+                'total_detections': len(detections),
+                'width': frame.shape[1] * scale,
+                'height': frame.shape[0] * scale,
+                'timings_ms': {
+                    'decode': round(decode_ms, 3),
+                    'inference': round(batch_ms / len(frames), 3),
+                    'batch_inference': round(batch_ms, 3),
+                },
+                'batch_size': len(frames)
+            }
+            if include_image:
+                with metrics.time('draw'):
+                    annotated_img = result.plot()
+                result_image = encode_record_image(annotated_img)
+                if result_image is not None:
+                    record['result_image'] = result_image
+            records[index] = record
+    return records
+
+def run_tiled_record(detector, name, frame, decode_ms, scale, include_image):
+    """Tiled detection of one large image from a batch upload"""
+    started = time.perf_counter()
+    detections, tiles = detector.detect(frame)
+    tiled_ms = (time.perf_counter() - started) * 1000
+    model_manager.record_inference(tiled_ms)
+    detections = detections.to_list()
+    record = {
+        'filename': name,
+        'success': True,
+        'detections': codec.scale_detections(detections, scale),
+        'total_detections': len(detections),
+        'width': frame.shape[1] * scale,
+        'height': frame.shape[0] * scale,
+        'timings_ms': {
+            'decode': round(decode_ms, 3),
+            'inference': round(tiled_ms, 3),
+        },
+        'tiles': tiles
+    }
+    if include_image:
+        with metrics.time('draw'):
+            tile_annotator.draw(frame, detections)
+        result_image = encode_record_image(frame)
+        if result_image is not None:
+            record['result_image'] = result_image
+    return record
+
+def run_tiled_batch(model, detector, tiling, batch, include_image):
+    """Tile the large images of a batch one by one and run the rest as one batch"""
+    records = [None] * len(batch)
+    regular = []
+    for index, (name, frame, decode_ms, scale) in enumerate(batch):
+        if frame is not None and wants_tiles(detector, frame, tiling):
+            records[index] = run_tiled_record(detector, name, frame, decode_ms, scale, include_image)
+        else:
+            regular.append(index)
+    for index, record in zip(regular, run_detection_batch(model, [batch[i] for i in regular], include_image)):
+        records[index] = record
+    return records
+
+def generate_batch_results(model, files, batch_size, include_image, tiling='off'):
+    """Decode on a thread pool, infer in batches and yield one NDJSON line per image"""
+    started = time.perf_counter()
+    succeeded = 0
+    failed = 0
+    # Bound the number of decoded frames held in memory at once
+    max_pending = batch_size * 2
+    pending = deque()
+    
+    # Tiled mode accepts much larger images, so also bound the decoded pixels
+    # (estimated from the image headers) waiting to be processed
+    detector = None
+    max_pixels = 0
+    if tiling != 'off':
+        detector = TiledDetector.from_config(model, metrics)
+        max_pixels = config.TILE_MAX_IMAGE_PIXELS
+    pending_pixels = 0
+    
+    def drain(count):
+        nonlocal succeeded, failed, pending_pixels
+        batch = []
+        for _ in range(min(count, len(pending))):
+            future, pixels = pending.popleft()
+            pending_pixels -= pixels
+            batch.append(future.result())
+        if detector is not None:
+            records = run_tiled_batch(model, detector, tiling, batch, include_image)
+        else:
+            records = run_detection_batch(model, batch, include_image)
+        for record in records:
+            if record['success']:
+                succeeded += 1
+            else:
+                failed += 1
+                metrics.error('decode')
+            with metrics.time('serialize'):
+                line = json.dumps(record) + '\n'
+            yield line
+    
+    with ThreadPoolExecutor(max_workers=config.BATCH_DECODE_WORKERS) as executor:
+        for name, image_bytes in iter_batch_sources(files, config.BATCH_MAX_ENTRY_BYTES):
+            if image_bytes is None:
+                failed += 1
+                metrics.error('decode')
+                yield json.dumps({
+                    'filename': name,
+                    'success': False,
+                    'error': f'Archive entry larger than {config.BATCH_MAX_ENTRY_BYTES} bytes'
+                }) + '\n'
+                continue
+            pixels = 0
+            if max_pixels:
+                size = codec.image_size(image_bytes)
+                pixels = min(size[0] * size[1], max_pixels) if size else 0
+            pending.append((executor.submit(decode_upload, name, image_bytes, max_pixels), pixels))
+            pending_pixels += pixels
+            if len(pending) >= max_pending or (max_pixels and pending_pixels >= 2 * max_pixels):
+                yield from drain(batch_size)
+        while pending:
+            yield from drain(batch_size)
+    
+    total_ms = (time.perf_counter() - started) * 1000
+    yield json.dumps({
+        'summary': True,
+        'total_images': succeeded + failed,
+        'succeeded': succeeded,
+        'failed': failed,
+        'total_ms': round(total_ms, 3),
+        'images_per_second': round((succeeded + failed) / (total_ms / 1000), 3) if total_ms else 0.0
+    }) + '\n'
+
+@app.route('/api/detect/batch', methods=['POST'])
+def detect_batch():
+    """Detect objects in many images (or zip archives), streaming NDJSON results"""
+    files = request.files.getlist('images') + request.files.getlist('archive')
+    if not files:
+        return jsonify({'error': 'No images provided'}), 400
+    
+    try:
+        batch_size = max(1, int(request.form.get('batch_size', config.BATCH_DETECT_SIZE)))
+    except ValueError:
+        return jsonify({'error': 'batch_size must be an integer'}), 400
+    include_image = request.form.get('include_image', 'false').lower() in ('1', 'true', 'yes')
+    try:
+        tiling = parse_tiling(request.form.get('tiling', config.TILING))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        model = get_model()
+    except ModelNotReady as e:
+        return model_not_ready_response(e)
+    
+    return app.response_class(
+        stream_with_context(generate_batch_results(model, files, batch_size, include_image, tiling)),
+        mimetype='application/x-ndjson'
+    )
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue an image for detection on the worker pool and return a job id"""
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image file provided'}), 400
+    
+    file = request.files['image']
+    if file.filename == '':
+        return jsonify({'error': 'No image file selected'}), 400
+    
+    try:
+        image_bytes = file.read()
+        
+        cache_key = None
+        if result_cache is not None:
+            cache_key = make_cache_key(image_bytes, MODEL_NAME,
+                                       conf=config.DETECTION_CONF, iou=config.DETECTION_IOU)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                job = job_queue.add_completed(json.loads(cached), cache_key)
+                return jsonify(job.to_dict()), 202
+        
+        job = job_queue.submit(image_bytes, cache_key)
+        return jsonify(job.to_dict()), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a job; pass ?wait=<seconds> to long-poll until it finishes"""
+    try:
+        wait = min(float(request.args.get('wait', 0)), config.JOB_MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    
+    job = job_queue.wait(job_id, wait)
+    if job is None:
+        return jsonify({'error': 'Unknown job id'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def job_stats():
+    """Queue depth, worker utilization and job latency"""
+    return jsonify(job_queue.stats())
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'model': 'YOLOv8'})
+    """Health check endpoint reporting model readiness"""
+    readiness = model_manager.status()
+    if readiness['ready']:
+        return jsonify({'status': 'healthy', 'model': 'YOLOv8', 'readiness': readiness})
+    status = 'unhealthy' if readiness['phase'] == 'failed' else 'starting'
+    return jsonify({'status': status, 'model': 'YOLOv8', 'readiness': readiness}), 503
+
+@app.route('/metrics', methods=['GET'])
+def export_metrics():
+    """Per-stage latency histograms and gauges in Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled (YOLO_METRICS=false)'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Result cache hit/miss/eviction counters"""
+    if result_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **result_cache.stats()})
 
 if __name__ == '__main__':
+    model_manager.mark_listening()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,50 @@
+"""Background file writer that keeps disk I/O off the request path.
+
+Writes are queued and performed by a single daemon thread.  The queue is
+bounded: when the disk cannot keep up, new writes are dropped (and counted)
+instead of blocking requests or growing memory.
+"""
+import os
+import queue
+import threading
+
+
+class AsyncFileWriter:
+    """Write byte blobs to files on a background thread"""
+
+    def __init__(self, max_pending=64):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name='async-file-writer', daemon=True)
+        self._thread.start()
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def submit(self, path, data):
+        """Queue data to be written to path; return False if the write was dropped"""
+        try:
+            self._queue.put_nowait((path, data))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            path, data = self._queue.get()
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                self.written += 1
+            except OSError as e:
+                self.errors += 1
+                print(f"⚠️ Failed to persist {path}: {e}")
+
+    def stats(self):
+        return {
+            'pending': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors,
+        }
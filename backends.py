@@ -0,0 +1,260 @@
+"""Pluggable inference backends for the YOLO model.
+
+The PyTorch weights can be run directly or exported once to ONNX Runtime or
+OpenVINO, which are usually considerably faster on CPU-only machines.
+Exported models are cached under ``MODEL_CACHE_DIR`` keyed by a hash of the
+weights file, the input size, the backend and whether INT8 quantization was
+applied, so later runs start straight from the cached export.
+
+Several processes (the server, job workers, inference pool workers) may load
+the same model at once on a first run.  Exports are serialized with a file
+lock in the cache directory and built in a private temporary directory, then
+moved into place with ``os.replace``, so every loader either exports or waits
+for the export and then uses it.
+
+INT8 models are calibrated on images from a local folder.  Every backend is
+loaded through ultralytics, so callers get the same ``Results`` objects (and
+``names``) whatever the backend.
+"""
+import contextlib
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+CALIBRATION_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+class DetectionBackend:
+    """Callable wrapper around a YOLO model in any of the supported formats"""
+
+    def __init__(self, model, backend, weights, imgsz, int8=False, path=None):
+        self.model = model
+        self.backend = backend
+        self.weights = weights
+        self.imgsz = imgsz
+        self.int8 = int8
+        self.path = path or weights
+
+    @property
+    def names(self):
+        return self.model.names
+
+    @property
+    def name(self):
+        """Identifier used in cache keys and status reports"""
+        return model_name(self.backend, self.weights, self.imgsz, self.int8)
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault('imgsz', self.imgsz)
+        return self.model(source, **kwargs)
+
+    def describe(self):
+        return {
+            'backend': self.backend,
+            'weights': self.weights,
+            'imgsz': self.imgsz,
+            'int8': self.int8,
+            'path': self.path,
+        }
+
+
+def model_name(backend, weights, imgsz, int8=False):
+    """Identifier for a weights/backend/input-size combination"""
+    suffix = '-int8' if int8 else ''
+    return f'{os.path.basename(weights)}:{backend}{suffix}:{imgsz}'
+
+
+def configured_model_name():
+    """Identifier of the model selected in config, available before it is loaded"""
+    return model_name(config.MODEL_BACKEND, config.MODEL_WEIGHTS, config.MODEL_IMGSZ, config.MODEL_INT8)
+
+
+def weights_hash(path, length=16):
+    """Short SHA-256 of a weights file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def _ensure_weights(weights):
+    """Return a local path to the weights, letting ultralytics download them if needed"""
+    if os.path.exists(weights):
+        return weights
+    from ultralytics import YOLO
+    model = YOLO(weights)
+    return getattr(model, 'ckpt_path', None) or weights
+
+
+def cached_export_path(weights, backend, imgsz, int8, cache_dir):
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    key = f'{stem}-{weights_hash(weights)}-{imgsz}-{backend}{"-int8" if int8 else ""}'
+    if backend == 'onnx':
+        return os.path.join(cache_dir, key + '.onnx')
+    return os.path.join(cache_dir, key + '_openvino_model')
+
+
+def calibration_images(calibration_dir, imgsz, limit):
+    """Yield preprocessed NCHW float32 calibration tensors from a folder of images"""
+    import cv2
+    import numpy as np
+
+    paths = sorted(
+        path for path in glob.glob(os.path.join(calibration_dir, '**', '*'), recursive=True)
+        if path.lower().endswith(CALIBRATION_EXTENSIONS)
+    )[:limit]
+    if not paths:
+        raise RuntimeError(f'No calibration images found in {calibration_dir}')
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        image = cv2.resize(image, (imgsz, imgsz))
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        yield np.ascontiguousarray(image.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def _quantize_onnx(source, target, calibration_dir, imgsz, limit):
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._images = calibration_images(calibration_dir, imgsz, limit)
+
+        def get_next(self):
+            image = next(self._images, None)
+            return None if image is None else {'images': image}
+
+    quantize_static(source, target, _Reader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+    # Carry over the ultralytics metadata (class names, stride, imgsz)
+    original = onnx.load(source)
+    quantized = onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(original.metadata_props)
+    onnx.save(quantized, target)
+
+
+def _quantize_openvino(source_dir, target_dir, calibration_dir, imgsz, limit):
+    import nncf
+    from openvino.runtime import Core, serialize
+
+    xml_path = glob.glob(os.path.join(source_dir, '*.xml'))[0]
+    ov_model = Core().read_model(xml_path)
+    dataset = nncf.Dataset(list(calibration_images(calibration_dir, imgsz, limit)))
+    quantized = nncf.quantize(ov_model, dataset, preset=nncf.QuantizationPreset.MIXED)
+
+    shutil.copytree(source_dir, target_dir)
+    serialize(quantized, os.path.join(target_dir, os.path.basename(xml_path)))
+
+
+@contextlib.contextmanager
+def _export_lock(cache_dir):
+    """Exclusive lock across processes on the export cache directory"""
+    with open(os.path.join(cache_dir, '.export.lock'), 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    # LK_LOCK gives up after about 10 seconds; exports take longer
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def export_model(weights, backend, imgsz, int8=False, calibration_dir=None,
+                 cache_dir='model_cache', calibration_limit=100):
+    """Export weights to backend format (once) and return the cached model path"""
+    if backend not in ('onnx', 'openvino'):
+        raise ValueError(f'Cannot export to backend {backend!r}')
+    weights = _ensure_weights(weights)
+    os.makedirs(cache_dir, exist_ok=True)
+    target = cached_export_path(weights, backend, imgsz, int8, cache_dir)
+    if os.path.exists(target):
+        return target
+
+    source = None
+    if int8:
+        if not calibration_dir:
+            raise RuntimeError('INT8 quantization needs a calibration image folder (YOLO_CALIBRATION_DIR)')
+        # Takes the lock itself, so it must run before the lock is held here
+        source = export_model(weights, backend, imgsz, False, None, cache_dir)
+
+    with _export_lock(cache_dir):
+        # Another process may have finished this export while we waited for the lock
+        if os.path.exists(target):
+            return target
+        work_dir = tempfile.mkdtemp(prefix='export-', dir=cache_dir)
+        try:
+            staged = os.path.join(work_dir, os.path.basename(target))
+            if int8:
+                print(f"⚙️ Quantizing {os.path.basename(source)} to INT8 using {calibration_dir}")
+                if backend == 'onnx':
+                    _quantize_onnx(source, staged, calibration_dir, imgsz, calibration_limit)
+                else:
+                    _quantize_openvino(source, staged, calibration_dir, imgsz, calibration_limit)
+            else:
+                from ultralytics import YOLO
+                print(f"⚙️ Exporting {os.path.basename(weights)} to {backend} at {imgsz}px (first run only)")
+                # ultralytics writes the export next to the weights, so export a private copy
+                local_weights = os.path.join(work_dir, os.path.basename(weights))
+                shutil.copy2(weights, local_weights)
+                # Dynamic axes so the batching paths can send several frames per call
+                exported = YOLO(local_weights).export(format=backend, imgsz=imgsz, dynamic=True)
+                os.replace(str(exported), staged)
+            os.replace(staged, target)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return target
+
+
+def load_backend(backend='pytorch', weights='yolov8n.pt', imgsz=640, int8=False,
+                 calibration_dir=None, cache_dir='model_cache', calibration_limit=100):
+    """Load the model for the requested backend, exporting it first if necessary"""
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown backend {backend!r}; choose one of {", ".join(BACKENDS)}')
+    from ultralytics import YOLO
+
+    if backend == 'pytorch':
+        return DetectionBackend(YOLO(weights), backend, weights, imgsz)
+
+    path = export_model(weights, backend, imgsz, int8, calibration_dir, cache_dir, calibration_limit)
+    return DetectionBackend(YOLO(path, task='detect'), backend, weights, imgsz, int8, path)
+
+
+def load_configured_backend():
+    """Load the backend selected in config.py / the environment"""
+    return load_backend(
+        backend=config.MODEL_BACKEND,
+        weights=config.MODEL_WEIGHTS,
+        imgsz=config.MODEL_IMGSZ,
+        int8=config.MODEL_INT8,
+        calibration_dir=config.MODEL_CALIBRATION_DIR or None,
+        cache_dir=config.MODEL_CACHE_DIR,
+        calibration_limit=config.MODEL_CALIBRATION_IMAGES,
+    )
@@ -0,0 +1,98 @@
+"""Micro-benchmark: decode + annotate + encode, old path vs codec.py.
+
+The old path decodes at full size, copies the frame and draws every label
+with getTextSize/putText, then encodes.  The new path decodes at reduced
+size when the frame is far wider than YOLO_DECODE_MAX_WIDTH, draws in place
+with cached label sprites and encodes directly (through libjpeg-turbo when
+PyTurboJPEG is installed).
+
+    python benchmarks/bench_codec.py
+    python benchmarks/bench_codec.py --sizes 1280x720 3840x2160 --boxes 10 50 --max-width 960
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import codec  # noqa: E402
+from run_benchmarks import NAMES, make_detections, make_frame  # noqa: E402
+
+
+def legacy_draw(frame, detection):
+    """The per-box drawing web_app used before codec.Annotator"""
+    x1, y1, x2, y2 = map(int, detection['bbox'])
+    x1 = max(0, min(x1, frame.shape[1]))
+    y1 = max(0, min(y1, frame.shape[0]))
+    x2 = max(0, min(x2, frame.shape[1]))
+    y2 = max(0, min(y2, frame.shape[0]))
+    color = (0, 255, 0)
+    cv2.rectangle(frame, (x1, y1), (x2, y2), color, max(2, int(4 * detection['confidence'])))
+    label = f"{detection['class_name']}: {detection['confidence']:.2f}"
+    (text_width, text_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
+    cv2.rectangle(frame, (x1, y1 - text_height - 10), (x1 + text_width, y1), color, -1)
+    cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+    return frame
+
+
+def legacy_path(jpeg, detections, quality):
+    frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    annotated = frame.copy()
+    for detection in detections:
+        annotated = legacy_draw(annotated, detection)
+    ok, buffer = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+def codec_path(jpeg, detections, quality, max_width, annotator):
+    frame, scale = codec.decode_image(jpeg, max_width=max_width)
+    if scale != 1:
+        detections = codec.scale_detections(detections, 1 / scale)
+    annotator.draw(frame, detections)
+    return codec.encode_jpeg(frame, quality)
+
+
+def timed(fn, iterations):
+    fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return np.percentile(samples, 50) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['640x480', '1280x720', '1920x1080', '3840x2160'])
+    parser.add_argument('--boxes', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--quality', type=int, default=85)
+    parser.add_argument('--max-width', type=int, default=1280, help='Reduced-decode target width (0 disables)')
+    parser.add_argument('--iterations', type=int, default=30)
+    args = parser.parse_args()
+
+    annotator = codec.Annotator()
+    annotator.preload(NAMES)
+    print(f"JPEG backend: {codec.backend()}, reduced decode above {args.max_width * 2 or '-'} px wide\n")
+    print(f"{'frame':<11} {'boxes':>5} {'old ms':>9} {'new ms':>9} {'speedup':>8} {'decoded':>11}")
+    for size in args.sizes:
+        width, height = map(int, size.split('x'))
+        ok, jpeg = cv2.imencode('.jpg', make_frame(width, height), [cv2.IMWRITE_JPEG_QUALITY, 80])
+        jpeg = jpeg.tobytes()
+        decoded = codec.decode_image(jpeg, max_width=args.max_width)[0].shape
+        for num_boxes in args.boxes:
+            detections = make_detections(num_boxes, width, height)
+            old_ms = timed(lambda: legacy_path(jpeg, detections, args.quality), args.iterations)
+            new_ms = timed(lambda: codec_path(jpeg, detections, args.quality, args.max_width, annotator),
+                           args.iterations)
+            print(f"{size:<11} {num_boxes:>5} {old_ms:>9.2f} {new_ms:>9.2f} {old_ms / new_ms:>7.2f}x "
+                  f"{decoded[1]:>5}x{decoded[0]:<5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Throughput of in-process batching vs the multi-process inference pool.
+
+Several client threads submit frames as fast as they get results back, the
+way concurrent Socket.IO clients do.  The stub model burns CPU in Python
+while holding the GIL, like the parts of real inference that do, so the
+in-process scheduler cannot use more than one core while the worker pool
+should scale with the number of workers (up to the number of cores).
+
+    python benchmarks/bench_inference_pool.py --workers 1 2 4 --clients 8
+    python benchmarks/bench_inference_pool.py --real-model --workers 2 4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inference_pool import InferencePool  # noqa: E402
+from inference_scheduler import InferenceScheduler  # noqa: E402
+from run_benchmarks import StubModel  # noqa: E402
+
+STUB_MS = float(os.environ.get('BENCH_STUB_MS', '20'))
+
+
+class BusyStubModel(StubModel):
+    """StubModel that spends STUB_MS of GIL-holding CPU time per frame"""
+
+    name = 'busy-stub'
+
+    def __call__(self, source, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        # CPU time, not wall time, so processes sharing a core do not finish early
+        deadline = time.process_time() + STUB_MS / 1000 * len(frames)
+        while time.process_time() < deadline:
+            pass
+        return [self._result(frame) for frame in frames]
+
+
+def load_stub_model():
+    """Top-level so worker processes can unpickle it"""
+    return BusyStubModel(num_boxes=10)
+
+
+def load_real_model():
+    from backends import load_configured_backend
+    return load_configured_backend()
+
+
+def drive(submit, clients, seconds, size):
+    """Run client threads for the given time and return completed frames per second"""
+    frame = np.random.default_rng(0).integers(0, 255, (size, size, 3), dtype=np.uint8)
+    completed = [0] * clients
+    stop_at = time.perf_counter() + seconds
+
+    def client(index):
+        while time.perf_counter() < stop_at:
+            submit(frame, 0.25).result()
+            completed[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(completed) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--size', type=int, default=416)
+    parser.add_argument('--real-model', action='store_true', help='Use the configured model instead of the stub')
+    args = parser.parse_args()
+
+    load_model = load_real_model if args.real_model else load_stub_model
+    print(f"🖥️ {os.cpu_count()} cores, {args.clients} clients, {args.size}x{args.size} frames")
+
+    model = load_model()
+    scheduler = InferenceScheduler(lambda frames, conf: model(frames, conf=conf, verbose=False))
+    scheduler.start()
+    drive(scheduler.submit, args.clients, 1.0, args.size)
+    baseline = drive(scheduler.submit, args.clients, args.seconds, args.size)
+    scheduler.stop()
+    print(f"{'in-process':<14} {baseline:>8.1f} frames/s")
+
+    for workers in args.workers:
+        ready = threading.Event()
+        pool = InferencePool(workers, load_model, max_frame_bytes=args.size * args.size * 3,
+                             on_ready=lambda _: ready.set())
+        pool.start()
+        ready.wait(120)
+        # Give the other workers time to load before measuring
+        deadline = time.perf_counter() + 120
+        while pool.status()['workers_ready'] < workers and time.perf_counter() < deadline:
+            time.sleep(0.1)
+        drive(pool.submit, args.clients, 1.0, args.size)
+        throughput = drive(pool.submit, args.clients, args.seconds, args.size)
+        pool.stop()
+        print(f"{f'{workers} workers':<14} {throughput:>8.1f} frames/s ({throughput / baseline:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
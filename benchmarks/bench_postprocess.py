@@ -0,0 +1,124 @@
+"""Micro-benchmark: per-box Python loop vs vectorized post-processing.
+
+Runs the loop that used to be copied into app.py, web_app.py and gui_app.py
+against postprocess.Detections on synthetic results with many boxes, and
+compares serialized sizes of the list and columns JSON shapes served by
+/api/detect.
+
+    python benchmarks/bench_postprocess.py --boxes 100 300 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postprocess import Detections  # noqa: E402
+
+NAMES = {i: f'class_{i}' for i in range(80)}
+INPUT_SIZE = 416
+FRAME_W, FRAME_H = 640, 480
+CONF_THRESHOLD = 0.5
+
+
+class _Array:
+    """Stand-in for a torch tensor with .cpu().numpy()"""
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Array(data)
+        self.xyxy = _Array(data[:, :4])
+        self.conf = _Array(data[:, 4])
+        self.cls = _Array(data[:, 5])
+
+
+class _Result:
+    def __init__(self, data):
+        self.boxes = _Boxes(data)
+
+
+def make_result(num_boxes, seed=0):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, INPUT_SIZE - 50, size=(num_boxes, 2))
+    wh = rng.uniform(10, 50, size=(num_boxes, 2))
+    data = np.column_stack([
+        xy, xy + wh,
+        rng.uniform(0.25, 1.0, size=num_boxes),
+        rng.integers(0, 80, size=num_boxes),
+    ]).astype(np.float32)
+    return _Result(data)
+
+
+def legacy_loop(result):
+    """The original per-box loop from web_app.process_frame / gui_app.detection_loop"""
+    detections = []
+    boxes = result.boxes.xyxy.cpu().numpy()
+    confidences = result.boxes.conf.cpu().numpy()
+    class_ids = result.boxes.cls.cpu().numpy()
+    for i in range(len(boxes)):
+        confidence = float(confidences[i])
+        if confidence >= CONF_THRESHOLD:
+            scale_x = FRAME_W / INPUT_SIZE
+            scale_y = FRAME_H / INPUT_SIZE
+            x1, y1, x2, y2 = boxes[i] * [scale_x, scale_y, scale_x, scale_y]
+            detections.append({
+                'bbox': [x1, y1, x2, y2],
+                'confidence': confidence,
+                'class_id': int(class_ids[i]),
+                'class_name': NAMES[int(class_ids[i])]
+            })
+    return detections
+
+
+def vectorized(result):
+    return (Detections.from_result(result, NAMES)
+            .filter(CONF_THRESHOLD)
+            .rescale(FRAME_W / INPUT_SIZE, FRAME_H / INPUT_SIZE)
+            .to_list())
+
+
+def time_it(fn, arg, repeat):
+    fn(arg)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--boxes', type=int, nargs='+', default=[10, 100, 300, 1000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'boxes':>6} {'loop us':>10} {'vector us':>10} {'speedup':>8} {'list B':>8} {'columns B':>10}")
+    for num_boxes in args.boxes:
+        result = make_result(num_boxes)
+        loop_us = time_it(legacy_loop, result, args.repeat)
+        vector_us = time_it(vectorized, result, args.repeat)
+
+        detections = Detections.from_result(result, NAMES).filter(CONF_THRESHOLD)
+        list_size = len(json.dumps(detections.to_list()))
+        columns_size = len(json.dumps(detections.to_columns()))
+        print(f"{num_boxes:>6} {loop_us:>10.1f} {vector_us:>10.1f} {loop_us / vector_us:>7.1f}x "
+              f"{list_size:>8} {columns_size:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Compare inference backends against the PyTorch baseline.
+
+For each backend this reports single-image latency (p50/p95), batched
+throughput, and how well its detections agree with PyTorch on the same
+images (matched by class at IoU >= 0.5).
+
+    python benchmarks/compare_backends.py --images path/to/images --backends onnx openvino
+    python benchmarks/compare_backends.py --images path/to/images --backends onnx --int8 --calibration-dir calib/
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from backends import BACKENDS, CALIBRATION_EXTENSIONS, load_backend  # noqa: E402
+from postprocess import Detections, box_iou  # noqa: E402
+
+
+def load_images(folder, limit, size):
+    if folder:
+        paths = sorted(
+            path for path in glob.glob(os.path.join(folder, '**', '*'), recursive=True)
+            if path.lower().endswith(CALIBRATION_EXTENSIONS)
+        )[:limit]
+        images = [image for image in (cv2.imread(path) for path in paths) if image is not None]
+        if images:
+            return images
+        print(f"⚠️ No images found in {folder}; using synthetic frames (agreement will be trivial)")
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, size=(size, size, 3), dtype=np.uint8) for _ in range(limit)]
+
+
+def match(baseline, candidate, iou_threshold=0.5):
+    """Greedy same-class matching; returns (matches, matched IoUs)"""
+    iou = box_iou(baseline.boxes, candidate.boxes)
+    if iou.size:
+        iou[baseline.class_ids[:, None] != candidate.class_ids[None, :]] = 0
+    ious = []
+    while iou.size and iou.max() >= iou_threshold:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        ious.append(float(iou[i, j]))
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return len(ious), ious
+
+
+def run_backend(model, images, batch_size, conf):
+    # Warm-up so one-time initialization is not measured
+    model(images[0], conf=conf, verbose=False)
+
+    latencies = []
+    detections = []
+    for image in images:
+        start = time.perf_counter()
+        result = model(image, conf=conf, verbose=False)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections.append(Detections.from_result(result, model.names))
+
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        model(images[i:i + batch_size], conf=conf, verbose=False)
+    throughput = len(images) / (time.perf_counter() - start)
+
+    return {
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies, 50)), 3),
+            'p95': round(float(np.percentile(latencies, 95)), 3),
+            'mean': round(float(np.mean(latencies)), 3),
+        },
+        'throughput_ips': round(throughput, 2),
+    }, detections
+
+
+def agreement(baseline, candidate):
+    matched = 0
+    total_baseline = 0
+    total_candidate = 0
+    ious = []
+    for base, cand in zip(baseline, candidate):
+        count, matched_ious = match(base, cand)
+        matched += count
+        ious.extend(matched_ious)
+        total_baseline += len(base)
+        total_candidate += len(cand)
+    recall = matched / total_baseline if total_baseline else 1.0
+    precision = matched / total_candidate if total_candidate else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        'baseline_boxes': total_baseline,
+        'candidate_boxes': total_candidate,
+        'matched': matched,
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(f1, 4),
+        'mean_iou': round(float(np.mean(ious)), 4) if ious else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Folder of test images (synthetic frames if omitted)')
+    parser.add_argument('--limit', type=int, default=50, help='Number of images to use')
+    parser.add_argument('--backends', nargs='+', default=['onnx'], choices=[b for b in BACKENDS if b != 'pytorch'])
+    parser.add_argument('--weights', default=config.MODEL_WEIGHTS)
+    parser.add_argument('--imgsz', type=int, default=config.MODEL_IMGSZ)
+    parser.add_argument('--int8', action='store_true', help='Also compare INT8-quantized exports')
+    parser.add_argument('--calibration-dir', default=config.MODEL_CALIBRATION_DIR or None)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--conf', type=float, default=config.DETECTION_CONF)
+    parser.add_argument('--output', help='Write the report as JSON to this file')
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit, args.imgsz)
+    print(f"📷 {len(images)} images, imgsz {args.imgsz}, batch {args.batch_size}")
+
+    variants = [('pytorch', False)] + [(backend, False) for backend in args.backends]
+    if args.int8:
+        variants += [(backend, True) for backend in args.backends]
+
+    report = {}
+    baseline = None
+    for backend, int8 in variants:
+        model = load_backend(backend, args.weights, args.imgsz, int8, args.calibration_dir, config.MODEL_CACHE_DIR)
+        stats, detections = run_backend(model, images, args.batch_size, args.conf)
+        if baseline is None:
+            baseline = detections
+        else:
+            stats['agreement'] = agreement(baseline, detections)
+        report[model.name] = stats
+
+        line = (f"{model.name:<32} p50 {stats['latency_ms']['p50']:>8.2f} ms  "
+                f"p95 {stats['latency_ms']['p95']:>8.2f} ms  {stats['throughput_ips']:>7.2f} img/s")
+        if 'agreement' in stats:
+            line += f"  F1 {stats['agreement']['f1']:.3f}"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""Benchmark suite for the detection hot paths.
+
+Covers app.process_image, web_app.process_frame, web_app.draw_detection_on_frame,
+ObjectDetectionGUI.draw_detections, base64/JPEG encode and decode, and box
+post-processing, on synthetic frames at several resolutions and box counts.
+Reports p50/p95/p99 latency and throughput, saves the results as JSON and
+flags regressions against a stored baseline.
+
+    python benchmarks/run_benchmarks.py --stub                       # no weights needed
+    python benchmarks/run_benchmarks.py --stub --save-baseline       # store benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --stub --fail-on-regression  # exit 1 if slower than baseline
+    python benchmarks/run_benchmarks.py --only codec postprocess
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+BOX_COUNTS = [1, 10, 50, 200]
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results', 'latest.json')
+NAMES = {i: f'class_{i}' for i in range(80)}
+
+
+class _Array:
+    """Stand-in for a torch tensor with .cpu().numpy()"""
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Array(data)
+        self.xyxy = _Array(data[:, :4])
+        self.conf = _Array(data[:, 4])
+        self.cls = _Array(data[:, 5])
+
+
+class _Result:
+    def __init__(self, image, data):
+        self.orig_img = image
+        self.boxes = _Boxes(data)
+
+    def plot(self):
+        return self.orig_img.copy()
+
+
+class StubModel:
+    """Model stand-in that returns a fixed number of random boxes instantly"""
+
+    name = 'stub'
+    names = NAMES
+
+    def __init__(self, num_boxes=20, seed=0):
+        self.num_boxes = num_boxes
+        self.rng = np.random.default_rng(seed)
+
+    def _result(self, image):
+        height, width = image.shape[:2]
+        return _Result(image, make_boxes(self.num_boxes, width, height, self.rng))
+
+    def __call__(self, source, **kwargs):
+        if isinstance(source, list):
+            return [self._result(image) for image in source]
+        return [self._result(source)]
+
+
+def make_boxes(num_boxes, width, height, rng):
+    """Random (N, 6) xyxy/conf/cls rows inside a width x height frame"""
+    size = np.minimum(width, height) / 4
+    xy = rng.uniform(0, [width - size, height - size], size=(num_boxes, 2))
+    wh = rng.uniform(size / 4, size, size=(num_boxes, 2))
+    return np.column_stack([
+        xy, xy + wh,
+        rng.uniform(0.25, 1.0, size=num_boxes),
+        rng.integers(0, 80, size=num_boxes),
+    ]).astype(np.float32)
+
+
+def make_frame(width, height, seed=0):
+    """Synthetic frame with smooth gradients and some texture (compresses like a camera image)"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[..., 0] = x[None, :]
+    frame[..., 1] = y[:, None]
+    frame[..., 2] = (x[None, :] + y[:, None]) / 2
+    frame += rng.normal(0, 8, size=frame.shape)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def make_detections(num_boxes, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {'bbox': row[:4].tolist(), 'confidence': float(row[4]), 'class_id': int(row[5]),
+         'class_name': NAMES[int(row[5])]}
+        for row in make_boxes(num_boxes, width, height, rng)
+    ]
+
+
+def measure(fn, iterations, warmup):
+    """Run fn repeatedly and return latency percentiles (ms) and throughput"""
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - started
+    samples *= 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'mean_ms': round(float(samples.mean()), 4),
+        'throughput_per_s': round(float(iterations / (samples.sum() / 1000)), 2),
+        'iterations': iterations,
+    }
+
+
+def bench_codec(args):
+    cases = {}
+    for width, height in RESOLUTIONS:
+        frame = make_frame(width, height)
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        jpeg = jpeg.tobytes()
+        encoded = base64.b64encode(jpeg)
+        tag = f'{width}x{height}'
+        cases[f'jpeg_encode/{tag}'] = lambda f=frame: cv2.imencode('.jpg', f, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        cases[f'jpeg_decode/{tag}'] = lambda j=jpeg: cv2.imdecode(np.frombuffer(j, dtype=np.uint8), cv2.IMREAD_COLOR)
+        cases[f'base64_encode/{tag}'] = lambda j=jpeg: base64.b64encode(j)
+        cases[f'base64_decode/{tag}'] = lambda e=encoded: base64.b64decode(e)
+    return cases
+
+
+def bench_postprocess(args):
+    from postprocess import Detections
+
+    cases = {}
+    for num_boxes in BOX_COUNTS:
+        result = _Result(None, make_boxes(num_boxes, 416, 416, np.random.default_rng(0)))
+        cases[f'postprocess/{num_boxes}_boxes'] = lambda r=result: (
+            Detections.from_result(r, NAMES).filter(0.5).rescale(640 / 416, 480 / 416).to_list())
+    return cases
+
+
+def bench_drawing(args):
+    cases = {}
+    import web_app
+    try:
+        from gui_app import ObjectDetectionGUI
+        # draw_detections only needs the class-level annotator, not a Tk window
+        gui = ObjectDetectionGUI.__new__(ObjectDetectionGUI)
+    except ImportError as e:
+        print(f"⚠️ Skipping GUI drawing benchmark: {e}")
+        gui = None
+
+    width, height = 1280, 720
+    base = make_frame(width, height)
+    frame = base.copy()
+    for num_boxes in BOX_COUNTS:
+        detections = make_detections(num_boxes, width, height)
+
+        def web_draw(d=detections):
+            np.copyto(frame, base)
+            for detection in d:
+                web_app.draw_detection_on_frame(frame, detection)
+        cases[f'web_app.draw_detection_on_frame/{num_boxes}_boxes'] = web_draw
+
+        if gui is not None:
+            def gui_draw(d=detections):
+                np.copyto(frame, base)
+                gui.draw_detections(frame, d)
+            cases[f'gui_app.draw_detections/{num_boxes}_boxes'] = gui_draw
+    return cases
+
+
+def bench_app(args, model):
+    import app
+
+    app.get_model = lambda: model
+    cases = {}
+    for width, height in RESOLUTIONS:
+        frame = make_frame(width, height)
+        cases[f'app.process_image/{width}x{height}'] = lambda f=frame: app.process_image(f)
+    return cases
+
+
+def bench_web_app(args, model):
+    import web_app
+
+    web_app.model = model
+    web_app.scheduler.start()
+    cases = {}
+    for width, height in RESOLUTIONS:
+        ok, jpeg = cv2.imencode('.jpg', make_frame(width, height), [cv2.IMWRITE_JPEG_QUALITY, 80])
+        data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg.tobytes()).decode('utf-8')
+        cases[f'web_app.process_frame/{width}x{height}'] = lambda d=data_url: web_app.process_frame(d)
+    return cases
+
+
+SUITES = ('codec', 'postprocess', 'drawing', 'app', 'web_app')
+
+
+def load_model(args):
+    if args.stub:
+        return StubModel(args.stub_boxes)
+    from backends import load_configured_backend
+    return load_configured_backend()
+
+
+def compare(results, baseline, tolerance):
+    """Return (name, baseline p50, current p50, ratio) for cases slower than baseline by more than tolerance"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get('p50_ms'):
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms']
+        current['baseline_p50_ms'] = previous['p50_ms']
+        current['change'] = round(ratio - 1, 4)
+        if ratio > 1 + tolerance:
+            regressions.append((name, previous['p50_ms'], current['p50_ms'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=SUITES, help='Run only these suites')
+    parser.add_argument('--stub', action='store_true', help='Use a stub model instead of loading weights')
+    parser.add_argument('--stub-boxes', type=int, default=20, help='Boxes returned per image by the stub model')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Where to write the results JSON')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed p50 slowdown before flagging')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+    args = parser.parse_args()
+
+    # Keep app.py from loading real weights at import when they are not used
+    os.environ.setdefault('YOLO_MODEL_PRELOAD', 'false')
+    # Set before the apps are imported: benchmark detections must not land in the real
+    # history, and identical frames must run the model rather than the tracker or motion gate
+    os.environ['YOLO_HISTORY'] = 'false'
+    os.environ['YOLO_TRACKING'] = 'false'
+    os.environ['YOLO_MOTION_GATE'] = 'false'
+    suites = args.only or SUITES
+    model = load_model(args) if {'app', 'web_app'} & set(suites) else None
+
+    cases = {}
+    for suite in suites:
+        if suite in ('app', 'web_app'):
+            cases.update(globals()[f'bench_{suite}'](args, model))
+        else:
+            cases.update(globals()[f'bench_{suite}'](args))
+
+    results = {}
+    print(f"{'case':<52} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10}")
+    for name, fn in cases.items():
+        stats = measure(fn, args.iterations, args.warmup)
+        results[name] = stats
+        print(f"{name:<52} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f} "
+              f"{stats['throughput_per_s']:>10.1f}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('results', {})
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for name, before, after, ratio in regressions:
+                print(f"  {name:<50} {before:.3f} -> {after:.3f} ms ({ratio - 1:+.0%})")
+        else:
+            print(f"\n✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model': getattr(model, 'name', None),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'iterations': args.iterations,
+        'results': results,
+    }
+    targets = [args.output] + ([args.baseline] if args.save_baseline else [])
+    for path in targets:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {path}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
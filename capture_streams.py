@@ -0,0 +1,265 @@
+"""Server-side capture sources fanned out to any number of viewers.
+
+Each ``CaptureStream`` owns one source (camera index or video file, opened
+with ``frame_pipeline.open_source``).  A capture thread keeps the newest frame
+in a ``FrameRingBuffer``; a process thread takes the newest frame, runs
+detection on it once, encodes the annotated frame to JPEG once and publishes
+it as a ready-made ``multipart/x-mixed-replace`` part.  Every MJPEG viewer
+sends that same bytes object, so a viewer costs bandwidth only, not
+inference or encoding.  Slow viewers skip to the newest part instead of
+queueing.
+
+Detection and encoding only run while someone is watching: encoding while an
+MJPEG viewer is connected, detection while there is a viewer or a detection
+subscriber.  Capture keeps running so cameras do not serve stale frames.
+"""
+import threading
+import time
+
+import numpy as np
+
+from frame_pipeline import FrameRingBuffer, StageStats, open_source
+
+BOUNDARY = 'frame'
+MJPEG_MIMETYPE = f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+
+
+def mjpeg_part(jpeg):
+    """One multipart section carrying a JPEG frame"""
+    header = f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n'
+    return header.encode('ascii') + jpeg + b'\r\n'
+
+
+def parse_sources(spec):
+    """Parse 'id=source,...' (ids optional) into [(stream_id, source)] pairs"""
+    sources = []
+    for index, item in enumerate(part.strip() for part in spec.split(',')):
+        if not item:
+            continue
+        stream_id, _, source = item.rpartition('=')
+        sources.append((stream_id.strip() or str(index), source.strip()))
+    return sources
+
+
+class StreamFrame:
+    """One processed frame shared by every viewer"""
+
+    __slots__ = ('seq', 'part', 'jpeg', 'detections', 'timestamp')
+
+    def __init__(self, seq, jpeg, detections, timestamp):
+        self.seq = seq
+        self.jpeg = jpeg
+        self.part = mjpeg_part(jpeg) if jpeg is not None else None
+        self.detections = detections
+        self.timestamp = timestamp
+
+
+class CaptureStream:
+    """Capture one source, detect and encode once per frame, fan out to viewers"""
+
+    def __init__(self, stream_id, spec, process, encode, on_detections=None, max_fps=15.0, loop=True):
+        self.stream_id = stream_id
+        self.spec = spec
+        # process(frame, stream_id) -> (detections, annotated frame); may draw on frame in place
+        self.process = process
+        self.encode = encode
+        self.on_detections = on_detections
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.source = open_source(spec, realtime=True, loop=loop)
+        if not self.source.is_opened():
+            raise ValueError(f'Could not open capture source {spec!r}')
+        shape = self.source.probe_shape()
+        if shape is None:
+            raise ValueError(f'Could not read a frame from {spec!r}')
+        self.ring = FrameRingBuffer(shape, num_slots=3)
+        self._work = np.empty(shape, dtype=np.uint8)
+        self.stats = {name: StageStats(name) for name in ('capture', 'process', 'encode')}
+
+        self._cond = threading.Condition()
+        self._latest = None
+        self._viewers = 0
+        self._subscribers = 0
+        self._frames_served = 0
+        self._stopped = threading.Event()
+        self._threads = []
+
+    @property
+    def running(self):
+        return not self._stopped.is_set() and not self.ring.closed
+
+    @property
+    def viewers(self):
+        return self._viewers
+
+    def start(self):
+        for name, target in (('capture', self._capture_loop), ('process', self._process_loop)):
+            thread = threading.Thread(target=target, name=f'stream-{self.stream_id}-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopped.set()
+        self.ring.close()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(2.0)
+        self.source.release()
+
+    def set_subscribers(self, count):
+        """Number of clients that want this stream's detections (e.g. Socket.IO room members)"""
+        with self._cond:
+            self._subscribers = count
+            self._cond.notify_all()
+
+    def _wanted(self):
+        return self._viewers > 0 or self._subscribers > 0
+
+    def latest(self):
+        with self._cond:
+            return self._latest
+
+    def frames(self, timeout=5.0):
+        """Yield MJPEG parts for one viewer until the stream stops or the viewer goes away"""
+        with self._cond:
+            self._viewers += 1
+            self._cond.notify_all()
+        try:
+            last_seq = 0
+            while self.running:
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: not self.running or (self._latest is not None and self._latest.seq > last_seq
+                                                     and self._latest.part is not None),
+                        timeout)
+                    frame = self._latest
+                if frame is None or frame.seq <= last_seq or frame.part is None:
+                    continue
+                last_seq = frame.seq
+                self._frames_served += 1
+                yield frame.part
+        finally:
+            with self._cond:
+                self._viewers -= 1
+
+    def _capture_loop(self):
+        try:
+            while not self._stopped.is_set():
+                index, buffer = self.ring.acquire_write()
+                if index is None:
+                    break
+                started = time.perf_counter()
+                if not self.source.read_into(buffer):
+                    break
+                captured = time.perf_counter()
+                self.ring.commit(index, captured)
+                self.stats['capture'].record(captured - started)
+        finally:
+            self.ring.close()
+            with self._cond:
+                self._cond.notify_all()
+
+    def _process_loop(self):
+        last_seq = 0
+        seq = 0
+        next_at = 0.0
+        while not self._stopped.is_set():
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._wanted() or not self.running, 0.5):
+                    continue
+            if not self.running:
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            ref = self.ring.acquire_read(last_seq + 1, timeout=0.5)
+            if ref is None:
+                continue
+            try:
+                # Copy out so capture can reuse the slot while we detect and draw
+                np.copyto(self._work, ref.frame)
+                captured_at = ref.timestamp
+                last_seq = ref.seq
+            finally:
+                self.ring.release(ref)
+            started = time.perf_counter()
+            next_at = started + self.min_interval
+
+            try:
+                detections, annotated = self.process(self._work, self.stream_id)
+            except Exception as e:
+                print(f"⚠️ Stream {self.stream_id}: detection failed: {e}")
+                detections, annotated = [], self._work
+            processed = time.perf_counter()
+            self.stats['process'].record(processed - started, processed - captured_at)
+
+            jpeg = None
+            if self._viewers > 0:
+                jpeg = self.encode(annotated)
+                encoded = time.perf_counter()
+                self.stats['encode'].record(encoded - processed, encoded - captured_at)
+
+            seq += 1
+            frame = StreamFrame(seq, jpeg, detections, time.time())
+            with self._cond:
+                self._latest = frame
+                self._cond.notify_all()
+            if self.on_detections is not None:
+                self.on_detections(self, frame)
+
+    def status(self):
+        with self._cond:
+            latest = self._latest
+            viewers, subscribers = self._viewers, self._subscribers
+        return {
+            'id': self.stream_id,
+            'source': self.source.name,
+            'running': self.running,
+            'viewers': viewers,
+            'subscribers': subscribers,
+            'frames_served': self._frames_served,
+            'latest_seq': latest.seq if latest is not None else 0,
+            'latest_count': len(latest.detections) if latest is not None else 0,
+            'stages': {name: stage.snapshot() for name, stage in self.stats.items()},
+        }
+
+
+class StreamRegistry:
+    """Server-owned capture streams by id"""
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def open(self, stream_id, spec, **kwargs):
+        stream = CaptureStream(stream_id, spec, **kwargs)
+        with self._lock:
+            if stream_id in self._streams:
+                stream.source.release()
+                raise ValueError(f'Stream {stream_id!r} already exists')
+            self._streams[stream_id] = stream
+        stream.start()
+        return stream
+
+    def get(self, stream_id):
+        with self._lock:
+            return self._streams.get(stream_id)
+
+    def all(self):
+        with self._lock:
+            return list(self._streams.values())
+
+    def close(self, stream_id):
+        with self._lock:
+            stream = self._streams.pop(stream_id, None)
+        if stream is not None:
+            stream.stop()
+        return stream is not None
+
+    def close_all(self):
+        for stream in self.all():
+            self.close(stream.stream_id)
+
+    def total_viewers(self):
+        return sum(stream.viewers for stream in self.all())
@@ -0,0 +1,227 @@
+"""JPEG decode/encode and detection annotation shared by the apps.
+
+Decoding reads the frame size from the JPEG header first.  When the frame is
+at least twice as wide as needed, it is decoded straight at 1/2, 1/4 or 1/8
+scale (libjpeg's DCT scaling via ``IMREAD_REDUCED_COLOR_*``), which is much
+cheaper than decoding at full size and resizing afterwards.  Frames are
+encoded directly from BGR at a configurable quality.  When PyTurboJPEG and
+libjpeg-turbo are installed they are used for both directions.
+
+``Annotator`` draws boxes in place and pastes pre-rendered label sprites
+(class name, confidence and track id pieces are each rendered once and
+cached) instead of measuring and rasterizing the label text for every box.
+"""
+import struct
+
+import cv2
+import numpy as np
+
+import config
+
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+_turbo = None
+if TurboJPEG is not None and config.TURBOJPEG:
+    try:
+        _turbo = TurboJPEG()
+    except (OSError, RuntimeError) as e:
+        # The Python package is installed but the libjpeg-turbo shared library is not
+        print(f"⚠️ libjpeg-turbo unavailable, using OpenCV for JPEG: {e}")
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Start-of-frame markers carry the image size (C4, C8 and CC are other segments)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def backend():
+    """Name of the library doing JPEG work"""
+    return 'turbojpeg' if _turbo is not None else 'opencv'
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG header, or None if data is not a baseline/progressive JPEG"""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    offset = 2
+    end = len(data) - 9
+    while offset < end:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte
+            offset += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack_from('>HH', data, offset + 5)
+            return width, height
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        (length,) = struct.unpack_from('>H', data, offset + 2)
+        offset += 2 + length
+    return None
+
+
+def image_size(data):
+    """(width, height) of JPEG or PNG bytes read from the header, or None for other formats"""
+    size = jpeg_size(data)
+    if size is None and data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        size = struct.unpack_from('>II', data, 16)
+    return size
+
+
+def reduction_factor(width, max_width):
+    """Largest of 8, 4, 2 that keeps the decoded width at or above max_width (1 if none does)"""
+    if not max_width:
+        return 1
+    for factor in (8, 4, 2):
+        if width // factor >= max_width:
+            return factor
+    return 1
+
+
+def pixel_reduction_factor(width, height, max_pixels):
+    """Smallest of 1, 2, 4, 8 that brings width x height within max_pixels (None if even 8 does not)"""
+    if not max_pixels:
+        return 1
+    for factor in (1, 2, 4, 8):
+        if (width // factor) * (height // factor) <= max_pixels:
+            return factor
+    return None
+
+
+def decode_image(data, max_width=0, max_pixels=0):
+    """Decode JPEG/PNG bytes to BGR, scaled down by 2/4/8 when far wider than max_width
+    or larger than max_pixels.
+
+    Returns (frame, scale) where scale maps frame coordinates back to the
+    original image (1, 2, 4 or 8).  Raises ValueError for images that would
+    exceed max_pixels even at 1/8 scale, before decoding them.
+    """
+    size = image_size(data)
+    factor = 1
+    if size is not None:
+        width, height = size
+        fit = pixel_reduction_factor(width, height, max_pixels)
+        if fit is None:
+            raise ValueError(f'Image of {width}x{height} is too large to decode (limit {max_pixels} pixels)')
+        factor = max(reduction_factor(width, max_width), fit)
+    if _turbo is not None and jpeg_size(data) is not None:
+        frame = _turbo.decode(data, scaling_factor=(1, factor)) if factor > 1 else _turbo.decode(data)
+    else:
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), _REDUCED_FLAGS[factor])
+    if frame is None:
+        raise ValueError('Could not decode image data')
+    return frame, factor
+
+
+def encode_jpeg(frame, quality=None):
+    """Encode a BGR frame as JPEG bytes"""
+    quality = config.JPEG_QUALITY if quality is None else quality
+    if _turbo is not None:
+        return _turbo.encode(frame, quality=quality)
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError('Could not encode frame as JPEG')
+    return buffer.tobytes()
+
+
+def scale_detections(detections, scale):
+    """Detections with boxes multiplied by scale (e.g. back to the size of a reduced-decoded image)"""
+    if scale == 1:
+        return detections
+    return [dict(d, bbox=[value * scale for value in d['bbox']]) for d in detections]
+
+
+class Annotator:
+    """Draw boxes and cached label sprites onto BGR frames in place"""
+
+    def __init__(self, font_scale=0.7, text_thickness=2, label_padding=10, text_offset=5,
+                 box_scale=4, min_box_thickness=2, confidence_digits=2,
+                 color=(0, 255, 0), text_color=(0, 0, 0), max_sprites=4096):
+        self.font_scale = font_scale
+        self.text_thickness = text_thickness
+        # Label background is the text height plus label_padding; the baseline sits text_offset above the box
+        self.label_padding = label_padding
+        self.text_offset = text_offset
+        self.box_scale = box_scale
+        self.min_box_thickness = min_box_thickness
+        self.confidence_digits = confidence_digits
+        self.confidence_format = f'{{:.{confidence_digits}f}}'
+        self.color = color
+        self.text_color = text_color
+        self.max_sprites = max_sprites
+        self._sprites = {}
+
+    def sprite(self, text):
+        """Label piece rendered on its background, cached by text"""
+        sprite = self._sprites.get(text)
+        if sprite is None:
+            (width, height), _ = cv2.getTextSize(text, FONT, self.font_scale, self.text_thickness)
+            sprite = np.empty((height + self.label_padding, max(width, 1), 3), dtype=np.uint8)
+            sprite[:] = self.color
+            cv2.putText(sprite, text, (0, sprite.shape[0] - self.text_offset), FONT,
+                        self.font_scale, self.text_color, self.text_thickness)
+            if len(self._sprites) >= self.max_sprites:
+                # Track ids keep growing; start over rather than grow without bound
+                self._sprites.clear()
+            self._sprites[text] = sprite
+        return sprite
+
+    def preload(self, names):
+        """Render the sprites for every class name and confidence value up front"""
+        for name in (names.values() if isinstance(names, dict) else names):
+            self.sprite(f"{name}: ")
+        steps = 10 ** self.confidence_digits
+        for index in range(steps + 1):
+            self.sprite(self.confidence_format.format(index / steps))
+
+    def label_sprites(self, detection):
+        sprites = [
+            self.sprite(f"{detection['class_name']}: "),
+            self.sprite(self.confidence_format.format(detection['confidence'])),
+        ]
+        if detection.get('track_id') is not None:
+            sprites.insert(0, self.sprite(f"#{detection['track_id']} "))
+        return sprites
+
+    @staticmethod
+    def _paste(frame, sprite, x, y):
+        """Copy sprite with its top-left corner at (x, y), clipped to the frame"""
+        frame_height, frame_width = frame.shape[:2]
+        height, width = sprite.shape[:2]
+        top, left = max(y, 0), max(x, 0)
+        bottom, right = min(y + height, frame_height), min(x + width, frame_width)
+        if top >= bottom or left >= right:
+            return
+        frame[top:bottom, left:right] = sprite[top - y:bottom - y, left - x:right - x]
+
+    def draw(self, frame, detections):
+        """Draw every detection's box and label onto frame"""
+        frame_height, frame_width = frame.shape[:2]
+        for detection in detections:
+            x1, y1, x2, y2 = map(int, detection['bbox'])
+            x1 = max(0, min(x1, frame_width))
+            y1 = max(0, min(y1, frame_height))
+            x2 = max(0, min(x2, frame_width))
+            y2 = max(0, min(y2, frame_height))
+            thickness = max(self.min_box_thickness, int(self.box_scale * detection['confidence']))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), self.color, thickness)
+
+            x = x1
+            for sprite in self.label_sprites(detection):
+                self._paste(frame, sprite, x, y1 - sprite.shape[0] + 1)
+                x += sprite.shape[1]
+        return frame
@@ -0,0 +1,155 @@
+"""Shared runtime configuration for the YOLO detection apps.
+
+Every setting can be overridden with an environment variable (or a ``.env``
+file next to the apps when python-dotenv is installed).
+"""
+import os
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+
+def env_str(name, default):
+    """Read a string setting from the environment"""
+    return os.environ.get(name, default)
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    return int(value)
+
+
+def env_float(name, default):
+    """Read a float setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    return float(value)
+
+
+def env_bool(name, default):
+    """Read a boolean setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Micro-batching inference scheduler (web_app)
+BATCH_MAX_SIZE = env_int('YOLO_BATCH_MAX_SIZE', 8)
+BATCH_MAX_WAIT_MS = env_float('YOLO_BATCH_MAX_WAIT_MS', 15.0)
+BATCH_QUEUE_DEPTH = env_int('YOLO_BATCH_QUEUE_DEPTH', 64)
+
+# Multi-process inference workers (web_app); 0 runs the model in the server process
+INFERENCE_WORKERS = env_int('YOLO_INFERENCE_WORKERS', 0)
+INFERENCE_SLOTS_PER_WORKER = env_int('YOLO_INFERENCE_SLOTS_PER_WORKER', 2)
+
+# Binary Socket.IO frame transport (web_app)
+SOCKET_MAX_FRAME_BYTES = env_int('YOLO_SOCKET_MAX_FRAME_BYTES', 4 * 1024 * 1024)
+
+# JPEG decode/encode (web_app)
+JPEG_QUALITY = env_int('YOLO_JPEG_QUALITY', 85)
+DECODE_MAX_WIDTH = env_int('YOLO_DECODE_MAX_WIDTH', 1280)  # wider frames decode at 1/2, 1/4 or 1/8 scale
+TURBOJPEG = env_bool('YOLO_TURBOJPEG', True)  # use PyTurboJPEG when installed
+
+# Server-side capture streams served as MJPEG (web_app)
+CAPTURE_SOURCES = env_str('YOLO_CAPTURE_SOURCES', '')  # e.g. "0" or "lobby=0,door=videos/door.mp4"
+CAPTURE_MAX_FPS = env_float('YOLO_CAPTURE_MAX_FPS', 15.0)
+
+# Desktop GUI display (gui_app)
+GUI_DISPLAY_FPS = env_float('YOLO_GUI_DISPLAY_FPS', 30.0)
+MULTI_SOURCE_MAX_BATCH = env_int('YOLO_MULTI_SOURCE_MAX_BATCH', 8)
+
+# Adaptive input size / detection rate (gui_app, web_app)
+ADAPTIVE_CONTROL = env_bool('YOLO_ADAPTIVE_CONTROL', True)
+ADAPTIVE_TARGET_LATENCY_MS = env_float('YOLO_ADAPTIVE_TARGET_LATENCY_MS', 100.0)
+ADAPTIVE_INPUT_SIZES = env_str('YOLO_ADAPTIVE_INPUT_SIZES', '320,416,640')
+ADAPTIVE_MAX_DETECT_EVERY = env_int('YOLO_ADAPTIVE_MAX_DETECT_EVERY', 10)
+ADAPTIVE_COOLDOWN = env_int('YOLO_ADAPTIVE_COOLDOWN', 10)
+
+# Object tracking between detector runs (gui_app, web_app)
+TRACKING_ENABLED = env_bool('YOLO_TRACKING', True)
+TRACKING_IOU = env_float('YOLO_TRACKING_IOU', 0.3)
+TRACKING_MAX_MISSED = env_int('YOLO_TRACKING_MAX_MISSED', 5)
+TRACKING_MAX_PREDICT_SECONDS = env_float('YOLO_TRACKING_MAX_PREDICT_SECONDS', 1.0)
+
+# Motion-gated inference (gui_app, web_app)
+MOTION_GATE = env_bool('YOLO_MOTION_GATE', True)
+MOTION_THRESHOLD = env_float('YOLO_MOTION_THRESHOLD', 0.01)
+MOTION_PIXEL_DELTA = env_int('YOLO_MOTION_PIXEL_DELTA', 15)
+MOTION_RECHECK_SECONDS = env_float('YOLO_MOTION_RECHECK_SECONDS', 2.0)
+MOTION_WIDTH = env_int('YOLO_MOTION_WIDTH', 64)
+
+# Detection history store (web_app, gui_app)
+HISTORY_ENABLED = env_bool('YOLO_HISTORY', True)
+HISTORY_DIR = env_str('YOLO_HISTORY_DIR', 'history')
+HISTORY_SEGMENT_ROWS = env_int('YOLO_HISTORY_SEGMENT_ROWS', 1_000_000)  # 32 bytes per detection
+HISTORY_ROTATE_SECONDS = env_float('YOLO_HISTORY_ROTATE_SECONDS', 3600.0)
+HISTORY_RETENTION_HOURS = env_float('YOLO_HISTORY_RETENTION_HOURS', 24.0)
+HISTORY_MAX_BYTES = env_int('YOLO_HISTORY_MAX_BYTES', 512 * 1024 * 1024)
+HISTORY_MAX_PENDING_ROWS = env_int('YOLO_HISTORY_MAX_PENDING_ROWS', 100_000)
+HISTORY_QUERY_LIMIT = env_int('YOLO_HISTORY_QUERY_LIMIT', 1000)
+
+# Regions of interest: only these crops of a frame are inferred (web_app.py, gui_app.py)
+ROI_REGIONS = env_str('YOLO_ROI_REGIONS', '')  # [source@]name=x1,y1,x2,y2;... in 0-1 frame coordinates
+ROI_MERGE_THRESHOLD = env_float('YOLO_ROI_MERGE_THRESHOLD', 0.5)  # overlap (of the smaller box) merging duplicates
+
+# Per-stage latency metrics, served on /metrics (all entry points)
+METRICS_ENABLED = env_bool('YOLO_METRICS', True)
+GUI_METRICS_OVERLAY = env_bool('YOLO_GUI_METRICS_OVERLAY', True)
+
+# Model and inference backend (all entry points)
+MODEL_WEIGHTS = env_str('YOLO_MODEL_WEIGHTS', 'yolov8n.pt')
+MODEL_BACKEND = env_str('YOLO_BACKEND', 'pytorch')  # pytorch, onnx or openvino
+MODEL_IMGSZ = env_int('YOLO_MODEL_IMGSZ', 640)
+MODEL_INT8 = env_bool('YOLO_INT8', False)
+MODEL_CALIBRATION_DIR = env_str('YOLO_CALIBRATION_DIR', '')
+MODEL_CALIBRATION_IMAGES = env_int('YOLO_CALIBRATION_IMAGES', 100)
+MODEL_CACHE_DIR = env_str('YOLO_MODEL_CACHE_DIR', 'model_cache')
+
+# Background model loading and warm-up (all entry points)
+MODEL_WARMUP_SHAPES = env_str('YOLO_WARMUP_SHAPES', '640x480')  # web_app/gui_app add the adaptive input sizes
+MODEL_WARMUP_RUNS = env_int('YOLO_WARMUP_RUNS', 2)
+MODEL_READY_WAIT_SECONDS = env_float('YOLO_MODEL_READY_WAIT_SECONDS', 0.0)
+MODEL_PRELOAD = env_bool('YOLO_MODEL_PRELOAD', True)  # app.py: start loading at import
+
+# Detection parameters (app.py)
+DETECTION_CONF = env_float('YOLO_DETECTION_CONF', 0.25)
+DETECTION_IOU = env_float('YOLO_DETECTION_IOU', 0.7)
+
+# Content-addressed result cache (app.py)
+RESULT_CACHE_ENABLED = env_bool('YOLO_RESULT_CACHE', True)
+RESULT_CACHE_MEMORY_ENTRIES = env_int('YOLO_RESULT_CACHE_MEMORY_ENTRIES', 256)
+RESULT_CACHE_MEMORY_BYTES = env_int('YOLO_RESULT_CACHE_MEMORY_BYTES', 64 * 1024 * 1024)
+RESULT_CACHE_DIR = env_str('YOLO_RESULT_CACHE_DIR', 'cache')
+RESULT_CACHE_DISK_BYTES = env_int('YOLO_RESULT_CACHE_DISK_BYTES', 512 * 1024 * 1024)
+
+# Batch detection endpoint (app.py)
+BATCH_DETECT_SIZE = env_int('YOLO_BATCH_DETECT_SIZE', 8)
+BATCH_DECODE_WORKERS = env_int('YOLO_BATCH_DECODE_WORKERS', os.cpu_count() or 4)
+BATCH_MAX_ENTRY_BYTES = env_int('YOLO_BATCH_MAX_ENTRY_BYTES', 32 * 1024 * 1024)  # larger zip entries are skipped
+
+# Tiled inference for large uploads (app.py, tiling.py)
+TILING = env_str('YOLO_TILING', 'off')  # off, auto (images at least twice the tile size) or on
+TILE_SIZE = env_int('YOLO_TILE_SIZE', 640)
+TILE_OVERLAP = env_float('YOLO_TILE_OVERLAP', 0.2)
+TILE_BATCH_SIZE = env_int('YOLO_TILE_BATCH_SIZE', 8)
+TILE_MERGE_THRESHOLD = env_float('YOLO_TILE_MERGE_THRESHOLD', 0.5)
+TILE_MERGE_METRIC = env_str('YOLO_TILE_MERGE_METRIC', 'ios')  # ios (intersection over smaller box) or iou
+TILE_FULL_IMAGE_PASS = env_bool('YOLO_TILE_FULL_IMAGE_PASS', True)
+TILE_MAX_IMAGE_PIXELS = env_int('YOLO_TILE_MAX_IMAGE_PIXELS', 40_000_000)  # larger images decode at 1/2, 1/4 or 1/8
+
+# Asynchronous job queue (app.py)
+JOB_WORKERS = env_int('YOLO_JOB_WORKERS', max(1, (os.cpu_count() or 2) // 2))
+JOB_RETENTION = env_int('YOLO_JOB_RETENTION', 1000)
+JOB_MAX_WAIT_SECONDS = env_float('YOLO_JOB_MAX_WAIT_SECONDS', 30.0)
+
+# Optional asynchronous persistence of uploads/results (app.py)
+PERSIST_FILES = env_bool('YOLO_PERSIST_FILES', False)
+PERSIST_MAX_PENDING = env_int('YOLO_PERSIST_MAX_PENDING', 64)
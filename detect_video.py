@@ -0,0 +1,294 @@
+"""Run YOLO detection over a recorded video file.
+
+Decoding, batched inference, annotation and encoding run as four concurrent
+stages connected by bounded queues, so every core stays busy and memory use
+stays flat however long the footage is.  The output is an annotated video and
+a JSONL file with one line of detections per processed frame.
+
+    python detect_video.py footage.mp4
+    python detect_video.py footage.mp4 --stride 5 --start 60 --end 600 --batch-size 16
+    python detect_video.py footage.mp4 --no-video --jsonl detections.jsonl
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+import config
+from postprocess import Detections
+
+# Marks the end of the stream on every queue
+_END = object()
+
+
+class StageCounter:
+    """Totals for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy_s = 0.0
+        self.blocked_s = 0.0  # waiting for room in the next stage's queue
+        self.started = None
+        self.finished = None
+
+    def report(self):
+        wall = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            'frames': self.frames,
+            'busy_s': round(self.busy_s, 3),
+            'blocked_s': round(self.blocked_s, 3),
+            'fps': round(self.frames / wall, 2) if wall > 0 else 0.0,
+            # Rate the stage could sustain if it never waited on its neighbours
+            'capacity_fps': round(self.frames / self.busy_s, 2) if self.busy_s > 0 else 0.0,
+            'ms_per_frame': round(self.busy_s / self.frames * 1000, 3) if self.frames else 0.0,
+        }
+
+
+class VideoDetectionPipeline:
+    """Decode -> infer (batched) -> annotate -> encode over bounded queues"""
+
+    def __init__(self, model, source, output=None, jsonl=None, stride=1, start=0.0, end=None,
+                 batch_size=8, queue_size=32, conf=0.25, iou=0.7, codec='mp4v'):
+        self.model = model
+        self.source = source
+        self.output = output
+        self.jsonl = jsonl
+        self.stride = max(1, stride)
+        self.start = start
+        self.end = end
+        self.batch_size = max(1, batch_size)
+        self.conf = conf
+        self.iou = iou
+        self.codec = codec
+
+        self.capture = cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise RuntimeError(f'Could not open video {source}')
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.total_frames = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        self.decoded = queue.Queue(maxsize=queue_size)
+        self.inferred = queue.Queue(maxsize=queue_size)
+        self.annotated = queue.Queue(maxsize=queue_size)
+        self.stages = {name: StageCounter(name) for name in ('decode', 'infer', 'annotate', 'encode')}
+        self.error = None
+        self._failed = threading.Event()
+
+    def _put(self, target, item, stage):
+        started = time.perf_counter()
+        while not self._failed.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        stage.blocked_s += time.perf_counter() - started
+
+    def _get(self, source):
+        while not self._failed.is_set():
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _run_stage(self, name, target):
+        stage = self.stages[name]
+        stage.started = time.perf_counter()
+        try:
+            target(stage)
+        except Exception as e:
+            self.error = f'{name} stage failed: {e}'
+            self._failed.set()
+        finally:
+            stage.finished = time.perf_counter()
+
+    def _decode(self, stage):
+        first = int(round(self.start * self.fps))
+        last = int(round(self.end * self.fps)) if self.end is not None else None
+        if first:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, first)
+        index = first
+        while not self._failed.is_set() and (last is None or index < last):
+            started = time.perf_counter()
+            if (index - first) % self.stride:
+                # grab() skips a frame without decoding it
+                ok = self.capture.grab()
+                frame = None
+            else:
+                ok, frame = self.capture.read()
+            stage.busy_s += time.perf_counter() - started
+            if not ok:
+                break
+            if frame is not None:
+                stage.frames += 1
+                self._put(self.decoded, (index, frame), stage)
+            index += 1
+        self.capture.release()
+        self._put(self.decoded, _END, stage)
+
+    def _infer(self, stage):
+        names = self.model.names
+        done = False
+        while not done:
+            batch = []
+            item = self._get(self.decoded)
+            while item is not _END:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.decoded.get_nowait()
+                except queue.Empty:
+                    break
+            done = item is _END
+            if batch:
+                started = time.perf_counter()
+                results = self.model([frame for _, frame in batch], conf=self.conf, iou=self.iou, verbose=False)
+                detections = [Detections.from_result(result, names) for result in results]
+                stage.busy_s += time.perf_counter() - started
+                for (index, frame), result, frame_detections in zip(batch, results, detections):
+                    stage.frames += 1
+                    self._put(self.inferred, (index, frame, result, frame_detections), stage)
+        self._put(self.inferred, _END, stage)
+
+    def _annotate(self, stage):
+        while True:
+            item = self._get(self.inferred)
+            if item is _END:
+                break
+            index, frame, result, detections = item
+            started = time.perf_counter()
+            annotated = result.plot() if self.output else None
+            record = {
+                'frame': index,
+                'time_s': round(index / self.fps, 3),
+                'detections': detections.to_list(),
+                'count': len(detections),
+            }
+            stage.busy_s += time.perf_counter() - started
+            stage.frames += 1
+            self._put(self.annotated, (annotated, record), stage)
+        self._put(self.annotated, _END, stage)
+
+    def _encode(self, stage):
+        writer = None
+        if self.output:
+            fourcc = cv2.VideoWriter_fourcc(*self.codec)
+            writer = cv2.VideoWriter(self.output, fourcc, self.fps / self.stride, (self.width, self.height))
+            if not writer.isOpened():
+                raise RuntimeError(f'Could not open {self.output} for writing')
+        jsonl = open(self.jsonl, 'w') if self.jsonl else None
+        try:
+            while True:
+                item = self._get(self.annotated)
+                if item is _END:
+                    break
+                annotated, record = item
+                started = time.perf_counter()
+                if writer is not None:
+                    writer.write(annotated)
+                if jsonl is not None:
+                    jsonl.write(json.dumps(record) + '\n')
+                stage.busy_s += time.perf_counter() - started
+                stage.frames += 1
+        finally:
+            if writer is not None:
+                writer.release()
+            if jsonl is not None:
+                jsonl.close()
+
+    def run(self, progress_every=5.0):
+        """Process the whole range and return the per-stage report"""
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._run_stage, args=(name, getattr(self, f'_{name}')),
+                             name=f'video-{name}', daemon=True)
+            for name in self.stages
+        ]
+        for thread in threads:
+            thread.start()
+        next_progress = started + progress_every
+        while any(thread.is_alive() for thread in threads):
+            threads[-1].join(0.5)
+            if progress_every and time.perf_counter() >= next_progress:
+                next_progress += progress_every
+                print(f"⏳ {self.stages['encode'].frames} frames written, "
+                      f"queues {self.decoded.qsize()}/{self.inferred.qsize()}/{self.annotated.qsize()}")
+        elapsed = time.perf_counter() - started
+
+        written = self.stages['encode'].frames
+        return {
+            'source': self.source,
+            'output': self.output,
+            'jsonl': self.jsonl,
+            'frames': written,
+            'elapsed_s': round(elapsed, 3),
+            'fps': round(written / elapsed, 2) if elapsed else 0.0,
+            'error': self.error,
+            'stages': {name: stage.report() for name, stage in self.stages.items()},
+        }
+
+
+def print_report(report):
+    print(f"\n{'stage':<10} {'frames':>7} {'fps':>8} {'capacity':>9} {'ms/frame':>9} {'busy s':>8} {'blocked s':>10}")
+    for name, stage in report['stages'].items():
+        print(f"{name:<10} {stage['frames']:>7} {stage['fps']:>8.2f} {stage['capacity_fps']:>9.2f} "
+              f"{stage['ms_per_frame']:>9.3f} {stage['busy_s']:>8.2f} {stage['blocked_s']:>10.2f}")
+    bottleneck = min(report['stages'].items(), key=lambda item: item[1]['capacity_fps'] or float('inf'))[0]
+    print(f"\n✅ {report['frames']} frames in {report['elapsed_s']:.1f}s ({report['fps']:.2f} fps), "
+          f"bottleneck: {bottleneck}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', help='Input video file')
+    parser.add_argument('--output', help='Annotated video path (default: <input>_detected.mp4)')
+    parser.add_argument('--jsonl', help='Detections JSONL path (default: <input>_detections.jsonl)')
+    parser.add_argument('--no-video', action='store_true', help='Only write the detections JSONL')
+    parser.add_argument('--stride', type=int, default=1, help='Process every Nth frame')
+    parser.add_argument('--start', type=float, default=0.0, help='Start time in seconds')
+    parser.add_argument('--end', type=float, help='End time in seconds')
+    parser.add_argument('--batch-size', type=int, default=config.BATCH_DETECT_SIZE)
+    parser.add_argument('--queue-size', type=int, default=32, help='Frames buffered between stages')
+    parser.add_argument('--conf', type=float, default=config.DETECTION_CONF)
+    parser.add_argument('--iou', type=float, default=config.DETECTION_IOU)
+    parser.add_argument('--codec', default='mp4v', help='FourCC of the output video')
+    parser.add_argument('--report', help='Also write the per-stage report as JSON to this file')
+    args = parser.parse_args()
+
+    stem = os.path.splitext(args.video)[0]
+    output = None if args.no_video else (args.output or f'{stem}_detected.mp4')
+    jsonl = args.jsonl or f'{stem}_detections.jsonl'
+
+    from backends import load_configured_backend
+    model = load_configured_backend()
+    print(f"🧠 Model {model.name} loaded")
+
+    pipeline = VideoDetectionPipeline(
+        model, args.video, output=output, jsonl=jsonl, stride=args.stride, start=args.start, end=args.end,
+        batch_size=args.batch_size, queue_size=args.queue_size, conf=args.conf, iou=args.iou, codec=args.codec,
+    )
+    print(f"🎬 {args.video}: {pipeline.width}x{pipeline.height} @ {pipeline.fps:.1f} fps, "
+          f"{pipeline.total_frames} frames, stride {pipeline.stride}, batch {pipeline.batch_size}")
+    report = pipeline.run()
+    print_report(report)
+    if output:
+        print(f"💾 Annotated video: {output}")
+    print(f"💾 Detections: {jsonl}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    if report['error']:
+        raise SystemExit(f"❌ {report['error']}")
+
+
+if __name__ == '__main__':
+    main()
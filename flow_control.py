@@ -0,0 +1,105 @@
+"""Per-client flow control for streamed frames.
+
+Each client (keyed by its Socket.IO ``sid``) may have at most one frame in
+flight.  Frames that arrive while the client is busy go into a one-slot
+"latest" buffer; a newer frame replaces an older buffered one, which is
+counted as dropped.  Latency therefore stays bounded by one inference instead
+of growing with the backlog.
+"""
+import threading
+import time
+
+
+class _ClientState:
+    __slots__ = ('in_flight', 'pending', 'received', 'processed', 'dropped', 'connected_at')
+
+    def __init__(self):
+        self.in_flight = False
+        self.pending = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.connected_at = time.time()
+
+
+class FrameGate:
+    """Latest-frame-wins admission control keyed by client id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._dropped_total = 0
+        self._processed_total = 0
+
+    def offer(self, client_id, frame):
+        """Admit a frame; return it if the caller should process it now, else None
+
+        When None is returned the frame was parked in the client's latest slot
+        (replacing, and dropping, any frame that was already waiting there).
+        """
+        with self._lock:
+            state = self._clients.get(client_id)
+            if state is None:
+                state = self._clients[client_id] = _ClientState()
+            state.received += 1
+            if not state.in_flight:
+                state.in_flight = True
+                return frame
+            if state.pending is not None:
+                state.dropped += 1
+                self._dropped_total += 1
+            state.pending = frame
+            return None
+
+    def finish(self, client_id):
+        """Mark the in-flight frame done and return the buffered frame to process next, if any"""
+        with self._lock:
+            state = self._clients.get(client_id)
+            if state is None:
+                return None
+            state.processed += 1
+            self._processed_total += 1
+            frame, state.pending = state.pending, None
+            if frame is None:
+                state.in_flight = False
+            return frame
+
+    def is_busy(self, client_id):
+        """Return True while the client has a frame in flight"""
+        with self._lock:
+            state = self._clients.get(client_id)
+            return state is not None and state.in_flight
+
+    def dropped(self, client_id):
+        """Return how many of a client's frames were replaced before processing"""
+        with self._lock:
+            state = self._clients.get(client_id)
+            return state.dropped if state is not None else 0
+
+    def remove(self, client_id):
+        """Forget a disconnected client and discard its buffered frame"""
+        with self._lock:
+            state = self._clients.pop(client_id, None)
+            if state is not None and state.pending is not None:
+                state.dropped += 1
+                self._dropped_total += 1
+
+    def stats(self):
+        """Return aggregate and per-client frame counters"""
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'in_flight': sum(1 for state in self._clients.values() if state.in_flight),
+                'processed_total': self._processed_total,
+                'dropped_total': self._dropped_total,
+                'per_client': {
+                    client_id: {
+                        'received': state.received,
+                        'processed': state.processed,
+                        'dropped': state.dropped,
+                        'in_flight': state.in_flight,
+                        'pending': state.pending is not None,
+                    }
+                    for client_id, state in self._clients.items()
+                },
+            }
@@ -0,0 +1,555 @@
+"""Capture -> detect -> render pipeline on a preallocated frame ring buffer.
+
+Frames are captured straight into preallocated ring slots
+(``VideoCapture.read`` writes into the slot's array), and the detect and
+render stages are woken by a condition variable when a newer frame is
+committed, so there is no sleep-polling and no per-frame frame copies.  Each
+stage always takes the newest frame; a slow stage simply skips frames.
+
+The pipeline has no Tk dependency and can run headless from a camera, a video
+file or a folder of images, reporting per-stage throughput and latency:
+
+    python frame_pipeline.py --source footage.mp4 --frames 500
+    python frame_pipeline.py --source images/ --no-model
+"""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from postprocess import Detections
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+class FrameRef:
+    """A committed ring slot held by a reader until released"""
+
+    __slots__ = ('index', 'seq', 'timestamp', 'frame')
+
+    def __init__(self, index, seq, timestamp, frame):
+        self.index = index
+        self.seq = seq
+        self.timestamp = timestamp
+        self.frame = frame
+
+
+class FrameRingBuffer:
+    """Fixed set of preallocated frame slots with condition-variable handoff"""
+
+    def __init__(self, shape, num_slots=4, dtype=np.uint8):
+        # One slot being written, the newest committed one, and one per reader
+        self.num_slots = max(3, num_slots)
+        self.shape = tuple(shape)
+        self.slots = [np.empty(shape, dtype=dtype) for _ in range(self.num_slots)]
+        self._timestamps = [0.0] * self.num_slots
+        self._seqs = [0] * self.num_slots
+        self._readers = [0] * self.num_slots
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._newest = -1
+        self._next_write = 0
+        self._closed = False
+
+    @property
+    def seq(self):
+        return self._seq
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _free_slot(self):
+        for offset in range(self.num_slots):
+            index = (self._next_write + offset) % self.num_slots
+            if self._readers[index] == 0 and index != self._newest:
+                return index
+        return None
+
+    def acquire_write(self):
+        """Return (index, array) of a slot no reader holds; the caller fills it in place"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or self._free_slot() is not None)
+            if self._closed:
+                return None, None
+            index = self._free_slot()
+            self._next_write = (index + 1) % self.num_slots
+            return index, self.slots[index]
+
+    def commit(self, index, timestamp=None):
+        """Publish a filled slot as the newest frame and wake the readers"""
+        with self._cond:
+            self._seq += 1
+            self._seqs[index] = self._seq
+            self._timestamps[index] = time.perf_counter() if timestamp is None else timestamp
+            self._newest = index
+            self._cond.notify_all()
+
+    def acquire_read(self, min_seq=1, timeout=None):
+        """Wait for a frame with seq >= min_seq and hold the newest one; None on timeout/close"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self._seq >= min_seq, timeout):
+                return None
+            if self._newest < 0 or self._seq < min_seq:
+                return None
+            index = self._newest
+            self._readers[index] += 1
+            return FrameRef(index, self._seqs[index], self._timestamps[index], self.slots[index])
+
+    def release(self, ref):
+        """Give a held slot back to the writer"""
+        with self._cond:
+            self._readers[ref.index] -= 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Rolling throughput and latency of one pipeline stage"""
+
+    def __init__(self, name, window=120):
+        self.name = name
+        self.count = 0
+        self._stamps = deque(maxlen=window)
+        self._busy = deque(maxlen=window)
+        self._latency = deque(maxlen=window)
+
+    def record(self, busy_s, latency_s=None):
+        self.count += 1
+        self._stamps.append(time.perf_counter())
+        self._busy.append(busy_s)
+        if latency_s is not None:
+            self._latency.append(latency_s)
+
+    def fps(self):
+        stamps = list(self._stamps)
+        if len(stamps) < 2 or stamps[-1] == stamps[0]:
+            return 0.0
+        return (len(stamps) - 1) / (stamps[-1] - stamps[0])
+
+    def snapshot(self):
+        busy = np.array(self._busy, dtype=np.float64) * 1000
+        latency = np.array(self._latency, dtype=np.float64) * 1000
+        data = {
+            'frames': self.count,
+            'fps': round(self.fps(), 2),
+            'busy_ms_avg': round(float(busy.mean()), 3) if busy.size else 0.0,
+        }
+        if latency.size:
+            data['latency_ms_p50'] = round(float(np.percentile(latency, 50)), 3)
+            data['latency_ms_p95'] = round(float(np.percentile(latency, 95)), 3)
+        return data
+
+
+class CameraSource:
+    """Live camera (device index) capture"""
+
+    def __init__(self, index, width=640, height=480, fps=30):
+        self.name = f'camera:{index}'
+        self.capture = cv2.VideoCapture(index)
+        if self.capture.isOpened():
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            self.capture.set(cv2.CAP_PROP_FPS, fps)
+
+    def is_opened(self):
+        return self.capture.isOpened()
+
+    def probe_shape(self):
+        """Read one frame to learn the frame shape"""
+        ok, frame = self.capture.read()
+        return frame.shape if ok else None
+
+    def read_into(self, buffer):
+        ok, frame = self.capture.read(buffer)
+        if ok and frame is not buffer:
+            # Driver returned a different size; fit it into the slot
+            cv2.resize(frame, (buffer.shape[1], buffer.shape[0]), dst=buffer)
+        return ok
+
+    def release(self):
+        self.capture.release()
+
+
+class VideoFileSource(CameraSource):
+    """Video file capture, optionally paced at the file's frame rate"""
+
+    def __init__(self, path, realtime=False, loop=False):
+        self.name = f'video:{path}'
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        self.loop = loop
+        self.interval = 0.0
+        if realtime:
+            fps = self.capture.get(cv2.CAP_PROP_FPS) or 30
+            self.interval = 1.0 / fps
+        self._next_at = 0.0
+
+    def probe_shape(self):
+        shape = super().probe_shape()
+        self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return shape
+
+    def read_into(self, buffer):
+        if self.interval:
+            delay = self._next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_at = max(self._next_at, time.perf_counter()) + self.interval
+        ok = super().read_into(buffer)
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok = super().read_into(buffer)
+        return ok
+
+
+class ImageFolderSource:
+    """Folder of still images played back as a frame sequence"""
+
+    def __init__(self, folder, loop=False):
+        self.name = f'images:{folder}'
+        self.paths = sorted(
+            path for path in glob.glob(os.path.join(folder, '**', '*'), recursive=True)
+            if path.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.loop = loop
+        self._position = 0
+
+    def is_opened(self):
+        return bool(self.paths)
+
+    def probe_shape(self):
+        for path in self.paths:
+            image = cv2.imread(path)
+            if image is not None:
+                return image.shape
+        return None
+
+    def read_into(self, buffer):
+        while True:
+            if self._position >= len(self.paths):
+                if not self.loop or not self.paths:
+                    return False
+                self._position = 0
+            image = cv2.imread(self.paths[self._position])
+            self._position += 1
+            if image is None:
+                continue
+            if image.shape == buffer.shape:
+                np.copyto(buffer, image)
+            else:
+                cv2.resize(image, (buffer.shape[1], buffer.shape[0]), dst=buffer)
+            return True
+
+    def release(self):
+        pass
+
+
+def open_source(spec, realtime=False, loop=False):
+    """Open a device index, video file or image folder from a command-line style spec"""
+    if str(spec).isdigit():
+        return CameraSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageFolderSource(spec, loop=loop)
+    return VideoFileSource(spec, realtime=realtime, loop=loop)
+
+
+class DetectionPipeline:
+    """Capture, detect and render threads sharing one frame ring buffer"""
+
+    def __init__(self, source, frame_shape, model_getter, confidence_threshold=0.5,
+                 input_size=416, detect_every=1, num_slots=4, controller=None, tracker=None,
+                 motion_gate=None, roi_set=None, metrics=None,
+                 on_detections=None, on_inference=None, annotate=None, on_render=None, render=True):
+        self.source = source
+        self.ring = FrameRingBuffer(frame_shape, num_slots)
+        # model_getter() returns the model, or None while it is still loading
+        self.model_getter = model_getter
+        self.confidence_threshold = confidence_threshold
+        self.input_size = input_size
+        self.detect_every = max(1, int(detect_every))
+        # Optional AdaptiveController that picks input_size/detect_every from measured latency
+        self.controller = controller
+        if controller is not None:
+            self.input_size, self.detect_every = controller.input_size, controller.detect_every
+        # Optional MotionGate: frames without motion keep the previous detections
+        self.motion_gate = motion_gate
+        # Optional IoUTracker: adds track ids and predicts boxes between detector runs
+        self.tracker = tracker
+        # Optional roi.RoiSet: when it has regions only their crops are inferred, as one batch
+        self.roi_set = roi_set
+        # Optional MetricsRegistry receiving resize/inference/postprocess timings
+        self.metrics = metrics
+        self.on_detections = on_detections
+        self.on_inference = on_inference
+        self.annotate = annotate
+        self.on_render = on_render
+        self.render = render
+
+        self.stats = {name: StageStats(name) for name in ('capture', 'detect', 'render')}
+        self.latest_detections = []
+        self.detections_version = 0
+        self._detections_lock = threading.Lock()
+
+        self._input_buffer = np.empty((input_size, input_size, 3), dtype=np.uint8)
+        self._display_buffer = np.empty(frame_shape, dtype=np.uint8)
+        self._detect_active = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self, detect=False):
+        if detect:
+            self._detect_active.set()
+        stages = [('capture', self._capture_loop), ('detect', self._detect_loop)]
+        if self.render:
+            stages.append(('render', self._render_loop))
+        for name, target in stages:
+            thread = threading.Thread(target=target, name=f'pipeline-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopped.set()
+        self._detect_active.set()
+        self.ring.close()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    @property
+    def running(self):
+        return not self._stopped.is_set() and not self.ring.closed
+
+    def set_detection_active(self, active):
+        if active:
+            self._detect_active.set()
+        else:
+            self._detect_active.clear()
+            if self.tracker is not None:
+                self.tracker.reset()
+            if self.motion_gate is not None:
+                self.motion_gate.reset()
+            with self._detections_lock:
+                self.latest_detections = []
+                self.detections_version += 1
+
+    def get_detections(self, timestamp=None):
+        """Return (version, detections) of the most recent pass, or tracker predictions at timestamp"""
+        with self._detections_lock:
+            version, detections = self.detections_version, self.latest_detections
+        if self.tracker is None or timestamp is None or not detections or not self.tracker.moving:
+            return version, detections
+        return (version, timestamp), self.tracker.predict(timestamp)
+
+    def _capture_loop(self):
+        try:
+            while not self._stopped.is_set():
+                index, buffer = self.ring.acquire_write()
+                if index is None:
+                    break
+                started = time.perf_counter()
+                if not self.source.read_into(buffer):
+                    break
+                captured = time.perf_counter()
+                self.ring.commit(index, captured)
+                self.stats['capture'].record(captured - started)
+        finally:
+            # End of source: wake and stop the other stages
+            self.ring.close()
+
+    def _detect_loop(self):
+        last_seq = 0
+        while not self._stopped.is_set() and not self.ring.closed:
+            if not self._detect_active.wait(0.2):
+                continue
+            model = self.model_getter()
+            if model is None:
+                time.sleep(0.1)
+                continue
+
+            ref = self.ring.acquire_read(last_seq + self.detect_every, timeout=0.5)
+            if ref is None:
+                continue
+            started = time.perf_counter()
+            if self.motion_gate is not None and not self.motion_gate.should_infer(ref.frame, ref.timestamp):
+                last_seq = ref.seq
+                self.ring.release(ref)
+                continue
+            try:
+                size = self.input_size
+                resize_started = time.perf_counter()
+                crops = None
+                if self.roi_set:
+                    crops = self.roi_set.crop(ref.frame, size)
+                else:
+                    if self._input_buffer.shape[0] != size:
+                        self._input_buffer = np.empty((size, size, 3), dtype=np.uint8)
+                    cv2.resize(ref.frame, (size, size), dst=self._input_buffer)
+                resize_s = time.perf_counter() - resize_started
+                height, width = ref.frame.shape[:2]
+                captured_at = ref.timestamp
+                last_seq = ref.seq
+            finally:
+                self.ring.release(ref)
+
+            try:
+                inference_started = time.perf_counter()
+                if crops is not None:
+                    results = model(crops.crops, verbose=False, conf=self.confidence_threshold, imgsz=crops.size)
+                else:
+                    results = model(self._input_buffer, verbose=False, conf=self.confidence_threshold, imgsz=size)
+                inference_ms = (time.perf_counter() - inference_started) * 1000
+                if self.on_inference is not None:
+                    self.on_inference(inference_ms)
+                if self.motion_gate is not None:
+                    self.motion_gate.record_inference(inference_ms)
+                if self.controller is not None:
+                    capture_fps = self.stats['capture'].fps()
+                    self.input_size, self.detect_every = self.controller.record(
+                        inference_ms, frame_interval_ms=1000 / capture_fps if capture_fps else None)
+                postprocess_started = time.perf_counter()
+                if crops is not None:
+                    detections = self.roi_set.merge(crops, results, model.names, self.confidence_threshold, size)
+                else:
+                    detections = (Detections.from_result(results[0], model.names)
+                                  .filter(self.confidence_threshold)
+                                  .rescale(width / size, height / size)
+                                  .to_list())
+            except Exception as e:
+                if self.metrics is not None:
+                    self.metrics.error('detection')
+                print(f"Detection error: {e}")
+                continue
+
+            if not self._detect_active.is_set():
+                continue
+            if self.tracker is not None:
+                detections = self.tracker.update(detections, captured_at)
+            if self.metrics is not None:
+                self.metrics.observe('resize', resize_s)
+                self.metrics.observe('inference', inference_ms / 1000)
+                self.metrics.observe('postprocess', time.perf_counter() - postprocess_started)
+            with self._detections_lock:
+                self.latest_detections = detections
+                self.detections_version += 1
+            finished = time.perf_counter()
+            self.stats['detect'].record(finished - started, finished - captured_at)
+            if self.on_detections is not None:
+                self.on_detections(detections)
+
+    def _render_loop(self):
+        last_seq = 0
+        while not self._stopped.is_set():
+            ref = self.ring.acquire_read(last_seq + 1, timeout=0.5)
+            if ref is None:
+                if self.ring.closed:
+                    break
+                continue
+            started = time.perf_counter()
+            try:
+                np.copyto(self._display_buffer, ref.frame)
+                captured_at = ref.timestamp
+                last_seq = ref.seq
+            finally:
+                self.ring.release(ref)
+
+            if self.annotate is not None:
+                _, detections = self.get_detections(captured_at)
+                if detections:
+                    self.annotate(self._display_buffer, detections)
+            if self.on_render is not None:
+                self.on_render(self._display_buffer)
+            finished = time.perf_counter()
+            self.stats['render'].record(finished - started, finished - captured_at)
+
+    def report(self):
+        """Per-stage throughput and latency"""
+        report = {name: stage.snapshot() for name, stage in self.stats.items()}
+        if self.motion_gate is not None:
+            report['motion'] = self.motion_gate.stats()
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default='0', help='Camera index, video file or image folder')
+    parser.add_argument('--frames', type=int, default=0, help='Stop after this many captured frames')
+    parser.add_argument('--seconds', type=float, default=0, help='Stop after this many seconds')
+    parser.add_argument('--input-size', type=int, default=416)
+    parser.add_argument('--detect-every', type=int, default=1, help='Run detection on every Nth frame at most')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Adapt input size and detection interval to YOLO_ADAPTIVE_TARGET_LATENCY_MS')
+    parser.add_argument('--confidence', type=float, default=0.5)
+    parser.add_argument('--motion-gate', action='store_true',
+                        help='Skip inference on frames without motion (YOLO_MOTION_* settings)')
+    parser.add_argument('--no-model', action='store_true', help='Benchmark capture and render only')
+    parser.add_argument('--realtime', action='store_true', help='Pace video files at their native frame rate')
+    parser.add_argument('--loop', action='store_true', help='Loop video files and image folders')
+    args = parser.parse_args()
+
+    source = open_source(args.source, realtime=args.realtime, loop=args.loop)
+    if not source.is_opened():
+        raise SystemExit(f"❌ Could not open source {args.source}")
+    shape = source.probe_shape()
+    if shape is None:
+        raise SystemExit(f"❌ Could not read a frame from {args.source}")
+
+    model = None
+    if not args.no_model:
+        from backends import load_configured_backend
+        model = load_configured_backend()
+
+    motion_gate = None
+    if args.motion_gate:
+        from motion_gate import create_gate
+        motion_gate = create_gate()
+
+    controller = None
+    if args.adaptive:
+        from adaptive_control import create_controller
+        controller = create_controller(initial_size=args.input_size, initial_detect_every=args.detect_every)
+
+    pipeline = DetectionPipeline(
+        source, shape, lambda: model,
+        confidence_threshold=args.confidence,
+        input_size=args.input_size,
+        detect_every=args.detect_every,
+        controller=controller,
+        motion_gate=motion_gate,
+    )
+    print(f"▶️ {source.name} {shape[1]}x{shape[0]}, detection {'off' if model is None else 'on'}")
+    started = time.perf_counter()
+    pipeline.start(detect=model is not None)
+    try:
+        while pipeline.running:
+            time.sleep(0.1)
+            if args.frames and pipeline.stats['capture'].count >= args.frames:
+                break
+            if args.seconds and time.perf_counter() - started >= args.seconds:
+                break
+    except KeyboardInterrupt:
+        pass
+    pipeline.stop()
+    pipeline.join(2)
+    source.release()
+
+    report = pipeline.report()
+    report['elapsed_s'] = round(time.perf_counter() - started, 3)
+    if controller is not None:
+        report['adaptive'] = controller.decisions()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,26 @@
+# Imported first so startup timings start before the heavier imports below
+from model_manager import ModelManager, parse_shapes, with_input_sizes
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import cv2
-from PIL import Image, ImageTk
-import numpy as np
-from ultralytics import YOLO
-import threading
-import time
+
+import codec
+import config
+from adaptive_control import create_controller
+from backends import load_configured_backend
+from frame_pipeline import CameraSource, DetectionPipeline, open_source
+from history_store import create_store
+from metrics import create_registry
+from motion_gate import create_gate
+from multi_source import MultiSourceEngine
+from render_scheduler import GridRenderScheduler, RenderScheduler
+from roi import Region, RoiSet, combined_stats, format_regions, parse_regions
+from tracker import IoUTracker
 
 class ObjectDetectionGUI:
+    # Shorter labels than the web app (one decimal, smaller font) with cached sprites
+    annotator = codec.Annotator(font_scale=0.5, text_thickness=1, label_padding=5, text_offset=2,
+                                box_scale=3, min_box_thickness=1, confidence_digits=1)
+    
     def __init__(self, root):
         self.root = root
         self.root.title("🔍 Real-Time YOLO Object Detection")
@@ -16,36 +29,82 @@ class ObjectDetectionGUI:
         
         # Initialize variables
         self.camera = None
+        self.pipeline = None
+        self.engine = None
+        self.renderer = None
         self.detection_active = False
         self.model = None
-        self.current_frame = None
         self.latest_detections = []
         
         # Performance optimization variables
-        self.frame_skip_counter = 0
         self.frame_skip_interval = 2  # Process every 3rd frame for detection
         self.confidence_threshold = 0.5  # Only show detections above 50% confidence
-        self.detection_fps_counter = 0
-        self.detection_fps_start_time = time.time()
-        self.last_detection_time = 0
         
-        # Initialize YOLO model
-        self.load_model()
+        # Adapts the detection interval and model input size to the measured latency
+        self.controller = create_controller(initial_detect_every=self.frame_skip_interval + 1)
+        
+        # Reuses the previous detections while the scene is static
+        self.motion_gate = create_gate()
+        
+        # Per-stage latency histograms shown in a compact overlay on the video
+        self.metrics = create_registry()
+        
+        # Appends every detection pass to the on-disk detection history
+        self.history = create_store()
+        
+        # Regions of interest by source index ('0', '1', ...; None for every source)
+        try:
+            self.roi_regions = parse_regions(config.ROI_REGIONS)
+        except ValueError as e:
+            print(f"⚠️ Ignoring YOLO_ROI_REGIONS: {e}")
+            self.roi_regions = {}
+        self._roi_drag_start = None
+        
+        # Gives objects stable IDs and predicts their boxes on frames between detections
+        self.tracker = None
+        if config.TRACKING_ENABLED:
+            self.tracker = IoUTracker(
+                iou_threshold=config.TRACKING_IOU,
+                max_missed=config.TRACKING_MAX_MISSED,
+                max_predict_seconds=config.TRACKING_MAX_PREDICT_SECONDS,
+            )
         
         # Create GUI
         self.create_widgets()
         
-        # Camera thread
-        self.camera_thread = None
-        self.detection_thread = None
+        # Load YOLO model in the background so the window appears immediately
+        self.model_manager = ModelManager(
+            load_configured_backend,
+            warmup_shapes=with_input_sizes(parse_shapes(config.MODEL_WARMUP_SHAPES),
+                                           self.controller.reachable_sizes()),
+            warmup_runs=config.MODEL_WARMUP_RUNS,
+            on_ready=self.on_model_ready,
+        )
+        self.load_model()
         
     def load_model(self):
-        """Load YOLO model"""
-        try:
-            self.model = YOLO('yolov8n.pt')
-            print("✅ YOLO model loaded successfully")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load YOLO model: {str(e)}")
+        """Start loading the YOLO model and poll its loading phase"""
+        self.model_manager.start()
+        self.update_model_status()
+        
+    def on_model_ready(self, model):
+        """Called from the loading thread once the model is warmed up"""
+        self.model = model
+        self.annotator.preload(model.names)
+        print(f"✅ YOLO model loaded successfully ({model.name})")
+        
+    def update_model_status(self):
+        """Show the model loading phase until it is ready or has failed"""
+        status = self.model_manager.status()
+        if status['ready']:
+            ready_at = status['milestones'].get('ready_at_s', 0)
+            self.model_status_label.config(text=f"Model: ready ({ready_at:.1f}s)")
+        elif status['phase'] == 'failed':
+            self.model_status_label.config(text="Model: failed")
+            messagebox.showerror("Error", f"Failed to load YOLO model: {status['error']}")
+        else:
+            self.model_status_label.config(text=f"Model: {status['phase']}...")
+            self.root.after(200, self.update_model_status)
             
     def create_widgets(self):
         """Create GUI widgets"""
@@ -72,9 +131,16 @@ class ObjectDetectionGUI:
         
         self.camera_var = tk.StringVar(value="0")
         camera_combo = ttk.Combobox(camera_frame, textvariable=self.camera_var, 
-                                   values=["0", "1", "2"], width=5)
+                                   values=["0", "1", "2", "0,1", "0,1,2,3"], width=12)
         camera_combo.pack(side=tk.LEFT, padx=(5, 0))
         
+        # Several comma-separated sources share one model and are shown as a grid
+        add_video_button = tk.Button(camera_frame, text="📂 Add Video", 
+                                     command=self.add_video_source,
+                                     bg='#7f8c8d', fg='white', 
+                                     font=('Arial', 10, 'bold'))
+        add_video_button.pack(side=tk.LEFT, padx=(5, 0))
+        
         # Performance controls
         perf_frame = tk.Frame(control_frame, bg='#34495e')
         perf_frame.pack(side=tk.LEFT, padx=10, pady=10)
@@ -89,6 +155,24 @@ class ObjectDetectionGUI:
                                   bg='#34495e', fg='white', length=100)
         confidence_scale.pack(side=tk.LEFT, padx=(5, 0))
         
+        # Regions of interest: typed as [source@]name=x1,y1,x2,y2;... or dragged on the video
+        roi_frame = tk.Frame(control_frame, bg='#34495e')
+        roi_frame.pack(side=tk.LEFT, padx=10, pady=10)
+        
+        tk.Label(roi_frame, text="ROIs:", font=('Arial', 10, 'bold'), 
+                fg='white', bg='#34495e').pack(side=tk.LEFT)
+        
+        self.roi_var = tk.StringVar(value=format_regions(self.roi_regions))
+        roi_entry = tk.Entry(roi_frame, textvariable=self.roi_var, width=28)
+        roi_entry.pack(side=tk.LEFT, padx=(5, 0))
+        roi_entry.bind('<Return>', lambda event: self.apply_roi_text())
+        
+        apply_roi_button = tk.Button(roi_frame, text="Apply", 
+                                     command=self.apply_roi_text,
+                                     bg='#7f8c8d', fg='white', 
+                                     font=('Arial', 10, 'bold'))
+        apply_roi_button.pack(side=tk.LEFT, padx=(5, 0))
+        
         # Control buttons
         button_frame = tk.Frame(control_frame, bg='#34495e')
         button_frame.pack(side=tk.RIGHT, padx=10, pady=10)
@@ -122,6 +206,16 @@ class ObjectDetectionGUI:
         self.video_label = tk.Label(video_frame, text="Click 'Start Camera' to begin", 
                                    font=('Arial', 16), fg='white', bg='#34495e')
         self.video_label.pack(expand=True)
+        # Drag to add a region of interest, right-click to clear a source's regions
+        self.video_label.bind('<ButtonPress-1>', self.on_roi_press)
+        self.video_label.bind('<ButtonRelease-1>', self.on_roi_release)
+        self.video_label.bind('<Button-3>', self.on_roi_clear)
+        
+        # Stage latency overlay in the top-left corner of the video
+        self.metrics_label = None
+        if self.metrics.enabled and config.GUI_METRICS_OVERLAY:
+            self.metrics_label = tk.Label(video_frame, text="", justify=tk.LEFT,
+                                          font=('Courier', 9), fg='#ecf0f1', bg='#2c3e50')
         
         # Detection info frame
         info_frame = tk.Frame(main_frame, bg='#34495e', relief=tk.RAISED, bd=2)
@@ -147,6 +241,31 @@ class ObjectDetectionGUI:
                                           fg='white', bg='#34495e')
         self.detection_fps_label.pack(side=tk.TOP)
         
+        self.display_fps_label = tk.Label(perf_info_frame, text="Display FPS: 0", 
+                                         font=('Arial', 10, 'bold'), 
+                                         fg='white', bg='#34495e')
+        self.display_fps_label.pack(side=tk.TOP)
+        
+        self.adaptive_label = tk.Label(perf_info_frame, text="Input: -", 
+                                      font=('Arial', 10, 'bold'), 
+                                      fg='white', bg='#34495e')
+        self.adaptive_label.pack(side=tk.TOP)
+        
+        self.motion_label = tk.Label(perf_info_frame, text="Motion skip: -", 
+                                    font=('Arial', 10, 'bold'), 
+                                    fg='white', bg='#34495e')
+        self.motion_label.pack(side=tk.TOP)
+        
+        self.roi_label = tk.Label(perf_info_frame, text="ROIs: full frame", 
+                                 font=('Arial', 10, 'bold'), 
+                                 fg='white', bg='#34495e')
+        self.roi_label.pack(side=tk.TOP)
+        
+        self.model_status_label = tk.Label(perf_info_frame, text="Model: loading...", 
+                                          font=('Arial', 10, 'bold'), 
+                                          fg='white', bg='#34495e')
+        self.model_status_label.pack(side=tk.TOP)
+        
         # Detection list
         self.detection_listbox = tk.Listbox(info_frame, height=4, 
                                            font=('Arial', 10), bg='#2c3e50', fg='white')
@@ -155,41 +274,76 @@ class ObjectDetectionGUI:
     def update_confidence_threshold(self, value):
         """Update confidence threshold for detection filtering"""
         self.confidence_threshold = float(value)
+        if self.pipeline:
+            self.pipeline.confidence_threshold = self.confidence_threshold
+        if self.engine:
+            self.engine.confidence_threshold = self.confidence_threshold
         print(f"Confidence threshold updated to: {self.confidence_threshold}")
         
+    def add_video_source(self):
+        """Append a video file to the list of sources"""
+        path = filedialog.askopenfilename(
+            title="Select video",
+            filetypes=[("Video files", "*.mp4 *.avi *.mov *.mkv"), ("All files", "*.*")])
+        if path:
+            current = self.camera_var.get().strip()
+            self.camera_var.set(f"{current},{path}" if current else path)
+            
     def start_camera(self):
         """Start camera capture"""
+        specs = [spec.strip() for spec in self.camera_var.get().split(',') if spec.strip()]
+        if len(specs) > 1 or (specs and not specs[0].isdigit()):
+            self.start_sources(specs)
+            return
         try:
             camera_index = int(self.camera_var.get())
-            self.camera = cv2.VideoCapture(camera_index)
+            source = CameraSource(camera_index)
             
-            if not self.camera.isOpened():
+            if not source.is_opened():
                 # Try alternative camera indices
                 for alt_index in [0, 1, 2]:
                     if alt_index != camera_index:
-                        self.camera = cv2.VideoCapture(alt_index)
-                        if self.camera.isOpened():
+                        source = CameraSource(alt_index)
+                        if source.is_opened():
                             print(f"✅ Camera {alt_index} opened successfully")
                             break
                 else:
                     messagebox.showerror("Error", "Could not open any camera. Please check your camera connection.")
                     return
-                
-            # Set camera properties
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.camera.set(cv2.CAP_PROP_FPS, 30)
             
-            # Test camera by reading one frame
-            ret, test_frame = self.camera.read()
-            if not ret:
+            # Test camera by reading one frame; its shape sizes the ring buffer slots
+            frame_shape = source.probe_shape()
+            if frame_shape is None:
                 messagebox.showerror("Error", "Camera is not responding properly")
-                self.camera.release()
+                source.release()
                 return
             
-            # Start camera thread
-            self.camera_thread = threading.Thread(target=self.camera_loop, daemon=True)
-            self.camera_thread.start()
+            self.camera = source
+            self.pipeline = DetectionPipeline(
+                source, frame_shape, lambda: self.model,
+                confidence_threshold=self.confidence_threshold,
+                detect_every=self.frame_skip_interval + 1,  # Process every 3rd frame for detection
+                controller=self.controller,
+                tracker=self.tracker,
+                motion_gate=self.motion_gate,
+                roi_set=RoiSet(self.regions_for(0), config.ROI_MERGE_THRESHOLD),
+                metrics=self.metrics,
+                on_detections=self.on_detections,
+                on_inference=self.model_manager.record_inference,
+                render=False,
+            )
+            self.pipeline.start(detect=self.detection_active)
+            
+            # Frames are shown from the Tk main thread at a capped rate
+            self.renderer = RenderScheduler(
+                self.root, self.video_label, self.pipeline.ring,
+                self.pipeline.get_detections, self.draw_detections,
+                max_fps=config.GUI_DISPLAY_FPS,
+                metrics=self.metrics,
+            )
+            self.apply_regions()
+            self.renderer.start()
+            self.update_pipeline_stats()
             
             # Update button states
             self.start_button.config(state=tk.DISABLED)
@@ -201,21 +355,85 @@ class ObjectDetectionGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start camera: {str(e)}")
             
-    def stop_camera(self):
-        """Stop camera capture"""
-        self.detection_active = False
-        
+    def start_sources(self, specs):
+        """Start several cameras/video files feeding one shared batched model"""
+        try:
+            self.engine = MultiSourceEngine(
+                lambda: self.model,
+                confidence_threshold=self.confidence_threshold,
+                max_batch_size=config.MULTI_SOURCE_MAX_BATCH,
+                controller=self.controller,
+                metrics=self.metrics,
+                on_detections=self.on_feed_detections,
+                on_inference=self.model_manager.record_inference,
+            )
+            for spec in specs:
+                source = open_source(spec, realtime=True, loop=True)
+                frame_shape = source.probe_shape() if source.is_opened() else None
+                if frame_shape is None:
+                    source.release()
+                    raise RuntimeError(f"Could not read from source {spec}")
+                feed = self.engine.add_source(source, frame_shape)
+                feed.roi_set = RoiSet(self.regions_for(feed.feed_id), config.ROI_MERGE_THRESHOLD)
+                print(f"✅ Source {spec} opened ({frame_shape[1]}x{frame_shape[0]})")
+            self.feed_detections = {}
+            self.engine.start(detect=self.detection_active)
+            
+            # All sources are tiled into one image on the Tk main thread
+            self.renderer = GridRenderScheduler(
+                self.root, self.video_label,
+                [(feed.ring, feed.get_detections) for feed in self.engine.feeds],
+                self.draw_detections,
+                max_fps=config.GUI_DISPLAY_FPS,
+                size=(960, 720),
+                metrics=self.metrics,
+            )
+            self.apply_regions()
+            self.renderer.start()
+            self.update_pipeline_stats()
+            
+            # Update button states
+            self.start_button.config(state=tk.DISABLED)
+            self.stop_button.config(state=tk.NORMAL)
+            self.detect_button.config(state=tk.NORMAL)
+            
+            print(f"✅ {len(specs)} sources started")
+            
+        except Exception as e:
+            self.stop_pipeline()
+            messagebox.showerror("Error", f"Failed to start sources: {str(e)}")
+            
+    def stop_pipeline(self):
+        """Stop the capture pipeline and release the camera"""
+        if self.renderer:
+            self.renderer.stop()
+            self.renderer = None
+        if self.pipeline:
+            self.pipeline.stop()
+            self.pipeline.join(1)
+            self.pipeline = None
+        if self.engine:
+            self.engine.stop()
+            self.engine.join(1)
+            self.engine = None
         if self.camera:
             self.camera.release()
             self.camera = None
             
+    def stop_camera(self):
+        """Stop camera capture"""
+        self.detection_active = False
+        self.stop_pipeline()
+            
         # Update button states
         self.start_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
-        self.detect_button.config(state=tk.DISABLED)
+        self.detect_button.config(state=tk.DISABLED, text="🔍 Start Detection", bg='#3498db')
         
         # Clear video display
         self.video_label.config(text="Camera stopped", image="")
+        if self.metrics_label is not None:
+            self.metrics_label.place_forget()
         
         print("⏹️ Camera stopped")
         
@@ -224,154 +442,172 @@ class ObjectDetectionGUI:
         if not self.detection_active:
             self.detection_active = True
             self.detect_button.config(text="⏸️ Stop Detection", bg='#e67e22')
-            
-            # Start detection thread
-            self.detection_thread = threading.Thread(target=self.detection_loop, daemon=True)
-            self.detection_thread.start()
-            
             print("🔍 Detection started")
         else:
             self.detection_active = False
             self.detect_button.config(text="🔍 Start Detection", bg='#3498db')
             print("⏸️ Detection stopped")
+        if self.pipeline:
+            self.pipeline.set_detection_active(self.detection_active)
+        if self.engine:
+            self.engine.set_detection_active(self.detection_active)
             
-    def camera_loop(self):
-        """Optimized camera capture loop"""
-        fps_counter = 0
-        fps_start_time = time.time()
-        
-        while self.camera and self.camera.isOpened():
-            ret, frame = self.camera.read()
-            if not ret:
-                break
-                
-            # Store frame for detection (only if detection is active)
+    def regions_for(self, index):
+        """Regions of interest of one source: its own, else the ones for every source"""
+        return self.roi_regions.get(str(index), self.roi_regions.get(None, []))
+        
+    def roi_sets(self):
+        if self.pipeline:
+            return [self.pipeline.roi_set]
+        if self.engine:
+            return [feed.roi_set for feed in self.engine.feeds]
+        return []
+        
+    def apply_regions(self):
+        """Hand the current regions to the running sources and outline them on the video"""
+        for index, roi_set in enumerate(self.roi_sets()):
+            regions = self.regions_for(index)
+            roi_set.set_regions(regions)
+            if self.renderer:
+                self.renderer.set_regions(index, regions)
+        self.roi_var.set(format_regions(self.roi_regions))
+        
+    def apply_roi_text(self):
+        """Parse the ROI entry and apply it"""
+        try:
+            self.roi_regions = parse_regions(self.roi_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid regions of interest: {e}")
+            return
+        self.apply_regions()
+        print(f"🎯 {sum(len(regions) for regions in self.roi_regions.values())} region(s) of interest")
+        
+    def locate_on_video(self, event):
+        """(source index, x, y normalized) under the mouse, or None"""
+        if not self.renderer:
+            return None
+        # The image is centred in the label
+        x = event.x - (self.video_label.winfo_width() - self.renderer.width) / 2
+        y = event.y - (self.video_label.winfo_height() - self.renderer.height) / 2
+        return self.renderer.locate(x, y)
+        
+    def on_roi_press(self, event):
+        self._roi_drag_start = self.locate_on_video(event)
+        
+    def on_roi_release(self, event):
+        """Add the dragged rectangle as a region of the source it was drawn on"""
+        start, end = self._roi_drag_start, self.locate_on_video(event)
+        self._roi_drag_start = None
+        if start is None or end is None or start[0] != end[0]:
+            return
+        # Plain clicks are not regions
+        if abs(end[1] - start[1]) < 0.01 or abs(end[2] - start[2]) < 0.01:
+            return
+        index = start[0]
+        region = Region(f"roi{sum(len(regions) for regions in self.roi_regions.values()) + 1}",
+                        start[1], start[2], end[1], end[2])
+        key = str(index) if self.engine else None
+        self.roi_regions.setdefault(key, list(self.regions_for(index))).append(region)
+        self.apply_regions()
+        
+    def on_roi_clear(self, event):
+        """Go back to full-frame detection for the source under the mouse"""
+        located = self.locate_on_video(event)
+        if located is None:
+            return
+        if self.engine:
+            self.roi_regions[str(located[0])] = []
+        else:
+            self.roi_regions = {}
+        self.apply_regions()
+        
+    def on_detections(self, detections):
+        """Called from the pipeline's detect thread after each detection pass"""
+        self.latest_detections = detections
+        if self.history is not None:
+            self.history.append(detections, self.camera.name if self.camera else 'camera')
+        self.root.after(0, lambda: self.update_detection_info(detections))
+        
+    def on_feed_detections(self, feed, detections):
+        """Called from the shared engine thread with one source's detections"""
+        self.feed_detections[feed.feed_id] = detections
+        if self.history is not None:
+            self.history.append(detections, feed.name)
+        combined = [
+            dict(detection, class_name=f"[{feed_id}] {detection['class_name']}")
+            for feed_id, feed_detections in sorted(self.feed_detections.items())
+            for detection in feed_detections
+        ]
+        self.root.after(0, lambda: self.update_detection_info(combined))
+        
+    def update_pipeline_stats(self):
+        """Refresh the FPS panel from the pipeline's stage statistics"""
+        if self.engine:
+            stats = self.engine.stats()
+            feeds = stats['feeds']
+            camera_fps = sum(feed['capture']['fps'] for feed in feeds)
+            self.fps_label.config(text=f"Camera FPS: {camera_fps:.1f} ({len(feeds)} sources)")
+            text = "Detection FPS: 0"
             if self.detection_active:
-                self.current_frame = frame.copy()
-            
-            # Update FPS counter
-            fps_counter += 1
-            if fps_counter % 30 == 0:  # Update every 30 frames
-                fps_end_time = time.time()
-                fps = 30 / (fps_end_time - fps_start_time)
-                self.root.after(0, lambda: self.fps_label.config(text=f"Camera FPS: {fps:.1f}"))
-                fps_start_time = fps_end_time
-            
-            # Draw detections on frame if available
-            display_frame = frame.copy()
-            if self.latest_detections:
-                display_frame = self.draw_detections(display_frame, self.latest_detections)
-            
-            # Optimize image processing - resize before conversion
-            display_frame = cv2.resize(display_frame, (640, 480))
-            frame_rgb = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-            frame_pil = Image.fromarray(frame_rgb)
-            frame_tk = ImageTk.PhotoImage(frame_pil)
-            
-            # Update video display
-            self.root.after(0, lambda: self.video_label.config(image=frame_tk))
-            self.root.after(0, lambda: setattr(self.video_label, 'image', frame_tk))
-            
-            time.sleep(0.02)  # ~50 FPS for smoother display
-            
-    def detection_loop(self):
-        """Optimized object detection loop with frame skipping"""
-        while self.detection_active and self.camera and self.camera.isOpened():
-            if self.current_frame is not None and self.model is not None:
-                try:
-                    # Frame skipping for better performance
-                    self.frame_skip_counter += 1
-                    if self.frame_skip_counter <= self.frame_skip_interval:
-                        time.sleep(0.05)  # Faster loop when skipping frames
-                        continue
-                    self.frame_skip_counter = 0
-                    
-                    # Resize frame for faster processing
-                    detection_frame = cv2.resize(self.current_frame, (416, 416))
-                    
-                    # Run YOLO detection with optimized settings
-                    results = self.model(detection_frame, verbose=False, conf=self.confidence_threshold)
-                    result = results[0]
-                    
-                    # Process detections with confidence filtering
-                    detections = []
-                    if result.boxes is not None:
-                        boxes = result.boxes.xyxy.cpu().numpy()
-                        confidences = result.boxes.conf.cpu().numpy()
-                        class_ids = result.boxes.cls.cpu().numpy()
-                        
-                        for i in range(len(boxes)):
-                            confidence = float(confidences[i])
-                            if confidence >= self.confidence_threshold:
-                                # Scale bounding box back to original frame size
-                                scale_x = self.current_frame.shape[1] / 416
-                                scale_y = self.current_frame.shape[0] / 416
-                                
-                                detection = {
-                                    'bbox': boxes[i] * [scale_x, scale_y, scale_x, scale_y],
-                                    'confidence': confidence,
-                                    'class_id': int(class_ids[i]),
-                                    'class_name': self.model.names[int(class_ids[i])]
-                                }
-                                detections.append(detection)
-                    
-                    # Store latest detections for drawing
-                    self.latest_detections = detections
-                    
-                    # Update detection FPS
-                    self.detection_fps_counter += 1
-                    if self.detection_fps_counter % 10 == 0:
-                        detection_fps_end_time = time.time()
-                        detection_fps = 10 / (detection_fps_end_time - self.detection_fps_start_time)
-                        self.root.after(0, lambda: self.detection_fps_label.config(text=f"Detection FPS: {detection_fps:.1f}"))
-                        self.detection_fps_start_time = detection_fps_end_time
-                    
-                    # Update detection info
-                    self.root.after(0, lambda: self.update_detection_info(detections))
-                    
-                except Exception as e:
-                    print(f"Detection error: {e}")
-                    
-            time.sleep(0.05)  # Faster detection loop
+                detect_fps = sum(feed['detect']['fps'] for feed in feeds)
+                text = (f"Detection FPS: {detect_fps:.1f} "
+                        f"(batch {stats['avg_batch_size']:.1f}, {stats['last_batch_ms']:.0f} ms)")
+            self.detection_fps_label.config(text=text)
+        elif self.pipeline:
+            stats = self.pipeline.report()
+            self.fps_label.config(text=f"Camera FPS: {stats['capture']['fps']:.1f}")
+            detect = stats['detect']
+            text = f"Detection FPS: {detect['fps']:.1f}" if self.detection_active else "Detection FPS: 0"
+            if self.detection_active and 'latency_ms_p50' in detect:
+                text += f" ({detect['latency_ms_p50']:.0f} ms)"
+            self.detection_fps_label.config(text=text)
+        else:
+            return
+        decisions = self.controller.decisions()
+        self.adaptive_label.config(
+            text=f"Input: {decisions['input_size']}px, every {decisions['detect_every']} frame(s)")
+        if 'motion' in stats:
+            motion = stats['motion']
+            self.motion_label.config(
+                text=f"Motion skip: {motion['skip_ratio'] * 100:.0f}% (saved {motion['cpu_seconds_saved']:.1f}s CPU)")
+        rois = combined_stats(self.roi_sets())
+        if rois['regions']:
+            hits = ", ".join(f"{region['name']} {region['hits']}" for region in rois['regions'][:4])
+            self.roi_label.config(
+                text=f"ROIs: {hits} | saved {rois['compute_saved'] * 100:.0f}% compute, "
+                     f"{rois['resolution_gain']:.1f}x resolution")
+        else:
+            self.roi_label.config(text="ROIs: full frame")
+        if self.renderer:
+            render = self.renderer.stats()
+            self.display_fps_label.config(
+                text=f"Display FPS: {render['fps']:.1f} (rendered {render['rendered']}, dropped {render['dropped']})")
+        self.update_metrics_overlay()
+        self.root.after(500, self.update_pipeline_stats)
+        
+    def update_metrics_overlay(self):
+        """Show p50/p95 per stage in the overlay on the video"""
+        if self.metrics_label is None:
+            return
+        summary = self.metrics.summary()
+        if not summary:
+            self.metrics_label.place_forget()
+            return
+        lines = [f"{'ms':<11}{'p50':>7}{'p95':>7}"]
+        for stage in ('resize', 'inference', 'postprocess', 'draw', 'display'):
+            if stage in summary:
+                lines.append(f"{stage:<11}{summary[stage]['p50_ms']:>7.1f}{summary[stage]['p95_ms']:>7.1f}")
+        errors = sum(self.metrics.errors.snapshot().values())
+        if errors:
+            lines.append(f"errors {errors}")
+        self.metrics_label.config(text="\n".join(lines))
+        self.metrics_label.place(x=6, y=6)
             
     def draw_detections(self, frame, detections):
         """Optimized drawing of bounding boxes and labels"""
         if not detections:
             return frame
-            
-        for detection in detections:
-            bbox = detection['bbox']
-            confidence = detection['confidence']
-            class_name = detection['class_name']
-            
-            # Extract coordinates
-            x1, y1, x2, y2 = map(int, bbox)
-            
-            # Ensure coordinates are within frame bounds
-            x1 = max(0, min(x1, frame.shape[1]))
-            y1 = max(0, min(y1, frame.shape[0]))
-            x2 = max(0, min(x2, frame.shape[1]))
-            y2 = max(0, min(y2, frame.shape[0]))
-            
-            # Draw bounding box with thickness based on confidence
-            thickness = max(1, int(3 * confidence))
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), thickness)
-            
-            # Prepare label text (shorter for better performance)
-            label = f"{class_name}: {confidence:.1f}"
-            
-            # Get text size for background rectangle
-            font_scale = 0.5
-            thickness_text = 1
-            (text_width, text_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness_text)
-            
-            # Draw background rectangle for text
-            cv2.rectangle(frame, (x1, y1 - text_height - 5), (x1 + text_width, y1), (0, 255, 0), -1)
-            
-            # Draw text
-            cv2.putText(frame, label, (x1, y1 - 2), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness_text)
-            
-        return frame
+        return self.annotator.draw(frame, detections)
     
     def update_detection_info(self, detections):
         """Update detection information in GUI"""
@@ -382,19 +618,24 @@ class ObjectDetectionGUI:
         self.detection_listbox.delete(0, tk.END)
         for detection in detections:
             info = f"{detection['class_name']}: {detection['confidence']:.2f}"
+            if detection.get('track_id') is not None:
+                info = f"#{detection['track_id']} {info}"
             self.detection_listbox.insert(tk.END, info)
             
     def on_closing(self):
         """Handle window closing"""
         self.detection_active = False
-        if self.camera:
-            self.camera.release()
+        self.stop_pipeline()
+        if self.history is not None:
+            self.history.stop()
         self.root.destroy()
 
 def main():
     root = tk.Tk()
     app = ObjectDetectionGUI(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
+    # Window is about to be shown: the GUI's equivalent of binding a port
+    app.model_manager.mark_listening()
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,508 @@
+"""Append-only detection history on memory-mapped columnar segments.
+
+Every detection is stored as one row of fixed-width columns: timestamp
+(float64 epoch seconds), source id (uint16), class id (uint16), confidence
+(float32) and box (4 x float32), 32 bytes in all.  A segment file holds a
+small header followed by one contiguous region per column, sized for the
+segment's row capacity, and is written through ``numpy.memmap``.  The row
+count in the header is updated after the rows themselves, so a crash never
+exposes half-written rows.
+
+Each segment keeps a sparse index with one entry per block of rows (1024 by
+default): the block's min/max timestamp and its per-class counts.  Range
+queries only read the blocks whose time span overlaps the range, and
+per-class counts add up whole blocks from the index, scanning rows only in
+the partial blocks at either end.
+
+Callers hand detection lists to ``append``, which only queues them; a
+background thread converts them to columns and writes them in batches.  The
+active segment is rotated when it is full or older than ``rotate_seconds``;
+sealed segments are compacted to their row count and deleted once they fall
+outside the retention window or the disk budget.  Source names map to ids
+through ``sources.json`` in the history directory.
+"""
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+import config
+
+MAGIC = b'YDHS'
+VERSION = 1
+HEADER_BYTES = 64
+# magic, version, flags, capacity, count
+_HEADER = struct.Struct('<4sHHQQ')
+_COUNT_OFFSET = 16
+
+COLUMNS = (
+    ('timestamp', np.dtype('<f8'), 1),
+    ('source', np.dtype('<u2'), 1),
+    ('class_id', np.dtype('<u2'), 1),
+    ('confidence', np.dtype('<f4'), 1),
+    ('box', np.dtype('<f4'), 4),
+)
+ROW_BYTES = sum(dtype.itemsize * width for _, dtype, width in COLUMNS)
+SEGMENT_SUFFIX = '.ydh'
+
+
+def _layout(capacity):
+    """Byte offset of each column for a segment of the given capacity, and the file size"""
+    offsets = {}
+    offset = HEADER_BYTES
+    for name, dtype, width in COLUMNS:
+        offsets[name] = offset
+        # Keep every column 8-byte aligned
+        offset += -(-capacity * dtype.itemsize * width // 8) * 8
+    return offsets, offset
+
+
+class Segment:
+    """One memory-mapped segment file with its block index"""
+
+    def __init__(self, path, capacity=None, block_rows=1024):
+        self.path = path
+        self.block_rows = block_rows
+        if capacity is not None:
+            offsets, size = _layout(capacity)
+            mm = np.memmap(path, dtype=np.uint8, mode='w+', shape=(size,))
+            _HEADER.pack_into(mm, 0, MAGIC, VERSION, 0, capacity, 0)
+            self.writable = True
+        else:
+            with open(path, 'rb') as f:
+                magic, version, _, capacity, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f'{path} is not a detection history segment')
+            offsets, size = _layout(capacity)
+            mm = np.memmap(path, dtype=np.uint8, mode='r', shape=(size,))
+            self.writable = False
+        self.capacity = capacity
+        self.created_at = time.time()
+        self._mm = mm
+        self._count_view = mm[_COUNT_OFFSET:_COUNT_OFFSET + 8].view('<u8')
+        self.columns = {}
+        for name, dtype, width in COLUMNS:
+            start = offsets[name]
+            column = mm[start:start + capacity * dtype.itemsize * width].view(dtype)
+            self.columns[name] = column.reshape(capacity, width) if width > 1 else column
+        count = int(self._count_view[0])
+        # (block min ts, block max ts, block x class counts, row count), swapped as one tuple for readers
+        self._index = (np.empty(0), np.empty(0), np.zeros((0, 0), np.int64), 0)
+        self._reindex(0, count)
+
+    @property
+    def count(self):
+        return self._index[3]
+
+    @property
+    def nbytes(self):
+        return self._mm.size
+
+    def time_range(self):
+        block_min, block_max, _, count = self._index
+        if not count:
+            return None
+        return float(block_min.min()), float(block_max.max())
+
+    def append(self, columns, rows):
+        """Write rows (a dict of column arrays) after the current end"""
+        start = self.count
+        for name, values in columns.items():
+            self.columns[name][start:start + rows] = values
+        # Publish the new count only after the rows are in place
+        self._count_view[0] = start + rows
+        self._reindex(start, start + rows)
+
+    def flush(self):
+        if self.writable:
+            self._mm.flush()
+
+    def _reindex(self, start_row, count):
+        """Rebuild index entries for the blocks from start_row's block to the end"""
+        block_min, block_max, block_counts, _ = self._index
+        first_block = start_row // self.block_rows
+        begin = first_block * self.block_rows
+        if count <= begin:
+            self._index = (block_min, block_max, block_counts, count)
+            return
+        timestamps = self.columns['timestamp'][begin:count]
+        class_ids = self.columns['class_id'][begin:count].astype(np.int64)
+        starts = np.arange(0, count - begin, self.block_rows)
+        mins = np.minimum.reduceat(timestamps, starts)
+        maxs = np.maximum.reduceat(timestamps, starts)
+        width = max(block_counts.shape[1], int(class_ids.max()) + 1)
+        blocks = np.arange(count - begin) // self.block_rows
+        counts = np.bincount(blocks * width + class_ids, minlength=len(starts) * width).reshape(len(starts), width)
+        kept = block_counts[:first_block]
+        if kept.shape[1] < width:
+            kept = np.pad(kept, ((0, 0), (0, width - kept.shape[1])))
+        self._index = (
+            np.concatenate([block_min[:first_block], mins]),
+            np.concatenate([block_max[:first_block], maxs]),
+            np.concatenate([kept, counts]),
+            count,
+        )
+
+    def _candidate_rows(self, blocks, count):
+        return np.flatnonzero(np.repeat(blocks, self.block_rows)[:count])
+
+    def select(self, start, end, class_ids=None, sources=None):
+        """Row numbers with start <= timestamp <= end matching the filters, in row order"""
+        block_min, block_max, _, count = self._index
+        if not count:
+            return np.empty(0, dtype=np.int64)
+        blocks = (block_max >= start) & (block_min <= end)
+        if not blocks.any():
+            return np.empty(0, dtype=np.int64)
+        rows = self._candidate_rows(blocks, count)
+        timestamps = self.columns['timestamp'][rows]
+        keep = (timestamps >= start) & (timestamps <= end)
+        if class_ids is not None:
+            keep &= np.isin(self.columns['class_id'][rows], class_ids)
+        if sources is not None:
+            keep &= np.isin(self.columns['source'][rows], sources)
+        return rows[keep]
+
+    def read(self, rows):
+        return {name: column[rows] for name, column in self.columns.items()}
+
+    def class_counts(self, start, end, sources=None):
+        """Per-class counts in [start, end]: whole blocks from the index, edge blocks by scanning"""
+        block_min, block_max, block_counts, count = self._index
+        totals = np.zeros(block_counts.shape[1], dtype=np.int64)
+        if not count:
+            return totals
+        overlapping = (block_max >= start) & (block_min <= end)
+        if sources is None:
+            inside = (block_min >= start) & (block_max <= end)
+            totals += block_counts[inside].sum(axis=0)
+            partial = overlapping & ~inside
+        else:
+            partial = overlapping
+        if partial.any():
+            rows = self._candidate_rows(partial, count)
+            timestamps = self.columns['timestamp'][rows]
+            keep = (timestamps >= start) & (timestamps <= end)
+            if sources is not None:
+                keep &= np.isin(self.columns['source'][rows], sources)
+            totals += np.bincount(self.columns['class_id'][rows][keep], minlength=len(totals))[:len(totals)]
+        return totals
+
+    def write_compacted(self, path):
+        """Write this segment with capacity equal to its row count to path"""
+        count = self.count
+        offsets, size = _layout(count)
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, count, count).ljust(HEADER_BYTES, b'\0'))
+            for name, _, _ in COLUMNS:
+                f.seek(offsets[name])
+                f.write(np.ascontiguousarray(self.columns[name][:count]).tobytes())
+            f.truncate(size)
+
+
+class HistoryStore:
+    """Detection history: queued appends, a background batch writer and range queries"""
+
+    def __init__(self, directory, segment_rows=1_000_000, rotate_seconds=3600, retention_seconds=86400,
+                 max_bytes=512 * 1024 * 1024, flush_interval=0.5, batch_rows=4096,
+                 max_pending_rows=100_000, block_rows=1024):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.rotate_seconds = rotate_seconds
+        self.retention_seconds = retention_seconds
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self.max_pending_rows = max_pending_rows
+        self.block_rows = block_rows
+
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._segments = []
+        self._active = None
+        self._sources = {}
+        self._source_names = []
+        self._thread = None
+        self._stopping = False
+        self._last_maintenance = 0.0
+
+    def start(self):
+        """Open existing segments and start the writer thread (idempotent)"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_sources()
+            self._load_segments()
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write what is queued, seal the active segment and stop the writer"""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def append(self, detections, source, timestamp=None):
+        """Queue one frame's detections; returns False if they were dropped"""
+        if not detections:
+            return True
+        if self._thread is None:
+            self.start()
+        with self._cond:
+            if self._pending_rows + len(detections) > self.max_pending_rows:
+                self.dropped += len(detections)
+                return False
+            self._pending.append((time.time() if timestamp is None else timestamp, source, detections))
+            self._pending_rows += len(detections)
+            if self._pending_rows >= self.batch_rows:
+                self._cond.notify()
+        return True
+
+    # Source names
+
+    def _sources_path(self):
+        return os.path.join(self.directory, 'sources.json')
+
+    def _load_sources(self):
+        try:
+            with open(self._sources_path(), 'r', encoding='utf-8') as f:
+                self._source_names = json.load(f)
+        except (OSError, ValueError):
+            self._source_names = []
+        self._sources = {name: index for index, name in enumerate(self._source_names)}
+
+    def _source_id(self, name):
+        source_id = self._sources.get(name)
+        if source_id is None:
+            source_id = self._sources[name] = len(self._source_names)
+            self._source_names.append(name)
+            with open(self._sources_path(), 'w', encoding='utf-8') as f:
+                json.dump(self._source_names, f)
+        return source_id
+
+    def source_ids(self, names):
+        """Ids of the given source names (unknown names are ignored)"""
+        if self._thread is None:
+            self.start()
+        return [self._sources[name] for name in names if name in self._sources]
+
+    # Segments
+
+    def _load_segments(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                segment = Segment(path, block_rows=self.block_rows)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipping history segment {name}: {e}")
+                continue
+            if segment.capacity > segment.count:
+                # Left active by an earlier run: compact it like a normal rotation would
+                segment = self._compact(segment)
+            self._segments.append(segment)
+
+    def _new_segment(self):
+        stamp = int(time.time() * 1000)
+        path = os.path.join(self.directory, f'{stamp:014d}{SEGMENT_SUFFIX}')
+        while os.path.exists(path):
+            stamp += 1
+            path = os.path.join(self.directory, f'{stamp:014d}{SEGMENT_SUFFIX}')
+        segment = Segment(path, capacity=self.segment_rows, block_rows=self.block_rows)
+        with self._lock:
+            self._segments.append(segment)
+        self._active = segment
+        return segment
+
+    def _compact(self, segment):
+        """Shrink a sealed segment's file to its row count and reopen it read-only"""
+        segment.flush()
+        temp_path = segment.path + '.tmp'
+        try:
+            segment.write_compacted(temp_path)
+            os.replace(temp_path, segment.path)
+        except OSError as e:
+            # E.g. Windows refuses to replace a file that is still mapped; keep it as is
+            print(f"⚠️ Could not compact {segment.path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return Segment(segment.path, block_rows=self.block_rows)
+
+    def _rotate(self):
+        active = self._active
+        self._active = None
+        if active is None:
+            return
+        if not active.count:
+            with self._lock:
+                self._segments.remove(active)
+            os.remove(active.path)
+            return
+        sealed = self._compact(active)
+        with self._lock:
+            self._segments[self._segments.index(active)] = sealed
+
+    def _enforce_retention(self):
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            sealed = [segment for segment in self._segments if segment is not self._active]
+            total = sum(segment.nbytes for segment in self._segments)
+        for segment in sealed:
+            time_range = segment.time_range()
+            expired = time_range is None or time_range[1] < cutoff
+            if not expired and total <= self.max_bytes:
+                break
+            try:
+                os.remove(segment.path)
+            except OSError as e:
+                print(f"⚠️ Could not delete history segment {segment.path}: {e}")
+                break
+            total -= segment.nbytes
+            with self._lock:
+                self._segments.remove(segment)
+
+    # Writer thread
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or self._pending_rows >= self.batch_rows,
+                                    self.flush_interval)
+                batch, self._pending = self._pending, []
+                self._pending_rows = 0
+                stopping = self._stopping
+            if batch:
+                try:
+                    self._write(batch)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    self.errors += 1
+                    print(f"⚠️ Detection history write failed: {e}")
+            self._maintain(stopping)
+            if stopping:
+                break
+
+    def _columns(self, batch):
+        """Convert queued (timestamp, source, detections) entries into column arrays"""
+        lengths = np.fromiter((len(detections) for _, _, detections in batch), np.int64, len(batch))
+        rows = int(lengths.sum())
+        flat = [detection for _, _, detections in batch for detection in detections]
+        return {
+            'timestamp': np.repeat(np.array([entry[0] for entry in batch], dtype=np.float64), lengths),
+            'source': np.repeat(np.array([self._source_id(entry[1]) for entry in batch], dtype=np.uint16),
+                                lengths),
+            'class_id': np.fromiter((detection['class_id'] for detection in flat), np.uint16, rows),
+            'confidence': np.fromiter((detection['confidence'] for detection in flat), np.float32, rows),
+            'box': np.array([detection['bbox'] for detection in flat], dtype=np.float32).reshape(rows, 4),
+        }, rows
+
+    def _write(self, batch):
+        columns, rows = self._columns(batch)
+        offset = 0
+        while offset < rows:
+            segment = self._active or self._new_segment()
+            take = min(rows - offset, segment.capacity - segment.count)
+            segment.append({name: values[offset:offset + take] for name, values in columns.items()}, take)
+            offset += take
+            if segment.count >= segment.capacity:
+                self._rotate()
+        if self._active is not None:
+            self._active.flush()
+        self.written += rows
+
+    def _maintain(self, stopping=False):
+        now = time.time()
+        if self._active is not None and (stopping or now - self._active.created_at >= self.rotate_seconds):
+            self._rotate()
+        if stopping or now - self._last_maintenance >= 60:
+            self._last_maintenance = now
+            self._enforce_retention()
+
+    # Queries
+
+    def _segments_snapshot(self):
+        with self._lock:
+            return list(self._segments)
+
+    def query(self, start, end, class_ids=None, sources=None, limit=1000):
+        """Rows with start <= timestamp <= end in time order, up to limit; returns (columns, total matched)"""
+        if self._thread is None:
+            self.start()
+        parts = []
+        total = 0
+        remaining = limit
+        for segment in self._segments_snapshot():
+            time_range = segment.time_range()
+            if time_range is None or time_range[1] < start or time_range[0] > end:
+                continue
+            rows = segment.select(start, end, class_ids, sources)
+            total += len(rows)
+            if remaining > 0 and len(rows):
+                data = segment.read(rows)
+                order = np.argsort(data['timestamp'], kind='stable')[:remaining]
+                parts.append({name: values[order] for name, values in data.items()})
+                remaining -= len(order)
+        if not parts:
+            columns = {name: np.empty((0, width) if width > 1 else 0, dtype=dtype) for name, dtype, width in COLUMNS}
+        else:
+            columns = {name: np.concatenate([part[name] for part in parts]) for name, _, _ in COLUMNS}
+        columns['source_name'] = [self._source_names[source_id] if source_id < len(self._source_names) else str(source_id)
+                                  for source_id in columns['source'].tolist()]
+        return columns, total
+
+    def class_counts(self, start, end, sources=None):
+        """{class_id: count} of detections with start <= timestamp <= end"""
+        if self._thread is None:
+            self.start()
+        totals = np.zeros(0, dtype=np.int64)
+        for segment in self._segments_snapshot():
+            time_range = segment.time_range()
+            if time_range is None or time_range[1] < start or time_range[0] > end:
+                continue
+            counts = segment.class_counts(start, end, sources)
+            if len(counts) > len(totals):
+                totals = np.pad(totals, (0, len(counts) - len(totals)))
+            totals[:len(counts)] += counts
+        return {class_id: int(count) for class_id, count in enumerate(totals.tolist()) if count}
+
+    def stats(self):
+        segments = self._segments_snapshot()
+        ranges = [segment.time_range() for segment in segments]
+        ranges = [r for r in ranges if r is not None]
+        return {
+            'segments': len(segments),
+            'rows': sum(segment.count for segment in segments),
+            'bytes': sum(segment.nbytes for segment in segments),
+            'oldest': min(r[0] for r in ranges) if ranges else None,
+            'newest': max(r[1] for r in ranges) if ranges else None,
+            'pending_rows': self._pending_rows,
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'sources': list(self._source_names),
+        }
+
+
+def create_store():
+    """HistoryStore configured from config, or None with YOLO_HISTORY=false"""
+    if not config.HISTORY_ENABLED:
+        return None
+    return HistoryStore(
+        config.HISTORY_DIR,
+        segment_rows=config.HISTORY_SEGMENT_ROWS,
+        rotate_seconds=config.HISTORY_ROTATE_SECONDS,
+        retention_seconds=config.HISTORY_RETENTION_HOURS * 3600,
+        max_bytes=config.HISTORY_MAX_BYTES,
+        max_pending_rows=config.HISTORY_MAX_PENDING_ROWS,
+    )
@@ -0,0 +1,473 @@
+"""Inference on a pool of worker processes with shared-memory frame handoff.
+
+A drop-in alternative to ``InferenceScheduler`` for ``web_app``: the same
+``submit(frame, conf) -> Future`` and all-or-nothing ``submit_many`` calls,
+but the model runs in separate worker processes, each with its own copy of
+the weights, so inference no longer competes with JPEG work and request handling for the server's GIL and adds
+cores as workers are added.
+
+Frames are not pickled.  The server process owns a few
+``multiprocessing.shared_memory`` slots per worker; ``submit`` copies the
+frame into a free slot of the least-loaded ready worker and sends only the
+slot index and frame shape.  Workers batch whatever is queued for them, run
+the model and send back the raw ``(N, 6)`` box array, which is small.  Frames
+that find no free slot wait in the server until a slot frees up.
+
+A collector thread applies worker replies, dispatches waiting frames and
+restarts workers that died, failing the frames they were holding.  Restarts
+back off exponentially, and a worker that keeps dying before its model is
+ready is given up on like one whose model failed to load.
+"""
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from inference_scheduler import SchedulerFull
+
+# A worker that dies this many times in a row without becoming ready is not restarted again
+MAX_CRASH_STREAK = 5
+RESTART_BACKOFF_SECONDS = 0.5
+RESTART_BACKOFF_MAX_SECONDS = 30.0
+
+
+def _worker_main(worker_id, slot_names, task_queue, result_queue, load_model, torch_threads):
+    """Worker process: attach the slots, load the model, then serve frames until told to stop"""
+    slots = []
+    try:
+        if torch_threads:
+            try:
+                import torch
+                torch.set_num_threads(torch_threads)
+            except ImportError:
+                # ONNX Runtime and OpenVINO backends run without torch
+                pass
+        for name in slot_names:
+            slots.append(shared_memory.SharedMemory(name=name))
+        model = load_model()
+    except Exception as e:
+        for slot in slots:
+            slot.close()
+        result_queue.put(('failed', worker_id, (os.getpid(), str(e))))
+        return
+    result_queue.put(('ready', worker_id, (os.getpid(), dict(model.names), getattr(model, 'name', None))))
+
+    stopping = False
+    while not stopping:
+        tasks = [task_queue.get()]
+        # Everything already queued for this worker goes into the same forward pass
+        while len(tasks) < len(slots):
+            try:
+                tasks.append(task_queue.get_nowait())
+            except queue.Empty:
+                break
+        if None in tasks:
+            stopping = True
+            tasks = [task for task in tasks if task is not None]
+
+        # Frames of different sizes (the adaptive input size changed) run as separate batches
+        groups = {}
+        for task in tasks:
+            groups.setdefault(task[2], []).append(task)
+        for shape, group in groups.items():
+            frames = [np.ndarray(shape, dtype=np.uint8, buffer=slots[slot].buf) for _, slot, _, _ in group]
+            conf = min(task[3] for task in group)
+            started = time.perf_counter()
+            results = None
+            try:
+                results = model(frames, verbose=False, conf=conf, imgsz=shape[0])
+                replies = []
+                for (request_id, slot, _, _), result in zip(group, results):
+                    data = result.boxes.data if result.boxes is not None else np.empty((0, 6), np.float32)
+                    if hasattr(data, 'cpu'):
+                        data = data.cpu().numpy()
+                    replies.append((request_id, slot, np.asarray(data, dtype=np.float32), None))
+            except Exception as e:
+                replies = [(request_id, slot, None, str(e)) for request_id, slot, _, _ in group]
+            # Results may reference the slot memory, which must be released before the slot is reused
+            del frames, results
+            result_queue.put(('done', worker_id, (replies, (time.perf_counter() - started) * 1000)))
+
+    for slot in slots:
+        slot.close()
+
+
+class _Boxes:
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+class PooledResult:
+    """Minimal stand-in for an ultralytics Result: just the (N, 6) box array"""
+
+    __slots__ = ('boxes',)
+
+    def __init__(self, data):
+        self.boxes = _Boxes(data)
+
+
+class _Worker:
+    def __init__(self, worker_id, slots):
+        self.worker_id = worker_id
+        self.slots = slots
+        self.free_slots = list(range(len(slots)))
+        self.outstanding = {}  # request_id -> (future, slot, submitted_at)
+        self.process = None
+        self.tasks = None
+        self.pid = None
+        self.ready = False
+        self.started_at = time.time()
+        self.frames = 0
+        self.batches = 0
+        self.busy_ms = 0.0
+        self.avg_ms = 0.0
+        self.restarts = 0
+        # Exits since the worker was last ready, and when it may be restarted
+        self.crash_streak = 0
+        self.restart_at = None
+        self.failed = False
+
+
+class InferencePool:
+    """Run submitted frames on worker processes, least-loaded worker first"""
+
+    def __init__(self, num_workers, load_model, max_frame_bytes=640 * 640 * 3, slots_per_worker=2,
+                 max_queue_depth=64, on_ready=None):
+        self.num_workers = max(1, int(num_workers))
+        # load_model() runs in each worker process, so it must be a picklable top-level function
+        self.load_model = load_model
+        self.slot_bytes = int(max_frame_bytes)
+        self.slots_per_worker = max(1, int(slots_per_worker))
+        self.max_batch_size = self.slots_per_worker
+        self.max_wait_ms = 0.0
+        self.max_queue_depth = max(1, int(max_queue_depth))
+        # on_ready(pool) is called from the collector thread once the first worker has loaded its model
+        self.on_ready = on_ready
+        self.torch_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+
+        self.names = None
+        self.name = None
+        self.phase = 'idle'
+        self.error = None
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._results = None
+        self._workers = []
+        self._pending = deque()  # (request_id, frame, conf, future, submitted_at) waiting for a slot
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._collector = None
+        self._stopping = threading.Event()
+        self._started_at = None
+
+        # Counters reported by stats()
+        self._frames = 0
+        self._rejected = 0
+        self._errors = 0
+        self._crashes = 0
+        self._wait_ms_total = 0.0
+
+    def start(self):
+        """Create the slots, spawn the workers and the collector thread (idempotent)"""
+        with self._lock:
+            if self._collector is not None:
+                return
+            self.phase = 'loading'
+            self._started_at = time.time()
+            self._results = self._ctx.Queue()
+            for worker_id in range(self.num_workers):
+                slots = [shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                         for _ in range(self.slots_per_worker)]
+                worker = _Worker(worker_id, slots)
+                self._workers.append(worker)
+                self._spawn(worker)
+            self._collector = threading.Thread(target=self._collect, name='inference-pool', daemon=True)
+            self._collector.start()
+        atexit.register(self.stop)
+
+    def _spawn(self, worker):
+        worker.tasks = self._ctx.Queue()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.worker_id, [slot.name for slot in worker.slots], worker.tasks, self._results,
+                  self.load_model, self.torch_threads),
+            name=f'inference-worker-{worker.worker_id}',
+            daemon=True
+        )
+        worker.process.start()
+        worker.pid = worker.process.pid
+        worker.ready = False
+        worker.free_slots = list(range(len(worker.slots)))
+        worker.outstanding = {}
+
+    def stop(self, timeout=2.0):
+        """Stop the workers, fail any frames still queued and release the shared memory"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        with self._lock:
+            workers = list(self._workers)
+            failed = [future for _, _, _, future, _ in self._pending]
+            self._pending.clear()
+            for worker in workers:
+                failed.extend(future for future, _, _ in worker.outstanding.values())
+                worker.outstanding = {}
+        for future in failed:
+            if not future.done():
+                future.set_exception(RuntimeError('Inference pool stopped'))
+        for worker in workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.tasks.put(None)
+        for worker in workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            for slot in worker.slots:
+                slot.close()
+                slot.unlink()
+        self.phase = 'stopped'
+
+    @property
+    def ready(self):
+        return self.names is not None
+
+    @property
+    def queue_depth(self):
+        """Frames waiting for a slot or queued behind a running batch"""
+        with self._lock:
+            queued = sum(max(0, len(worker.outstanding) - 1) for worker in self._workers)
+            return len(self._pending) + queued
+
+    def submit(self, frame, conf):
+        """Queue a frame for inference and return a Future for its result"""
+        return self.submit_many([frame], conf)[0]
+
+    def submit_many(self, frames, conf):
+        """Queue frames that belong together (e.g. crops of one image): all of them or, if they do not fit, none"""
+        if self._collector is None:
+            self.start()
+        for frame in frames:
+            if frame.nbytes > self.slot_bytes:
+                raise ValueError(f'Frame of {frame.nbytes} bytes does not fit a {self.slot_bytes}-byte slot')
+        futures = [Future() for _ in frames]
+        if self.phase == 'failed':
+            for future in futures:
+                future.set_exception(RuntimeError(f'No inference worker could load the model: {self.error}'))
+            return futures
+        with self._lock:
+            waiting = len(self._pending) + sum(len(worker.outstanding) for worker in self._workers)
+            if waiting + len(frames) > self.max_queue_depth + self.num_workers * self.slots_per_worker:
+                self._rejected += len(frames)
+                raise SchedulerFull(f'Inference queue is full ({self.max_queue_depth} frames)')
+            for frame, future in zip(frames, futures):
+                request_id = next(self._ids)
+                worker = self._pick_worker() if not self._pending else None
+                if worker is None:
+                    self._pending.append((request_id, frame, conf, future, time.perf_counter()))
+                    continue
+                slot = self._reserve(worker, request_id, future, time.perf_counter())
+                self._send(worker, slot, request_id, frame, conf)
+        return futures
+
+    def _pick_worker(self):
+        """Ready worker with a free slot and the fewest frames in flight (ties: fastest recent batches)"""
+        candidates = [worker for worker in self._workers if worker.ready and worker.free_slots]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda worker: (len(worker.outstanding), worker.avg_ms))
+
+    def _reserve(self, worker, request_id, future, submitted_at):
+        slot = worker.free_slots.pop()
+        worker.outstanding[request_id] = (future, slot, submitted_at)
+        return slot
+
+    def _send(self, worker, slot, request_id, frame, conf):
+        """Copy a frame into its slot and queue it for the worker; call with the lock held"""
+        # Under the lock, a crash restart cannot replace the task queue between the reservation and the send
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=worker.slots[slot].buf)
+        np.copyto(view, frame)
+        del view
+        worker.tasks.put((request_id, slot, frame.shape, conf))
+
+    def _dispatch_pending(self):
+        """Move waiting frames into free slots; called from the collector thread"""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                worker = self._pick_worker()
+                if worker is None:
+                    return
+                request_id, frame, conf, future, submitted_at = self._pending.popleft()
+                slot = self._reserve(worker, request_id, future, submitted_at)
+                self._send(worker, slot, request_id, frame, conf)
+
+    def _collect(self):
+        """Apply worker replies, dispatch waiting frames and restart crashed workers"""
+        while not self._stopping.is_set():
+            try:
+                kind, worker_id, payload = self._results.get(timeout=0.5)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                break
+
+            now = time.perf_counter()
+            completed = []
+            first_ready = False
+            with self._lock:
+                worker = self._workers[worker_id]
+                if kind == 'failed':
+                    pid, error = payload
+                    # A model that cannot be loaded will not load after a restart either
+                    print(f"❌ Inference worker {worker_id} could not load the model: {error}")
+                    failed = self._give_up(worker, error)
+                if kind == 'ready':
+                    pid, names, name = payload
+                    if pid != worker.pid:
+                        continue
+                    worker.ready = True
+                    worker.crash_streak = 0
+                    first_ready = self.names is None
+                    self.names, self.name = names, name
+                    self.phase = 'ready'
+                elif kind == 'done':
+                    replies, batch_ms = payload
+                    worker.batches += 1
+                    worker.busy_ms += batch_ms
+                    worker.avg_ms = batch_ms if worker.batches == 1 else 0.8 * worker.avg_ms + 0.2 * batch_ms
+                    for request_id, slot, data, error in replies:
+                        entry = worker.outstanding.pop(request_id, None)
+                        if entry is None:
+                            continue
+                        future, _, submitted_at = entry
+                        worker.free_slots.append(slot)
+                        worker.frames += 1
+                        self._frames += 1
+                        self._wait_ms_total += (now - submitted_at) * 1000 - batch_ms
+                        if error is not None:
+                            self._errors += 1
+                        completed.append((future, data, error))
+
+            if kind == 'failed':
+                self._fail_futures(failed, self.error)
+                continue
+            for future, data, error in completed:
+                if error is not None:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(PooledResult(data))
+            if first_ready and self.on_ready is not None:
+                self.on_ready(self)
+            self._dispatch_pending()
+            self._check_workers()
+
+    def _give_up(self, worker, error):
+        """Stop restarting a worker; once none is left, fail every waiting frame. Call with the lock held"""
+        worker.failed = True
+        worker.ready = False
+        self.error = error
+        failed = [future for future, _, _ in worker.outstanding.values()]
+        worker.outstanding = {}
+        if not any(w.ready or not w.failed for w in self._workers):
+            self.phase = 'failed'
+            failed.extend(future for _, _, _, future, _ in self._pending)
+            self._pending.clear()
+        return failed
+
+    @staticmethod
+    def _fail_futures(futures, error):
+        for future in futures:
+            if not future.done():
+                future.set_exception(RuntimeError(error))
+
+    def _check_workers(self):
+        failed = []
+        gave_up = []
+        now = time.monotonic()
+        with self._lock:
+            for worker in self._workers:
+                if self._stopping.is_set() or worker.failed or worker.process.is_alive():
+                    continue
+                if worker.restart_at is None:
+                    print(f"⚠️ Inference worker {worker.worker_id} (pid {worker.pid}) exited")
+                    failed.extend(future for future, _, _ in worker.outstanding.values())
+                    worker.outstanding = {}
+                    worker.ready = False
+                    self._crashes += 1
+                    worker.crash_streak += 1
+                    if worker.crash_streak >= MAX_CRASH_STREAK:
+                        print(f"❌ Inference worker {worker.worker_id} exited {worker.crash_streak} times "
+                              f"without becoming ready, not restarting it")
+                        gave_up.extend(self._give_up(worker, f'Worker exited {worker.crash_streak} times during startup'))
+                        continue
+                    # Back off exponentially so a worker that dies at startup does not respawn in a tight loop
+                    delay = min(RESTART_BACKOFF_MAX_SECONDS, RESTART_BACKOFF_SECONDS * 2 ** (worker.crash_streak - 1))
+                    worker.restart_at = now + delay
+                if now >= worker.restart_at:
+                    worker.restart_at = None
+                    worker.restarts += 1
+                    self._spawn(worker)
+        self._fail_futures(failed, 'Inference worker exited while running this frame')
+        self._fail_futures(gave_up, self.error)
+
+    def status(self):
+        """Readiness report in the shape of ModelManager.status()"""
+        return {
+            'phase': self.phase,
+            'ready': self.ready,
+            'error': self.error,
+            'model': self.name,
+            'workers_ready': sum(1 for worker in self._workers if worker.ready),
+            'num_workers': self.num_workers,
+        }
+
+    def stats(self):
+        """Return configuration, throughput and per-worker counters"""
+        now = time.time()
+        # Same count as admission control; the property takes the lock itself
+        queue_depth = self.queue_depth
+        with self._lock:
+            frames = self._frames
+            return {
+                'running': self._collector is not None and not self._stopping.is_set(),
+                'mode': 'processes',
+                'num_workers': self.num_workers,
+                'slots_per_worker': self.slots_per_worker,
+                'slot_bytes': self.slot_bytes,
+                'max_queue_depth': self.max_queue_depth,
+                'queue_depth': queue_depth,
+                'frames': frames,
+                'rejected': self._rejected,
+                'errors': self._errors,
+                'crashes': self._crashes,
+                'avg_wait_ms': self._wait_ms_total / frames if frames else 0.0,
+                'workers': [
+                    {
+                        'worker_id': worker.worker_id,
+                        'pid': worker.pid,
+                        'alive': worker.process is not None and worker.process.is_alive(),
+                        'ready': worker.ready,
+                        'in_flight': len(worker.outstanding),
+                        'frames': worker.frames,
+                        'avg_batch_size': round(worker.frames / worker.batches, 2) if worker.batches else 0.0,
+                        'avg_batch_ms': round(worker.avg_ms, 3),
+                        'utilization': round(worker.busy_ms / 1000 / max(now - worker.started_at, 1e-9), 4),
+                        'restarts': worker.restarts,
+                        'failed': worker.failed,
+                    }
+                    for worker in self._workers
+                ],
+            }
@@ -0,0 +1,182 @@
+"""Micro-batching inference scheduler.
+
+Frames submitted from concurrent request handlers are collected into a single
+batch and run through the model in one forward pass.  A batch is flushed as
+soon as it is full or the oldest frame has waited ``max_wait_ms``; each caller
+gets its own result back through a ``concurrent.futures.Future``.
+
+Waiting only pays off when other callers are active.  When nothing else is
+queued and the previous batch held a single frame (e.g. one streaming client
+waiting for each result), the frame runs straight away instead of sitting out
+the deadline.  Concurrent callers show up as frames queued behind a running
+batch, which turns waiting back on.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class SchedulerFull(Exception):
+    """Raised when the scheduler queue is at its configured depth"""
+
+
+class _Request:
+    __slots__ = ('frame', 'conf', 'future', 'enqueued_at')
+
+    def __init__(self, frame, conf):
+        self.frame = frame
+        self.conf = conf
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    """Collect frames from many callers and run them as one batch"""
+
+    def __init__(self, predict, max_batch_size=8, max_wait_ms=15.0, max_queue_depth=64):
+        # predict(frames, conf) -> list with one result per frame
+        self.predict = predict
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.max_queue_depth = max(1, int(max_queue_depth))
+
+        self._queue = queue.Queue(maxsize=self.max_queue_depth)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+
+        # Counters reported by stats()
+        self._batches = 0
+        self._frames = 0
+        self._rejected = 0
+        self._errors = 0
+        self._wait_ms_total = 0.0
+        self._inference_ms_total = 0.0
+        self._last_batch_size = 0
+        self._idle_flushes = 0
+
+    def start(self):
+        """Start the batching thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the batching thread and fail any frames still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            request.future.set_exception(RuntimeError('Inference scheduler stopped'))
+
+    @property
+    def queue_depth(self):
+        """Number of frames waiting to be batched"""
+        return self._queue.qsize()
+
+    def submit(self, frame, conf):
+        """Queue a frame for inference and return a Future for its result"""
+        return self.submit_many([frame], conf)[0]
+
+    def submit_many(self, frames, conf):
+        """Queue frames that belong together (e.g. crops of one image): all of them or, if they do not fit, none"""
+        if self._thread is None:
+            self.start()
+        requests = [_Request(frame, conf) for frame in frames]
+        # Only the batching thread removes frames, so with producers serialized the free space cannot shrink
+        with self._submit_lock:
+            if self._queue.qsize() + len(requests) > self.max_queue_depth:
+                with self._lock:
+                    self._rejected += len(requests)
+                raise SchedulerFull(f'Inference queue is full ({self.max_queue_depth} frames)')
+            for request in requests:
+                self._queue.put_nowait(request)
+        return [request.future for request in requests]
+
+    def _collect_batch(self):
+        """Block for the first frame, then gather more until full or the deadline passes"""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        if self._last_batch_size <= 1 and self._queue.empty():
+            # No sign of other callers, so nothing is likely to join before the deadline
+            with self._lock:
+                self._idle_flushes += 1
+            return batch
+        deadline = first.enqueued_at + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Batching loop"""
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            # Run with the loosest threshold in the batch; callers filter their own results
+            conf = min(request.conf for request in batch)
+            try:
+                results = self.predict([request.frame for request in batch], conf)
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+            with self._lock:
+                self._batches += 1
+                self._frames += len(batch)
+                self._last_batch_size = len(batch)
+                self._wait_ms_total += sum(started - request.enqueued_at for request in batch) * 1000.0
+                self._inference_ms_total += (finished - started) * 1000.0
+
+    def stats(self):
+        """Return configuration and throughput counters"""
+        with self._lock:
+            batches = self._batches
+            frames = self._frames
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'max_queue_depth': self.max_queue_depth,
+                'queue_depth': self._queue.qsize(),
+                'batches': batches,
+                'frames': frames,
+                'rejected': self._rejected,
+                'errors': self._errors,
+                'last_batch_size': self._last_batch_size,
+                'idle_flushes': self._idle_flushes,
+                'avg_batch_size': frames / batches if batches else 0.0,
+                'avg_wait_ms': self._wait_ms_total / frames if frames else 0.0,
+                'avg_batch_inference_ms': self._inference_ms_total / batches if batches else 0.0,
+            }
@@ -0,0 +1,435 @@
+"""Asynchronous detection jobs run on a pool of worker processes.
+
+Each worker process loads the YOLO weights once and then serves jobs, so
+inference scales across cores without contending for the GIL of the web
+server.  The server hands each ready, idle worker one job at a time through
+the worker's own task queue, so it always knows which worker holds a job.
+Workers report when they start and finish a job; a collector thread in the
+server process turns those messages into job state, per-worker utilization and
+latency figures.  Crashed workers are restarted; a job the worker had not
+started yet goes back to the front of the queue, while a job it was running
+(or that has already been claimed MAX_JOB_ATTEMPTS times) is marked as
+failed.  A worker whose model cannot be loaded, or that keeps dying before it
+is ready, is not restarted; once no worker is left, queued jobs fail with the
+load error.
+"""
+import base64
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# A worker that dies this many times in a row without becoming ready is not restarted again
+MAX_CRASH_STREAK = 5
+RESTART_BACKOFF_SECONDS = 0.5
+RESTART_BACKOFF_MAX_SECONDS = 30.0
+# A job handed to this many workers that all died is failed rather than handed out again
+MAX_JOB_ATTEMPTS = 2
+
+
+def _worker_main(worker_id, task_queue, result_queue, load_model, conf, iou, torch_threads):
+    """Worker process: load the model once, then serve jobs until told to stop"""
+    import cv2
+    import numpy as np
+
+    from postprocess import Detections
+
+    try:
+        if torch_threads:
+            try:
+                import torch
+                torch.set_num_threads(torch_threads)
+            except ImportError:
+                # ONNX Runtime and OpenVINO backends run without torch
+                pass
+        model = load_model()
+    except Exception as e:
+        result_queue.put(('load_failed', worker_id, None, time.time(), str(e)))
+        return
+    result_queue.put(('ready', worker_id, os.getpid(), time.time(), None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        job_id, image_bytes = task
+        result_queue.put(('started', worker_id, job_id, time.time(), None))
+        try:
+            frame = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError('Could not decode image')
+            result = model(frame, conf=conf, iou=iou, verbose=False)[0]
+
+            detections = Detections.from_result(result, model.names).to_list()
+
+            ok, buffer = cv2.imencode('.jpg', result.plot())
+            if not ok:
+                raise ValueError('Could not encode result image')
+            payload = {
+                'success': True,
+                'detections': detections,
+                'result_image': 'data:image/jpeg;base64,' + base64.b64encode(buffer).decode('utf-8'),
+                'total_detections': len(detections)
+            }
+            result_queue.put(('done', worker_id, job_id, time.time(), payload))
+        except Exception as e:
+            result_queue.put(('failed', worker_id, job_id, time.time(), str(e)))
+
+
+class Job:
+    """State of one submitted detection job"""
+
+    def __init__(self, job_id, cache_key=None):
+        self.id = job_id
+        self.status = 'queued'
+        self.cache_key = cache_key
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.worker_id = None
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.started_at is not None:
+            data['queue_ms'] = round((self.started_at - self.submitted_at) * 1000, 3)
+        if self.finished_at is not None:
+            data['total_ms'] = round((self.finished_at - self.submitted_at) * 1000, 3)
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class _WorkerState:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.process = None
+        self.tasks = None
+        self.pid = None
+        self.ready = False
+        self.started_at = time.time()
+        # (job_id, image_bytes) handed to the worker, kept so it can be requeued if the worker dies
+        self.current_task = None
+        self.job_started_at = None
+        self.busy_seconds = 0.0
+        self.jobs_done = 0
+        self.restarts = 0
+        # Exits since the worker was last ready, and when it may be restarted
+        self.crash_streak = 0
+        self.restart_at = None
+        self.failed = False
+
+
+class JobQueue:
+    """In-process job queue backed by a pool of model-loading worker processes"""
+
+    def __init__(self, num_workers, load_model, conf=0.25, iou=0.7, max_retained=1000, on_complete=None):
+        self.num_workers = max(1, int(num_workers))
+        # load_model() runs in each worker process, so it must be a picklable top-level function
+        self.load_model = load_model
+        self.conf = conf
+        self.iou = iou
+        self.max_retained = max_retained
+        # on_complete(job) is called from the collector thread when a job succeeds
+        self.on_complete = on_complete
+        self.torch_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._result_queue = None
+        self._workers = []
+        self._jobs = OrderedDict()
+        self._pending = deque()  # (job_id, image_bytes) waiting for an idle worker
+        self._lock = threading.Lock()
+        self._collector = None
+        self._stopping = threading.Event()
+        self._latencies = deque(maxlen=1000)
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self.error = None
+
+    def start(self):
+        """Spawn the worker processes and the collector thread (idempotent)"""
+        with self._lock:
+            if self._collector is not None:
+                return
+            self._result_queue = self._ctx.Queue()
+            self._workers = [_WorkerState(worker_id) for worker_id in range(self.num_workers)]
+            for worker in self._workers:
+                self._spawn(worker)
+            self._collector = threading.Thread(target=self._collect, name='job-collector', daemon=True)
+            self._collector.start()
+
+    def _spawn(self, worker):
+        worker.tasks = self._ctx.Queue()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.worker_id, worker.tasks, self._result_queue,
+                  self.load_model, self.conf, self.iou, self.torch_threads),
+            daemon=True
+        )
+        worker.process.start()
+        worker.pid = worker.process.pid
+        worker.ready = False
+        worker.current_task = None
+        worker.job_started_at = None
+
+    def shutdown(self):
+        """Stop all workers"""
+        self._stopping.set()
+        for worker in self._workers:
+            worker.tasks.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+
+    def submit(self, image_bytes, cache_key=None):
+        """Queue an image for detection and return its Job"""
+        self.start()
+        job = Job(uuid.uuid4().hex, cache_key)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._submitted += 1
+            self._prune()
+            if self._all_failed():
+                self._fail_job(job, f'No job worker could load the model: {self.error}')
+                return job
+            self._pending.append((job.id, image_bytes))
+            self._dispatch()
+        return job
+
+    def add_completed(self, result, cache_key=None):
+        """Record a job whose result is already known (e.g. a cache hit)"""
+        job = Job(uuid.uuid4().hex, cache_key)
+        job.status = 'done'
+        job.result = result
+        job.started_at = job.finished_at = job.submitted_at
+        job.done.set()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._submitted += 1
+            self._completed += 1
+            self._prune()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """Long-poll: block until the job finishes or the timeout expires"""
+        job = self.get(job_id)
+        if job is not None and timeout > 0:
+            job.done.wait(timeout)
+        return job
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the retention limit"""
+        excess = len(self._jobs) - self.max_retained
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].done.is_set():
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _dispatch(self):
+        """Hand waiting jobs to ready, idle workers; call with the lock held"""
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if not worker.ready or worker.current_task is not None:
+                continue
+            task = self._pending.popleft()
+            job = self._jobs.get(task[0])
+            if job is None or job.done.is_set():
+                continue
+            job.attempts += 1
+            worker.current_task = task
+            worker.tasks.put(task)
+
+    def _all_failed(self):
+        return all(worker.failed for worker in self._workers)
+
+    def _fail_job(self, job, error):
+        """Mark an unfinished job as failed; call with the lock held"""
+        job.status = 'failed'
+        job.error = error
+        job.finished_at = time.time()
+        self._failed += 1
+        job.done.set()
+
+    def _give_up(self, worker, error):
+        """Stop restarting a worker; once none is left, fail the queued jobs. Call with the lock held"""
+        worker.failed = True
+        worker.ready = False
+        self.error = error
+        if self._all_failed():
+            self._pending.clear()
+            for job in self._jobs.values():
+                if not job.done.is_set():
+                    self._fail_job(job, f'No job worker could load the model: {error}')
+
+    def _collect(self):
+        """Apply worker messages to job state and restart crashed workers"""
+        while not self._stopping.is_set():
+            # Checked on every message too, so a busy queue does not delay crash detection
+            self._check_workers()
+            try:
+                kind, worker_id, job_id, timestamp, payload = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            completed_job = None
+            with self._lock:
+                worker = self._workers[worker_id]
+                if kind == 'ready':
+                    # job_id carries the pid; ignore a process that has since been replaced
+                    if job_id != worker.pid:
+                        continue
+                    worker.ready = True
+                    worker.crash_streak = 0
+                    self._dispatch()
+                    continue
+                if kind == 'load_failed':
+                    # A model that cannot be loaded will not load after a restart either
+                    print(f"❌ Job worker {worker_id} could not load the model: {payload}")
+                    self._give_up(worker, payload)
+                    continue
+                job = self._jobs.get(job_id)
+                # Messages from a worker that has since died and been replaced are stale
+                current = worker.current_task is not None and worker.current_task[0] == job_id
+                if kind == 'started':
+                    if current:
+                        worker.job_started_at = timestamp
+                        if job is not None and not job.done.is_set():
+                            job.status = 'running'
+                            job.started_at = timestamp
+                            job.worker_id = worker_id
+                    continue
+
+                if current:
+                    if worker.job_started_at is not None:
+                        worker.busy_seconds += timestamp - worker.job_started_at
+                    worker.current_task = None
+                    worker.job_started_at = None
+                    worker.jobs_done += 1
+                    self._dispatch()
+                if job is None or job.done.is_set():
+                    continue
+                if job.started_at is None:
+                    job.started_at = timestamp
+                job.finished_at = timestamp
+                if kind == 'done':
+                    job.status = 'done'
+                    job.result = payload
+                    self._completed += 1
+                    completed_job = job
+                else:
+                    job.status = 'failed'
+                    job.error = payload
+                    self._failed += 1
+                self._latencies.append((job.started_at - job.submitted_at, job.finished_at - job.submitted_at))
+                job.done.set()
+
+            if completed_job is not None and self.on_complete is not None:
+                self.on_complete(completed_job)
+
+    def _check_workers(self):
+        now = time.monotonic()
+        with self._lock:
+            for worker in self._workers:
+                if self._stopping.is_set() or worker.failed or worker.process.is_alive():
+                    continue
+                if worker.restart_at is None:
+                    print(f"⚠️ Job worker {worker.worker_id} (pid {worker.pid}) exited")
+                    task = worker.current_task
+                    job = self._jobs.get(task[0]) if task is not None else None
+                    if job is not None and not job.done.is_set():
+                        if job.status == 'queued' and job.attempts < MAX_JOB_ATTEMPTS:
+                            # Claimed but never started: run it on another worker
+                            self._pending.appendleft(task)
+                        else:
+                            self._fail_job(job, 'Worker process exited while running this job')
+                    worker.current_task = None
+                    worker.job_started_at = None
+                    worker.ready = False
+                    worker.crash_streak += 1
+                    if worker.crash_streak >= MAX_CRASH_STREAK:
+                        print(f"❌ Job worker {worker.worker_id} exited {worker.crash_streak} times "
+                              f"without becoming ready, not restarting it")
+                        self._give_up(worker, f'Worker exited {worker.crash_streak} times during startup')
+                        continue
+                    # Back off exponentially so a worker that dies at startup does not respawn in a tight loop
+                    delay = min(RESTART_BACKOFF_MAX_SECONDS, RESTART_BACKOFF_SECONDS * 2 ** (worker.crash_streak - 1))
+                    worker.restart_at = now + delay
+                if now >= worker.restart_at:
+                    worker.restart_at = None
+                    worker.restarts += 1
+                    self._spawn(worker)
+            # Jobs put back by a crash can go to another idle worker straight away
+            self._dispatch()
+
+    def stats(self):
+        """Queue depth, per-worker utilization and job latency"""
+        with self._lock:
+            now = time.time()
+            queued = sum(1 for job in self._jobs.values() if job.status == 'queued')
+            running = sum(1 for job in self._jobs.values() if job.status == 'running')
+            workers = []
+            for worker in self._workers:
+                busy = worker.busy_seconds
+                if worker.job_started_at is not None:
+                    busy += now - worker.job_started_at
+                uptime = max(now - worker.started_at, 1e-9)
+                workers.append({
+                    'worker_id': worker.worker_id,
+                    'pid': worker.pid,
+                    'alive': worker.process is not None and worker.process.is_alive(),
+                    'ready': worker.ready,
+                    'busy': worker.current_task is not None,
+                    'jobs_done': worker.jobs_done,
+                    'restarts': worker.restarts,
+                    'failed': worker.failed,
+                    'utilization': round(busy / uptime, 4),
+                })
+            latencies = sorted(total for _, total in self._latencies)
+            queue_waits = sorted(wait for wait, _ in self._latencies)
+
+            def percentile(values, fraction):
+                if not values:
+                    return 0.0
+                return round(values[min(len(values) - 1, int(fraction * len(values)))] * 1000, 3)
+
+            return {
+                'started': self._collector is not None,
+                'num_workers': self.num_workers,
+                'queue_depth': queued,
+                'running': running,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'error': self.error,
+                'workers': workers,
+                'latency_ms': {
+                    'p50': percentile(latencies, 0.50),
+                    'p95': percentile(latencies, 0.95),
+                    'queue_wait_p50': percentile(queue_waits, 0.50),
+                    'queue_wait_p95': percentile(queue_waits, 0.95),
+                },
+            }
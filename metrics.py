@@ -0,0 +1,231 @@
+"""Lightweight per-stage latency metrics in Prometheus text format.
+
+Each app keeps one ``MetricsRegistry``.  Stage timings (decode, resize,
+inference, postprocess, draw, encode, serialize) go into one fixed-bucket
+histogram labelled by stage; recording a sample is a bisect and two additions
+under a lock, so instrumentation stays in the microsecond range.  Gauges are
+read from callbacks only when ``/metrics`` is scraped.
+
+With metrics disabled every recording call returns immediately.
+"""
+import bisect
+import threading
+import time
+
+import config
+
+# Seconds; covers sub-millisecond encodes up to multi-second CPU inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Fixed-bucket histogram with one series per label value"""
+
+    def __init__(self, name, help_text, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.bounds = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value=''):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum
+                series = self._series[label_value] = [[0] * (len(self.bounds) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self):
+        """{label_value: (bucket counts, sum)} copied under the lock"""
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+
+    def quantile(self, fraction, counts):
+        """Estimate a quantile from bucket counts, interpolating within the bucket"""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = fraction * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.bounds[index - 1] if index else 0.0
+                if index == len(self.bounds):
+                    return lower
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for label_value, (counts, total) in sorted(self.snapshot().items()):
+            labels = [(self.label, label_value)] if self.label else []
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float('inf'),), counts):
+                cumulative += count
+                le = _format_labels(labels + [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label value"""
+
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value='', amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for label_value, value in sorted(self.snapshot().items()):
+            labels = [(self.label, label_value)] if self.label else []
+            lines.append(f'{self.name}{_format_labels(labels)} {value}')
+        return lines
+
+
+class Gauge:
+    """Gauge that is either set directly or read from a callback at scrape time"""
+
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def get(self):
+        if self.fn is None:
+            return self.value
+        try:
+            return self.fn()
+        except Exception:
+            return float('nan')
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge',
+                f'{self.name} {_format_value(self.get())}']
+
+
+class _StageTimer:
+    __slots__ = ('registry', 'stage', 'started')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.registry.stages.observe(time.perf_counter() - self.started, self.stage)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Stage histograms, error counters, in-flight and queue gauges for one app"""
+
+    def __init__(self, prefix='yolo', enabled=True, buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.stages = Histogram(f'{prefix}_stage_seconds', 'Time spent in each processing stage', 'stage', buckets)
+        self.errors = Counter(f'{prefix}_errors_total', 'Errors by kind', 'kind')
+        self.in_flight = Gauge(f'{prefix}_in_flight_requests', 'Requests currently being handled')
+        self.gauges = [self.in_flight]
+
+    def time(self, stage):
+        """Context manager recording the duration of the block under a stage"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self.stages.observe(seconds, stage)
+
+    def error(self, kind):
+        if self.enabled:
+            self.errors.inc(kind)
+
+    def gauge(self, name, help_text, fn):
+        """Register a gauge read from fn() whenever metrics are exported"""
+        gauge = Gauge(f'{self.prefix}_{name}', help_text, fn)
+        self.gauges.append(gauge)
+        return gauge
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = self.stages.render() + self.errors.render()
+        for gauge in self.gauges:
+            lines.extend(gauge.render())
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """{stage: {count, mean_ms, p50_ms, p95_ms}} for compact on-screen display"""
+        summary = {}
+        for stage, (counts, total) in self.stages.snapshot().items():
+            count = sum(counts)
+            if not count:
+                continue
+            summary[stage] = {
+                'count': count,
+                'mean_ms': round(total / count * 1000, 3),
+                'p50_ms': round(self.stages.quantile(0.50, counts) * 1000, 3),
+                'p95_ms': round(self.stages.quantile(0.95, counts) * 1000, 3),
+            }
+        return summary
+
+
+def create_registry(prefix='yolo'):
+    """MetricsRegistry configured from config (disabled with YOLO_METRICS=false)"""
+    return MetricsRegistry(prefix, enabled=config.METRICS_ENABLED)
@@ -0,0 +1,175 @@
+"""Background model loading, warm-up and readiness reporting.
+
+Importing torch/ultralytics and loading weights takes seconds, and the first
+forward pass at a given input shape is much slower than the rest.  The
+``ModelManager`` does all of that on a background thread so servers can bind
+their port immediately, and reports which phase it is in:
+
+    idle -> importing -> loading -> warming -> ready   (or failed)
+
+It also records startup milestones measured from process start: when the
+server began listening, when the model became ready, and when the first real
+inference was served after warm-up.
+"""
+import threading
+import time
+
+# Process start reference; entry points import this module first
+PROCESS_START = time.time()
+
+PHASES = ('idle', 'importing', 'loading', 'warming', 'ready', 'failed')
+
+
+class ModelNotReady(Exception):
+    """Raised when the model is requested before it has finished loading"""
+
+    def __init__(self, phase, error=None):
+        message = f'Model is not ready (phase: {phase})'
+        if error:
+            message += f': {error}'
+        super().__init__(message)
+        self.phase = phase
+
+
+def parse_shapes(spec):
+    """Parse '416x416,640x480' into [(416, 416), (640, 480)] as (width, height)"""
+    shapes = []
+    for item in spec.split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        width, height = item.split('x')
+        shapes.append((int(width), int(height)))
+    return shapes
+
+
+def with_input_sizes(shapes, input_sizes):
+    """Square warm-up shapes for each model input size, followed by the remaining shapes"""
+    squares = [(size, size) for size in input_sizes]
+    return squares + [shape for shape in shapes if shape not in squares]
+
+
+class ModelManager:
+    """Load a model on a background thread and track its readiness"""
+
+    def __init__(self, loader, warmup_shapes=((640, 480),), warmup_runs=1, on_ready=None):
+        # loader() -> model; on_ready(model) is called from the loading thread
+        self.loader = loader
+        self.warmup_shapes = list(warmup_shapes)
+        self.warmup_runs = max(0, int(warmup_runs))
+        self.on_ready = on_ready
+
+        self.phase = 'idle'
+        self.error = None
+        self.model = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.timings = {}
+        self.warmup_ms = {}
+        self.milestones = {}
+        self.first_inference_ms = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def _set_phase(self, phase):
+        self.phase = phase
+        self.milestones[f'{phase}_at_s'] = round(time.time() - PROCESS_START, 3)
+
+    def start(self):
+        """Begin loading in the background (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._load, name='model-loader', daemon=True)
+            self._thread.start()
+
+    def load_blocking(self):
+        """Load on the calling thread (for scripts that need the model right away)"""
+        self.start()
+        self._thread.join()
+        return self.get()
+
+    def _load(self):
+        try:
+            self._set_phase('importing')
+            started = time.perf_counter()
+            import ultralytics  # noqa: F401  (the heavy torch import happens here)
+            self.timings['import_s'] = round(time.perf_counter() - started, 3)
+
+            self._set_phase('loading')
+            started = time.perf_counter()
+            model = self.loader()
+            self.timings['load_s'] = round(time.perf_counter() - started, 3)
+
+            self._set_phase('warming')
+            started = time.perf_counter()
+            self._warm_up(model)
+            self.timings['warmup_s'] = round(time.perf_counter() - started, 3)
+
+            self.model = model
+            self._set_phase('ready')
+            self._ready.set()
+            name = getattr(model, 'name', type(model).__name__)
+            print(f"✅ Model {name} ready in {self.milestones['ready_at_s']:.1f}s "
+                  f"(import {self.timings['import_s']:.1f}s, load {self.timings['load_s']:.1f}s, "
+                  f"warm-up {self.timings['warmup_s']:.1f}s)")
+            if self.on_ready is not None:
+                self.on_ready(model)
+        except Exception as e:
+            self.error = str(e)
+            self._set_phase('failed')
+            print(f"❌ Failed to load YOLO model: {e}")
+
+    def _warm_up(self, model):
+        """Run inferences at the shapes actually served so later requests are fast"""
+        import numpy as np
+
+        for width, height in self.warmup_shapes:
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            # Served frames are inferred at their own size, not the backend's default imgsz
+            imgsz = max(width, height)
+            durations = []
+            for _ in range(self.warmup_runs):
+                started = time.perf_counter()
+                model(frame, verbose=False, imgsz=imgsz)
+                durations.append((time.perf_counter() - started) * 1000)
+            if durations:
+                self.warmup_ms[f'{width}x{height}'] = {
+                    'first': round(durations[0], 2),
+                    'last': round(durations[-1], 2),
+                }
+
+    def get(self, timeout=0):
+        """Return the model, waiting up to timeout seconds; raise ModelNotReady otherwise"""
+        if not self._ready.is_set() and timeout:
+            self._ready.wait(timeout)
+        if not self._ready.is_set():
+            raise ModelNotReady(self.phase, self.error)
+        return self.model
+
+    def mark_listening(self):
+        """Record that the server is about to accept connections"""
+        self.milestones['time_to_first_port_s'] = round(time.time() - PROCESS_START, 3)
+
+    def record_inference(self, duration_ms):
+        """Record the first inference served after warm-up"""
+        if self.first_inference_ms is None and self._ready.is_set():
+            self.first_inference_ms = round(duration_ms, 2)
+            self.milestones['time_to_first_fast_inference_s'] = round(time.time() - PROCESS_START, 3)
+
+    def status(self):
+        """Readiness report for health/status endpoints"""
+        return {
+            'phase': self.phase,
+            'ready': self.ready,
+            'error': self.error,
+            'model': getattr(self.model, 'name', None),
+            'timings': dict(self.timings),
+            'warmup_ms': dict(self.warmup_ms),
+            'milestones': dict(self.milestones),
+            'first_inference_ms': self.first_inference_ms,
+        }
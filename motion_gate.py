@@ -0,0 +1,128 @@
+"""Skip inference on frames where nothing has moved.
+
+Each frame is shrunk to a tiny grayscale thumbnail (a fraction of a
+millisecond) and compared with the thumbnail of the last frame that was run
+through the model.  If fewer than ``threshold`` of its pixels changed by more
+than ``pixel_delta`` grey levels, the previous detections are reused.  The
+model is still re-run at least every ``recheck_seconds`` so slow changes are
+eventually picked up.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import config
+
+
+class MotionGate:
+    """Decide per frame whether the scene changed enough to run the model"""
+
+    def __init__(self, threshold=0.01, pixel_delta=15, recheck_seconds=2.0, width=64):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.recheck_seconds = recheck_seconds
+        self.width = width
+
+        self._gray = None
+        self._small = None
+        self._diff = None
+        self._reference = None
+        self._last_inference_at = None
+        self._lock = threading.Lock()
+
+        self.checks = 0
+        self.skipped = 0
+        self.last_change = 0.0
+        self.gate_seconds = 0.0
+        self.inference_seconds = 0.0
+        self.inferences = 0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        small_height = max(1, round(height * self.width / width))
+        if self._small is None or self._small.shape != (small_height, self.width):
+            self._small = np.empty((small_height, self.width), dtype=np.uint8)
+            self._diff = np.empty_like(self._small)
+            self._reference = None
+        if self._gray is None or self._gray.shape != (height, width):
+            self._gray = np.empty((height, width), dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        cv2.resize(self._gray, (self.width, small_height), dst=self._small, interpolation=cv2.INTER_AREA)
+        return self._small
+
+    def should_infer(self, frame, timestamp=None):
+        """Return True if the frame should go through the model"""
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        with self._lock:
+            started = time.perf_counter()
+            self.checks += 1
+            small = self._thumbnail(frame)
+            if self._reference is None:
+                changed = True
+                self.last_change = 1.0
+            else:
+                cv2.absdiff(small, self._reference, dst=self._diff)
+                self.last_change = np.count_nonzero(self._diff > self.pixel_delta) / self._diff.size
+                changed = self.last_change >= self.threshold
+            stale = (self._last_inference_at is None
+                     or timestamp - self._last_inference_at >= self.recheck_seconds)
+            infer = changed or stale
+            if infer:
+                # The reference is the last frame the model actually saw
+                self._reference = small.copy()
+                self._last_inference_at = timestamp
+            else:
+                self.skipped += 1
+            self.gate_seconds += time.perf_counter() - started
+            return infer
+
+    def record_inference(self, duration_ms):
+        """Record a model run so the CPU time saved by skipped frames can be estimated"""
+        with self._lock:
+            self.inferences += 1
+            self.inference_seconds += duration_ms / 1000
+
+    def reset(self):
+        with self._lock:
+            self._reference = None
+            self._last_inference_at = None
+
+    def stats(self):
+        with self._lock:
+            average_inference = self.inference_seconds / self.inferences if self.inferences else 0.0
+            return {
+                'checks': self.checks,
+                'skipped': self.skipped,
+                'skip_ratio': round(self.skipped / self.checks, 4) if self.checks else 0.0,
+                'last_change': round(self.last_change, 4),
+                'gate_ms_avg': round(self.gate_seconds / self.checks * 1000, 3) if self.checks else 0.0,
+                'inference_ms_avg': round(average_inference * 1000, 3),
+                # Model time avoided minus the cost of checking every frame
+                'cpu_seconds_saved': round(self.skipped * average_inference - self.gate_seconds, 3),
+            }
+
+
+def combined_stats(gates):
+    """Sum the counters of several gates (e.g. one per client)"""
+    totals = {'checks': 0, 'skipped': 0, 'cpu_seconds_saved': 0.0}
+    for gate in gates:
+        stats = gate.stats()
+        for key in totals:
+            totals[key] += stats[key]
+    totals['skip_ratio'] = round(totals['skipped'] / totals['checks'], 4) if totals['checks'] else 0.0
+    totals['cpu_seconds_saved'] = round(totals['cpu_seconds_saved'], 3)
+    return totals
+
+
+def create_gate():
+    """Build a gate from the YOLO_MOTION_* settings, or None when gating is off"""
+    if not config.MOTION_GATE:
+        return None
+    return MotionGate(
+        threshold=config.MOTION_THRESHOLD,
+        pixel_delta=config.MOTION_PIXEL_DELTA,
+        recheck_seconds=config.MOTION_RECHECK_SECONDS,
+        width=config.MOTION_WIDTH,
+    )
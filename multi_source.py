@@ -0,0 +1,253 @@
+"""Several video sources sharing one batched inference engine.
+
+Each source (camera index or video file) captures on its own thread into its
+own ``FrameRingBuffer``.  A single engine thread owns the model: on every
+pass it takes the newest not-yet-detected frame from each ready source and
+runs them through the model as one batch.  When more sources are ready than
+fit in a batch, sources left out of one pass go first in the next, so every
+feed gets the same share of the model however fast its camera is.
+
+A feed with regions of interest (``feed.roi_set``) contributes one crop per
+region to the batch instead of its whole frame.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_pipeline import FrameRingBuffer, StageStats
+from postprocess import Detections
+
+
+class SourceFeed:
+    """One capture source with its own ring buffer and latest detections"""
+
+    def __init__(self, feed_id, source, frame_shape, num_slots=4):
+        self.feed_id = feed_id
+        self.source = source
+        self.name = source.name
+        self.ring = FrameRingBuffer(frame_shape, num_slots)
+        self.capture_stats = StageStats('capture')
+        self.detect_stats = StageStats('detect')
+        self.latest_detections = []
+        self.detections_version = 0
+        self.last_detected_seq = 0
+        self.missed_turns = 0
+        # Optional roi.RoiSet: when it has regions only their crops are inferred
+        self.roi_set = None
+        self._lock = threading.Lock()
+        self._input_buffer = None
+        self._thread = None
+
+    def get_detections(self, timestamp=None):
+        """Return (version, detections) of the last detection pass for this feed"""
+        with self._lock:
+            return self.detections_version, self.latest_detections
+
+    def publish(self, detections):
+        with self._lock:
+            self.latest_detections = detections
+            self.detections_version += 1
+
+    def input_buffer(self, size):
+        if self._input_buffer is None or self._input_buffer.shape[0] != size:
+            self._input_buffer = np.empty((size, size, 3), dtype=np.uint8)
+        return self._input_buffer
+
+
+class MultiSourceEngine:
+    """Round-robin batched detection over the newest frame of each source"""
+
+    def __init__(self, model_getter, confidence_threshold=0.5, input_size=416, max_batch_size=8,
+                 controller=None, metrics=None, on_detections=None, on_inference=None):
+        self.model_getter = model_getter
+        self.confidence_threshold = confidence_threshold
+        self.input_size = input_size
+        self.max_batch_size = max(1, max_batch_size)
+        self.controller = controller
+        # Optional MetricsRegistry receiving resize/inference/postprocess timings
+        self.metrics = metrics
+        # on_detections(feed, detections) is called from the engine thread
+        self.on_detections = on_detections
+        self.on_inference = on_inference
+
+        self.feeds = []
+        self.batches = 0
+        self.batched_frames = 0
+        self.last_batch_ms = 0.0
+        self._frame_ready = threading.Event()
+        self._detect_active = threading.Event()
+        self._stopped = threading.Event()
+        self._next_feed = 0
+        self._thread = None
+
+    def add_source(self, source, frame_shape):
+        feed = SourceFeed(len(self.feeds), source, frame_shape)
+        self.feeds.append(feed)
+        return feed
+
+    def start(self, detect=False):
+        if detect:
+            self._detect_active.set()
+        for feed in self.feeds:
+            feed._thread = threading.Thread(target=self._capture_loop, args=(feed,),
+                                            name=f'capture-{feed.feed_id}', daemon=True)
+            feed._thread.start()
+        self._thread = threading.Thread(target=self._detect_loop, name='multi-source-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._detect_active.set()
+        self._frame_ready.set()
+        for feed in self.feeds:
+            feed.ring.close()
+
+    def join(self, timeout=None):
+        threads = [feed._thread for feed in self.feeds] + [self._thread]
+        for thread in threads:
+            if thread is not None:
+                thread.join(timeout)
+        for feed in self.feeds:
+            feed.source.release()
+
+    def set_detection_active(self, active):
+        if active:
+            self._detect_active.set()
+        else:
+            self._detect_active.clear()
+            for feed in self.feeds:
+                feed.publish([])
+
+    def _capture_loop(self, feed):
+        try:
+            while not self._stopped.is_set():
+                index, buffer = feed.ring.acquire_write()
+                if index is None:
+                    break
+                started = time.perf_counter()
+                if not feed.source.read_into(buffer):
+                    break
+                captured = time.perf_counter()
+                feed.ring.commit(index, captured)
+                feed.capture_stats.record(captured - started)
+                self._frame_ready.set()
+        finally:
+            feed.ring.close()
+
+    def _collect(self, size):
+        """Take the newest new frame from up to max_batch_size feeds, starting where the last pass stopped"""
+        batch = []
+        count = len(self.feeds)
+        for offset in range(count):
+            feed = self.feeds[(self._next_feed + offset) % count]
+            if len(batch) >= self.max_batch_size:
+                feed.missed_turns += 1
+                continue
+            ref = feed.ring.acquire_read(feed.last_detected_seq + 1, timeout=0)
+            if ref is None:
+                continue
+            try:
+                crops = None
+                if feed.roi_set:
+                    crops = feed.roi_set.crop(ref.frame, size)
+                else:
+                    cv2.resize(ref.frame, (size, size), dst=feed.input_buffer(size))
+                feed.last_detected_seq = ref.seq
+                batch.append((feed, ref.frame.shape[:2], ref.timestamp, crops))
+            finally:
+                feed.ring.release(ref)
+        if batch and len(batch) >= self.max_batch_size:
+            # Continue after the last feed served so skipped feeds go first next time
+            self._next_feed = (batch[-1][0].feed_id + 1) % count
+        return batch
+
+    def _detect_loop(self):
+        while not self._stopped.is_set():
+            if not self._detect_active.wait(0.2):
+                continue
+            model = self.model_getter()
+            if model is None:
+                time.sleep(0.1)
+                continue
+            self._frame_ready.wait(0.5)
+            self._frame_ready.clear()
+            if self.controller is not None:
+                self.input_size = self.controller.input_size
+            size = self.input_size
+
+            collect_started = time.perf_counter()
+            batch = self._collect(size)
+            if not batch:
+                continue
+            if self.metrics is not None:
+                self.metrics.observe('resize', time.perf_counter() - collect_started)
+            try:
+                inputs = []
+                for feed, _, _, crops in batch:
+                    inputs.extend(crops.crops if crops is not None else [feed.input_buffer(size)])
+                started = time.perf_counter()
+                # Region crops may be smaller than size; a batch of only small crops runs smaller
+                results = model(inputs, verbose=False, conf=self.confidence_threshold,
+                                imgsz=max(frame.shape[0] for frame in inputs))
+                batch_ms = (time.perf_counter() - started) * 1000
+            except Exception as e:
+                if self.metrics is not None:
+                    self.metrics.error('detection')
+                print(f"Detection error: {e}")
+                continue
+            if self.metrics is not None:
+                self.metrics.observe('inference', batch_ms / 1000)
+            self.batches += 1
+            self.batched_frames += len(batch)
+            self.last_batch_ms = batch_ms
+            if self.on_inference is not None:
+                self.on_inference(batch_ms)
+            if self.controller is not None:
+                waiting = sum(1 for feed in self.feeds if feed.ring.seq > feed.last_detected_seq)
+                self.controller.record(batch_ms, queue_depth=waiting)
+
+            finished = time.perf_counter()
+            offset = 0
+            for feed, (height, width), captured_at, crops in batch:
+                postprocess_started = time.perf_counter()
+                if crops is not None:
+                    feed_results = results[offset:offset + len(crops.crops)]
+                    offset += len(crops.crops)
+                    detections = feed.roi_set.merge(crops, feed_results, model.names, self.confidence_threshold, size)
+                else:
+                    result = results[offset]
+                    offset += 1
+                    detections = (Detections.from_result(result, model.names)
+                                  .filter(self.confidence_threshold)
+                                  .rescale(width / size, height / size)
+                                  .to_list())
+                if self.metrics is not None:
+                    self.metrics.observe('postprocess', time.perf_counter() - postprocess_started)
+                if not self._detect_active.is_set():
+                    break
+                feed.publish(detections)
+                feed.detect_stats.record(batch_ms / 1000, finished - captured_at)
+                if self.on_detections is not None:
+                    self.on_detections(feed, detections)
+            # More frames may have arrived while the model was running
+            if any(feed.ring.seq > feed.last_detected_seq for feed in self.feeds):
+                self._frame_ready.set()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'avg_batch_size': round(self.batched_frames / self.batches, 2) if self.batches else 0.0,
+            'last_batch_ms': round(self.last_batch_ms, 2),
+            'input_size': self.input_size,
+            'feeds': [
+                {
+                    'name': feed.name,
+                    'capture': feed.capture_stats.snapshot(),
+                    'detect': feed.detect_stats.snapshot(),
+                    'missed_turns': feed.missed_turns,
+                }
+                for feed in self.feeds
+            ],
+        }
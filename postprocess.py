@@ -0,0 +1,111 @@
+"""Vectorized post-processing of YOLO results.
+
+Boxes, confidences and class ids are kept as whole NumPy columns; the
+confidence filter, rescaling and class-name lookup are single array
+operations rather than a Python loop per box.  A ``Detections`` object can be
+turned into the existing list-of-dicts JSON shape or a compact column dict
+(served by ``/api/detect`` with ``format=columns``).
+"""
+import numpy as np
+
+_names_cache = {}
+
+
+def names_array(names):
+    """Return class names as a NumPy object array indexable by class id (cached per mapping)"""
+    key = id(names)
+    cached = _names_cache.get(key)
+    if cached is not None and cached[0] is names:
+        return cached[1]
+    if isinstance(names, dict):
+        size = max(names) + 1 if names else 0
+        array = np.array([str(i) for i in range(size)], dtype=object)
+        for class_id, name in names.items():
+            array[class_id] = name
+    else:
+        array = np.array(list(names), dtype=object)
+    _names_cache[key] = (names, array)
+    return array
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+class Detections:
+    """Columnar detections: boxes (N, 4) xyxy, confidences (N,), class_ids (N,)"""
+
+    __slots__ = ('boxes', 'confidences', 'class_ids', 'names')
+
+    def __init__(self, boxes, confidences, class_ids, names):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+        self.names = names
+
+    @classmethod
+    def empty(cls, names):
+        return cls(np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int32), names)
+
+    @classmethod
+    def from_result(cls, result, names):
+        """Build from an ultralytics Result with a single device-to-host copy"""
+        if result.boxes is None:
+            return cls.empty(names)
+        data = result.boxes.data
+        if hasattr(data, 'cpu'):
+            data = data.cpu().numpy()
+        data = np.asarray(data)
+        if data.size == 0:
+            return cls.empty(names)
+        # Rows are x1, y1, x2, y2, [track_id,] conf, cls
+        return cls(data[:, :4], data[:, -2], data[:, -1], names)
+
+    def __len__(self):
+        return len(self.confidences)
+
+    def filter(self, conf_threshold):
+        """Keep detections with confidence >= threshold"""
+        keep = self.confidences >= conf_threshold
+        if keep.all():
+            return self
+        return Detections(self.boxes[keep], self.confidences[keep], self.class_ids[keep], self.names)
+
+    def rescale(self, scale_x, scale_y):
+        """Scale box coordinates, e.g. from model input size back to the frame size"""
+        if scale_x == 1 and scale_y == 1:
+            return self
+        scale = np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+        return Detections(self.boxes * scale, self.confidences, self.class_ids, self.names)
+
+    def class_names(self):
+        """Vectorized class-id to name lookup"""
+        if len(self) == 0:
+            return []
+        return names_array(self.names)[self.class_ids].tolist()
+
+    def to_list(self):
+        """Existing JSON shape: a list of {bbox, confidence, class_id, class_name} dicts"""
+        return [
+            {'bbox': bbox, 'confidence': confidence, 'class_id': class_id, 'class_name': class_name}
+            for bbox, confidence, class_id, class_name in zip(
+                self.boxes.tolist(), self.confidences.tolist(), self.class_ids.tolist(), self.class_names()
+            )
+        ]
+
+    def to_columns(self):
+        """Compact JSON shape: one list per column"""
+        return {
+            'boxes': self.boxes.tolist(),
+            'confidences': self.confidences.tolist(),
+            'class_ids': self.class_ids.tolist(),
+            'class_names': self.class_names(),
+        }
@@ -0,0 +1,219 @@
+"""Coalescing Tk render scheduler for pipeline frames.
+
+Runs entirely on the Tk main thread: a single ``root.after`` timer fires at
+the capped display rate and shows only the newest committed frame, so a busy
+Tk loop never accumulates queued callbacks or images.  One ``PhotoImage`` is
+created up front and updated with ``paste``; the RGB conversion goes into a
+preallocated buffer.
+
+Detection overlays are drawn once into an overlay layer when the detections
+change and composited onto each frame with a mask, instead of being redrawn
+on every frame.  While a tracker is extrapolating moving boxes between
+detector runs, the detections change with every frame and so does the overlay.
+
+``GridRenderScheduler`` shows several sources as tiles of one image, each
+tile with its own overlay layer.
+
+Regions of interest set with ``set_regions`` are outlined in the overlay layer,
+and ``locate`` maps a click on the label back to a tile and a normalized
+position in its frame, so regions can be drawn with the mouse.
+"""
+import math
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+from roi import REGION_COLOR
+
+# Never produced by the drawing code (green boxes, black text)
+OVERLAY_KEY = (255, 0, 255)
+
+
+class _Tile:
+    """One ring buffer rendered into a region of the shared RGB buffer"""
+
+    def __init__(self, ring, get_detections, rgb_view, metrics=None):
+        self.ring = ring
+        self.metrics = metrics
+        self.get_detections = get_detections
+        self.rgb = rgb_view
+        self.height, self.width = rgb_view.shape[:2]
+        self.scaled = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.overlay = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.mask = np.zeros((self.height, self.width), dtype=bool)
+        self.regions = []
+        self.has_overlay = False
+        self.overlay_version = None
+        self.last_seq = 0
+        self.rendered = 0
+        self.dropped = 0
+        self.overlay_redraws = 0
+
+    def set_regions(self, regions):
+        self.regions = list(regions)
+        # Force the overlay to be redrawn on the next frame
+        self.overlay_version = None
+
+    def render(self, annotate):
+        """Copy the newest frame into the tile; False if there is no new frame"""
+        ref = self.ring.acquire_read(self.last_seq + 1, timeout=0)
+        if ref is None:
+            return False
+        try:
+            # Frames committed since the last render were never shown
+            if self.last_seq:
+                self.dropped += max(0, ref.seq - self.last_seq - 1)
+            self.last_seq = ref.seq
+            frame_height, frame_width = ref.frame.shape[:2]
+            if (frame_width, frame_height) == (self.width, self.height):
+                cv2.cvtColor(ref.frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+            else:
+                cv2.resize(ref.frame, (self.width, self.height), dst=self.scaled)
+                cv2.cvtColor(self.scaled, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        finally:
+            self.ring.release(ref)
+
+        self._update_overlay(annotate, frame_width, frame_height, ref.timestamp)
+        if self.has_overlay:
+            np.copyto(self.rgb, self.overlay, where=self.mask[..., None])
+        self.rendered += 1
+        return True
+
+    def _update_overlay(self, annotate, frame_width, frame_height, timestamp):
+        """Redraw the overlay layer only when the detections (or tracked boxes) have changed"""
+        version, detections = self.get_detections(timestamp)
+        if version == self.overlay_version:
+            return
+        self.overlay_version = version
+        self.has_overlay = bool(detections) or bool(self.regions)
+        if not self.has_overlay:
+            return
+
+        scale_x = self.width / frame_width
+        scale_y = self.height / frame_height
+        if scale_x != 1 or scale_y != 1:
+            detections = [
+                dict(d, bbox=[d['bbox'][0] * scale_x, d['bbox'][1] * scale_y,
+                              d['bbox'][2] * scale_x, d['bbox'][3] * scale_y])
+                for d in detections
+            ]
+        started = time.perf_counter()
+        self.overlay[:] = OVERLAY_KEY
+        for region in self.regions:
+            x1, y1, x2, y2 = region.rect(self.width, self.height)
+            cv2.rectangle(self.overlay, (x1, y1), (x2 - 1, y2 - 1), REGION_COLOR, 1)
+        annotate(self.overlay, detections)
+        np.any(self.overlay != OVERLAY_KEY, axis=2, out=self.mask)
+        # Overlay colours are drawn in BGR; composite in RGB
+        cv2.cvtColor(self.overlay, cv2.COLOR_BGR2RGB, dst=self.overlay)
+        self.overlay_redraws += 1
+        if self.metrics is not None:
+            self.metrics.observe('draw', time.perf_counter() - started)
+
+
+class RenderScheduler:
+    """Show the newest frame of a FrameRingBuffer in a Tk label at a capped rate"""
+
+    def __init__(self, root, label, ring, get_detections, annotate, max_fps=30, size=(640, 480), metrics=None):
+        # get_detections(timestamp) -> (version, detections); annotate(frame, detections) draws in place
+        self._setup(root, label, [(ring, get_detections)], annotate, max_fps, size, columns=1, metrics=metrics)
+
+    def _setup(self, root, label, feeds, annotate, max_fps, size, columns, metrics=None):
+        self.root = root
+        # Optional MetricsRegistry receiving draw (overlay) and display timings
+        self.metrics = metrics
+        self.label = label
+        self.annotate = annotate
+        self.interval_ms = max(1, int(1000 / max_fps))
+        self.width, self.height = size
+
+        rows = math.ceil(len(feeds) / columns)
+        tile_width, tile_height = self.width // columns, self.height // rows
+        self.columns = columns
+        self.tile_size = (tile_width, tile_height)
+        self._rgb = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.tiles = []
+        for index, (ring, get_detections) in enumerate(feeds):
+            row, column = divmod(index, columns)
+            view = self._rgb[row * tile_height:(row + 1) * tile_height,
+                             column * tile_width:(column + 1) * tile_width]
+            self.tiles.append(_Tile(ring, get_detections, view, metrics))
+        self._photo = ImageTk.PhotoImage(Image.new('RGB', (self.width, self.height)))
+
+        self._timer = None
+        self.rendered = 0
+        self._render_times = []
+
+    def start(self):
+        self.label.config(image=self._photo, text="")
+        self.label.image = self._photo
+        self._schedule()
+
+    def stop(self):
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+
+    def _schedule(self):
+        self._timer = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        started = time.perf_counter()
+        updated = False
+        for tile in self.tiles:
+            updated = tile.render(self.annotate) or updated
+        if updated:
+            self._photo.paste(Image.fromarray(self._rgb))
+            if self.metrics is not None:
+                self.metrics.observe('display', time.perf_counter() - started)
+            self.rendered += 1
+            self._render_times.append(time.perf_counter())
+            if len(self._render_times) > 60:
+                del self._render_times[0]
+
+        if not all(tile.ring.closed for tile in self.tiles):
+            self._schedule()
+
+    def set_regions(self, index, regions):
+        """Outline regions of interest (normalized roi.Region objects) on one tile"""
+        self.tiles[index].set_regions(regions)
+
+    def locate(self, x, y):
+        """(tile index, x, y normalized to the tile) for a point on the image, or None outside every tile"""
+        tile_width, tile_height = self.tile_size
+        if x < 0 or y < 0:
+            return None
+        column, row = int(x // tile_width), int(y // tile_height)
+        index = row * self.columns + column
+        if column >= self.columns or index >= len(self.tiles):
+            return None
+        return index, (x - column * tile_width) / tile_width, (y - row * tile_height) / tile_height
+
+    @property
+    def dropped(self):
+        return sum(tile.dropped for tile in self.tiles)
+
+    def fps(self):
+        times = self._render_times
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats(self):
+        return {
+            'fps': round(self.fps(), 2),
+            'rendered': self.rendered,
+            'dropped': self.dropped,
+            'overlay_redraws': sum(tile.overlay_redraws for tile in self.tiles),
+        }
+
+
+class GridRenderScheduler(RenderScheduler):
+    """Show several ring buffers as a tiled grid in one Tk label"""
+
+    def __init__(self, root, label, feeds, annotate, max_fps=30, size=(1280, 720), metrics=None):
+        # feeds: list of (ring, get_detections) pairs, laid out row by row
+        columns = math.ceil(math.sqrt(len(feeds)))
+        self._setup(root, label, feeds, annotate, max_fps, size, columns, metrics)
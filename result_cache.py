@@ -0,0 +1,248 @@
+"""Content-addressed cache for detection results.
+
+Results are keyed on a hash of the uploaded image bytes together with the
+model name and detection thresholds, so the same image processed with the same
+settings is served without touching the model.  There are two tiers:
+
+* an in-memory LRU bounded by entry count and total bytes
+* an on-disk tier bounded by total bytes, evicting least recently used files
+
+Both tiers keep hit, miss and eviction counters.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def make_cache_key(image_bytes, model_name, **params):
+    """Hash image bytes plus the model name and detection parameters"""
+    digest = hashlib.sha256()
+    digest.update(image_bytes)
+    digest.update(b'\0')
+    digest.update(str(model_name).encode('utf-8'))
+    for name in sorted(params):
+        digest.update(f'\0{name}={params[name]!r}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MemoryLRU:
+    """In-memory LRU tier holding byte values"""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._items[key] = value
+        self._bytes += len(value)
+        while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._items.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._items),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class DiskLRU:
+    """On-disk tier bounded by total size; file mtimes track recency"""
+
+    suffix = '.cache'
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # key -> size, least recently used first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _load_index(self):
+        """Rebuild the LRU order from files left by a previous run"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(self.suffix):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+        self._evict()
+
+    def get(self, key):
+        if key not in self._index:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path)
+        except OSError:
+            self._bytes -= self._index.pop(key)
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def stage(self, key, value):
+        """Write value to a temporary file and return its path (None if too large).
+
+        Touches no shared state, so it can run outside the cache lock.
+        """
+        if len(value) > self.max_bytes:
+            return None
+        tmp_path = f'{self._path(key)}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(value)
+        except OSError:
+            self._discard(tmp_path)
+            raise
+        return tmp_path
+
+    def commit(self, key, tmp_path, size):
+        """Move a staged file into place and record it in the index"""
+        try:
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            self._discard(tmp_path)
+            raise
+        old_size = self._index.pop(key, None)
+        if old_size is not None:
+            self._bytes -= old_size
+        self._index[key] = size
+        self._bytes += size
+        self._evict()
+
+    def put(self, key, value):
+        tmp_path = self.stage(key, value)
+        if tmp_path is not None:
+            self.commit(key, tmp_path, len(value))
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        for key in list(self._index):
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        self._index.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._index),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'directory': self.directory,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class ResultCache:
+    """Two-tier (memory, then disk) cache of serialized detection results"""
+
+    def __init__(self, memory_entries=256, memory_bytes=64 * 1024 * 1024,
+                 disk_directory=None, disk_bytes=512 * 1024 * 1024):
+        self._lock = threading.Lock()
+        self.memory = MemoryLRU(memory_entries, memory_bytes)
+        self.disk = DiskLRU(disk_directory, disk_bytes) if disk_directory else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return cached bytes for key, promoting disk hits into memory"""
+        with self._lock:
+            value = self.memory.get(key)
+            if value is None and self.disk is not None:
+                value = self.disk.get(key)
+                if value is not None:
+                    self.memory.put(key, value)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store bytes in both tiers"""
+        # The slow file write happens before taking the lock; only the rename and index update are locked
+        tmp_path = self.disk.stage(key, value) if self.disk is not None else None
+        with self._lock:
+            self.memory.put(key, value)
+            if tmp_path is not None:
+                self.disk.commit(key, tmp_path, len(value))
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+            if self.disk is not None:
+                self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory': self.memory.stats(),
+                'disk': self.disk.stats() if self.disk is not None else None,
+            }
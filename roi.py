@@ -0,0 +1,219 @@
+"""Region-of-interest cropping with batched ROI inference.
+
+A ``RoiSet`` holds the regions of one source in normalized coordinates
+(fractions of the frame width and height), so they stay valid across
+resolutions and reduced decodes.  For each frame every region is cropped and
+resized to one common square input size -- the regions' largest native side
+rounded up to a multiple of 32, capped at the model input size -- so all
+crops of a frame go through the model as a single batch.  Boxes are mapped
+back to full-frame coordinates and duplicates from overlapping regions are
+merged with ``tiling.nms``.
+
+Inferring only the crops costs ``regions x crop_size^2`` input pixels instead
+of ``input_size^2`` for the whole squashed frame, and a small region is seen
+at up to its native resolution instead of being shrunk with the rest of the
+frame.  ``stats()`` reports both, with per-region hit counts.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+from postprocess import Detections
+from tiling import nms
+
+STRIDE = 32
+REGION_COLOR = (255, 200, 0)
+
+
+def _clip(value):
+    return min(1.0, max(0.0, float(value)))
+
+
+class Region:
+    """Named rectangle in normalized (0-1) frame coordinates"""
+
+    __slots__ = ('name', 'x1', 'y1', 'x2', 'y2')
+
+    def __init__(self, name, x1, y1, x2, y2):
+        self.name = str(name)
+        self.x1, self.x2 = sorted((_clip(x1), _clip(x2)))
+        self.y1, self.y2 = sorted((_clip(y1), _clip(y2)))
+        if self.x2 - self.x1 <= 0 or self.y2 - self.y1 <= 0:
+            raise ValueError(f'Region {self.name} is empty')
+
+    @classmethod
+    def from_dict(cls, data, default_name='roi'):
+        return cls(data.get('name') or default_name, data['x1'], data['y1'], data['x2'], data['y2'])
+
+    def to_dict(self):
+        return {'name': self.name, 'x1': round(self.x1, 4), 'y1': round(self.y1, 4),
+                'x2': round(self.x2, 4), 'y2': round(self.y2, 4)}
+
+    def rect(self, width, height):
+        """Pixel (x1, y1, x2, y2) in a width x height frame, at least one pixel in size"""
+        x1 = min(int(self.x1 * width), width - 1)
+        y1 = min(int(self.y1 * height), height - 1)
+        return x1, y1, max(x1 + 1, int(round(self.x2 * width))), max(y1 + 1, int(round(self.y2 * height)))
+
+
+def parse_regions(spec):
+    """Parse '[source@]name=x1,y1,x2,y2;...' into {source or None: [Region]}.
+
+    Entries without a source apply to every source (key None); names are optional.
+    """
+    regions = {}
+    for index, item in enumerate(part.strip() for part in spec.split(';')):
+        if not item:
+            continue
+        source, _, item = item.rpartition('@')
+        name, _, coords = item.rpartition('=')
+        values = [float(value) for value in coords.split(',')]
+        if len(values) != 4:
+            raise ValueError(f'Region {item!r} needs four coordinates x1,y1,x2,y2')
+        regions.setdefault(source.strip() or None, []).append(Region(name.strip() or f'roi{index + 1}', *values))
+    return regions
+
+
+def format_regions(regions):
+    """Inverse of parse_regions"""
+    items = []
+    for source, source_regions in regions.items():
+        prefix = f'{source}@' if source is not None else ''
+        for region in source_regions:
+            items.append(f'{prefix}{region.name}={region.x1:.3f},{region.y1:.3f},{region.x2:.3f},{region.y2:.3f}')
+    return '; '.join(items)
+
+
+def crop_input_size(rects, max_size):
+    """Largest native region side rounded up to the model stride, capped at max_size"""
+    native = max(max(x2 - x1, y2 - y1) for x1, y1, x2, y2 in rects)
+    return min(max_size, max(STRIDE, -(-native // STRIDE) * STRIDE))
+
+
+class RoiBatch:
+    """Crops of one frame, ready to be run through the model together"""
+
+    __slots__ = ('regions', 'rects', 'size', 'crops', 'frame_shape')
+
+    def __init__(self, regions, rects, size, crops, frame_shape):
+        self.regions = regions
+        self.rects = rects
+        self.size = size
+        self.crops = crops
+        self.frame_shape = frame_shape
+
+
+class RoiSet:
+    """Regions of one source, with per-region hit counts and compute accounting"""
+
+    def __init__(self, regions=(), merge_threshold=0.5):
+        self.merge_threshold = merge_threshold
+        self._lock = threading.Lock()
+        self.set_regions(regions)
+
+    def __bool__(self):
+        return bool(self.regions)
+
+    def set_regions(self, regions):
+        """Replace the regions and reset the statistics"""
+        with self._lock:
+            self.regions = list(regions)
+            self._hits = np.zeros(len(self.regions), dtype=np.int64)
+            self._frames_with_hits = np.zeros(len(self.regions), dtype=np.int64)
+            self._frames = 0
+            self._input_pixels = 0
+            self._full_pixels = 0
+            self._crop_size = 0
+            self._resolution_gain = 1.0
+
+    def crop(self, frame, max_size):
+        """Crop every region and resize the crops to one common square size"""
+        regions = self.regions
+        height, width = frame.shape[:2]
+        rects = [region.rect(width, height) for region in regions]
+        size = crop_input_size(rects, max_size)
+        crops = [cv2.resize(frame[y1:y2, x1:x2], (size, size)) for x1, y1, x2, y2 in rects]
+        return RoiBatch(regions, rects, size, crops, (height, width))
+
+    def merge(self, batch, results, names, conf_threshold, full_size):
+        """Full-frame detections from the per-crop results, each tagged with its region's name"""
+        boxes, confidences, class_ids, owners = [], [], [], []
+        for index, ((x1, y1, x2, y2), result) in enumerate(zip(batch.rects, results)):
+            detections = (Detections.from_result(result, names)
+                          .filter(conf_threshold)
+                          .rescale((x2 - x1) / batch.size, (y2 - y1) / batch.size))
+            if len(detections):
+                boxes.append(detections.boxes + np.array([x1, y1, x1, y1], dtype=np.float32))
+                confidences.append(detections.confidences)
+                class_ids.append(detections.class_ids)
+                owners.append(np.full(len(detections), index))
+
+        counts = np.zeros(len(batch.regions), dtype=np.int64)
+        merged = []
+        if boxes:
+            boxes = np.concatenate(boxes)
+            confidences = np.concatenate(confidences)
+            class_ids = np.concatenate(class_ids)
+            owners = np.concatenate(owners)
+            # An object inside two overlapping regions is detected twice
+            keep = nms(boxes, confidences, class_ids, self.merge_threshold)
+            merged = Detections(boxes[keep], confidences[keep], class_ids[keep], names).to_list()
+            for detection, owner in zip(merged, owners[keep].tolist()):
+                detection['roi'] = batch.regions[owner].name
+            counts = np.bincount(owners[keep], minlength=len(batch.regions))
+
+        height, width = batch.frame_shape
+        # Upscaling a region past its native size adds no detail, so the gain is capped there
+        full_scale = min(1.0, full_size / max(width, height))
+        gains = [min(1.0, batch.size / max(x2 - x1, y2 - y1)) / full_scale for x1, y1, x2, y2 in batch.rects]
+        with self._lock:
+            # Regions may have been replaced while this batch was in flight
+            if len(self._hits) == len(counts):
+                self._hits += counts
+                self._frames_with_hits += counts > 0
+            self._frames += 1
+            self._input_pixels += len(batch.crops) * batch.size * batch.size
+            self._full_pixels += full_size * full_size
+            self._crop_size = batch.size
+            self._resolution_gain = float(np.mean(gains))
+        return merged
+
+    def draw(self, frame):
+        """Outline the regions on a frame in place"""
+        height, width = frame.shape[:2]
+        for region in self.regions:
+            x1, y1, x2, y2 = region.rect(width, height)
+            cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), REGION_COLOR, 1)
+        return frame
+
+    def stats(self):
+        with self._lock:
+            regions = [
+                dict(region.to_dict(), hits=int(hits), frames_with_hits=int(frames_with_hits))
+                for region, hits, frames_with_hits in zip(self.regions, self._hits, self._frames_with_hits)
+            ]
+            saved = 1 - self._input_pixels / self._full_pixels if self._full_pixels else 0.0
+            return {
+                'regions': regions,
+                'frames': self._frames,
+                'crop_size': self._crop_size,
+                'input_pixels': self._input_pixels,
+                'full_frame_pixels': self._full_pixels,
+                # Negative when the crops together cost more than one full frame
+                'compute_saved': round(saved, 4),
+                'resolution_gain': round(self._resolution_gain, 3),
+            }
+
+
+def combined_stats(roi_sets):
+    """Region hits and compute saved across several sources' RoiSets"""
+    stats = [roi_set.stats() for roi_set in roi_sets if roi_set]
+    input_pixels = sum(item['input_pixels'] for item in stats)
+    full_pixels = sum(item['full_frame_pixels'] for item in stats)
+    return {
+        'regions': [region for item in stats for region in item['regions']],
+        'frames': sum(item['frames'] for item in stats),
+        'compute_saved': round(1 - input_pixels / full_pixels, 4) if full_pixels else 0.0,
+        'resolution_gain': round(sum(item['resolution_gain'] for item in stats) / len(stats), 3) if stats else 1.0,
+    }
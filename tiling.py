@@ -0,0 +1,226 @@
+"""Tiled inference for images much larger than the model input.
+
+A 4000x3000 photo resized to 640 px loses most small objects.  Here the
+image is covered with overlapping ``tile_size`` tiles (the last row and
+column are aligned to the image edge) that are cut lazily as views of the
+decoded image and run through the model ``batch_size`` at a time.  Boxes are
+shifted back into image coordinates and duplicates from overlapping tiles are
+merged with a class-aware NMS whose overlap test is vectorized over all
+remaining boxes.  Overlap is measured as intersection over the smaller box by
+default, so a box cut off at one tile's edge is merged into the complete box
+from the neighbouring tile.
+
+An optional extra pass over the whole (downscaled) image keeps objects
+larger than a tile from being reported only in pieces.
+
+    python tiling.py photo.jpg
+    python tiling.py photos/*.jpg --tile-size 960 --overlap 0.25 --output-dir tiled --json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import codec
+import config
+from postprocess import Detections, box_iou
+
+
+def tile_starts(length, tile_size, stride):
+    """Start offsets along one axis, with the last tile flush with the edge"""
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, stride))
+    starts.append(length - tile_size)
+    return starts
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """(x, y) top-left corners of the tiles covering a width x height image"""
+    stride = max(1, int(round(tile_size * (1 - overlap))))
+    return [(x, y) for y in tile_starts(height, tile_size, stride) for x in tile_starts(width, tile_size, stride)]
+
+
+def iter_tiles(image, tile_size, overlap):
+    """Yield (x, y, tile) with each tile a view into image (no copies)"""
+    height, width = image.shape[:2]
+    for x, y in tile_grid(width, height, tile_size, overlap):
+        yield x, y, image[y:y + tile_size, x:x + tile_size]
+
+
+def box_ios(box, boxes):
+    """Intersection over the smaller area between one xyxy box and (N, 4) boxes"""
+    top_left = np.maximum(box[:2], boxes[:, :2])
+    bottom_right = np.minimum(box[2:], boxes[:, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+    area = np.prod(box[2:] - box[:2])
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    return intersection / (np.minimum(area, areas) + 1e-9)
+
+
+def nms(boxes, scores, class_ids, threshold, metric='ios'):
+    """Greedy class-aware NMS; returns indices of the kept boxes, best first.
+
+    metric is 'iou' (standard) or 'ios' (intersection over the smaller box,
+    which also suppresses partial boxes cut off at tile borders).
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    # Shift each class into its own coordinate range so classes never overlap
+    offset = class_ids.astype(np.float32)[:, None] * (float(boxes.max()) + 1)
+    shifted = boxes + offset
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        if not rest.size:
+            break
+        if metric == 'iou':
+            overlap = box_iou(shifted[best:best + 1], shifted[rest])[0]
+        else:
+            overlap = box_ios(shifted[best], shifted[rest])
+        order = rest[overlap <= threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+class TiledDetector:
+    """Run a model over overlapping tiles of an image and merge the boxes"""
+
+    def __init__(self, model, tile_size=640, overlap=0.2, batch_size=8, conf=0.25, iou=0.7,
+                 merge_threshold=0.5, merge_metric='ios', full_image_pass=True, metrics=None):
+        if not 0 <= overlap < 1:
+            raise ValueError('overlap must be in [0, 1)')
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.batch_size = max(1, batch_size)
+        self.conf = conf
+        self.iou = iou
+        self.merge_threshold = merge_threshold
+        self.merge_metric = merge_metric
+        self.full_image_pass = full_image_pass
+        self.metrics = metrics
+
+    @classmethod
+    def from_config(cls, model, metrics=None):
+        """Detector with tile and merge settings from config"""
+        return cls(model, tile_size=config.TILE_SIZE, overlap=config.TILE_OVERLAP,
+                   batch_size=config.TILE_BATCH_SIZE, conf=config.DETECTION_CONF, iou=config.DETECTION_IOU,
+                   merge_threshold=config.TILE_MERGE_THRESHOLD, merge_metric=config.TILE_MERGE_METRIC,
+                   full_image_pass=config.TILE_FULL_IMAGE_PASS, metrics=metrics)
+
+    def wants_tiles(self, image):
+        """True when the image is large enough for tiling to find more than a plain pass"""
+        return max(image.shape[:2]) >= 2 * self.tile_size
+
+    def _infer(self, frames, **kwargs):
+        started = time.perf_counter()
+        results = self.model(frames, conf=self.conf, iou=self.iou, verbose=False, **kwargs)
+        if self.metrics is not None:
+            self.metrics.observe('inference', time.perf_counter() - started)
+        return results
+
+    def detect(self, image):
+        """Detections for the whole image in image coordinates, plus the number of tiles run"""
+        height, width = image.shape[:2]
+        boxes, confidences, class_ids = [], [], []
+        batch = []
+
+        def flush():
+            results = self._infer([tile for _, _, tile in batch], imgsz=self.tile_size)
+            for (x, y, _), result in zip(batch, results):
+                detections = Detections.from_result(result, self.model.names)
+                if len(detections):
+                    boxes.append(detections.boxes + np.array([x, y, x, y], dtype=np.float32))
+                    confidences.append(detections.confidences)
+                    class_ids.append(detections.class_ids)
+            batch.clear()
+
+        # Only batch_size tiles are referenced at a time; each is a view, not a copy
+        tiles = 0
+        for x, y, tile in iter_tiles(image, self.tile_size, self.overlap):
+            batch.append((x, y, tile))
+            tiles += 1
+            if len(batch) >= self.batch_size:
+                flush()
+        if batch:
+            flush()
+
+        if self.full_image_pass and tiles > 1:
+            detections = Detections.from_result(self._infer(image)[0], self.model.names)
+            if len(detections):
+                boxes.append(detections.boxes)
+                confidences.append(detections.confidences)
+                class_ids.append(detections.class_ids)
+
+        if not boxes:
+            return Detections.empty(self.model.names), tiles
+        started = time.perf_counter()
+        boxes = np.concatenate(boxes)
+        confidences = np.concatenate(confidences)
+        class_ids = np.concatenate(class_ids)
+        keep = nms(boxes, confidences, class_ids, self.merge_threshold, self.merge_metric)
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+        merged = Detections(boxes[keep], confidences[keep], class_ids[keep], self.model.names)
+        if self.metrics is not None:
+            self.metrics.observe('postprocess', time.perf_counter() - started)
+        return merged, tiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='+', help='Image files to run tiled detection on')
+    parser.add_argument('--tile-size', type=int, default=config.TILE_SIZE)
+    parser.add_argument('--overlap', type=float, default=config.TILE_OVERLAP, help='Fraction of a tile shared with its neighbour')
+    parser.add_argument('--batch-size', type=int, default=config.TILE_BATCH_SIZE, help='Tiles per forward pass')
+    parser.add_argument('--merge-threshold', type=float, default=config.TILE_MERGE_THRESHOLD)
+    parser.add_argument('--merge-metric', choices=('ios', 'iou'), default=config.TILE_MERGE_METRIC)
+    parser.add_argument('--no-full-pass', action='store_true', help='Skip the extra whole-image pass')
+    parser.add_argument('--max-pixels', type=int, default=config.TILE_MAX_IMAGE_PIXELS,
+                        help='Decode larger images at 1/2, 1/4 or 1/8 scale (0 disables)')
+    parser.add_argument('--output-dir', default='', help='Write annotated images here')
+    parser.add_argument('--json', action='store_true', help='Print detections as JSON lines')
+    args = parser.parse_args()
+
+    from backends import load_configured_backend
+    model = load_configured_backend()
+    detector = TiledDetector(model, tile_size=args.tile_size, overlap=args.overlap, batch_size=args.batch_size,
+                             conf=config.DETECTION_CONF, iou=config.DETECTION_IOU,
+                             merge_threshold=args.merge_threshold, merge_metric=args.merge_metric,
+                             full_image_pass=not args.no_full_pass)
+    annotator = codec.Annotator()
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    for path in args.images:
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            image, scale = codec.decode_image(data, max_pixels=args.max_pixels)
+        except ValueError as e:
+            print(f"❌ {path}: {e}")
+            continue
+        started = time.perf_counter()
+        detections, tiles = detector.detect(image)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        detection_list = detections.to_list()
+        if args.output_dir:
+            annotator.draw(image, detection_list)
+            name = os.path.splitext(os.path.basename(path))[0]
+            with open(os.path.join(args.output_dir, f'{name}_tiled.jpg'), 'wb') as f:
+                f.write(codec.encode_jpeg(image))
+        if args.json:
+            print(json.dumps({'filename': path, 'tiles': tiles, 'scale': scale,
+                              'detections': codec.scale_detections(detection_list, scale)}))
+        else:
+            print(f"🧩 {path}: {len(detections)} objects from {tiles} tiles in {elapsed_ms:.0f} ms"
+                  + (f" (decoded at 1/{scale})" if scale > 1 else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Lightweight multi-object tracking between detector runs.
+
+Detections are associated with existing tracks by IoU (same class only,
+greedy on the highest overlap) against each track's predicted box.  Every
+track keeps a constant-velocity motion model, smoothed over successive
+matches, so boxes can be extrapolated on frames that are not run through the
+model.  Each track keeps a stable ``track_id`` for as long as it is matched.
+"""
+import threading
+
+import numpy as np
+
+from postprocess import box_iou
+
+
+class Track:
+    """One tracked object: last observed box, velocity in pixels per second"""
+
+    __slots__ = ('track_id', 'class_id', 'class_name', 'confidence', 'box', 'velocity',
+                 'timestamp', 'hits', 'missed')
+
+    def __init__(self, track_id, detection, timestamp):
+        self.track_id = track_id
+        self.class_id = detection['class_id']
+        self.class_name = detection['class_name']
+        self.confidence = detection['confidence']
+        self.box = np.asarray(detection['bbox'], dtype=np.float64)
+        self.velocity = np.zeros(4)
+        self.timestamp = timestamp
+        self.hits = 1
+        self.missed = 0
+
+    def predict(self, timestamp):
+        return self.box + self.velocity * (timestamp - self.timestamp)
+
+    def to_dict(self, box=None, predicted=False):
+        box = self.box if box is None else box
+        return {
+            'bbox': [float(v) for v in box],
+            'confidence': self.confidence,
+            'class_id': self.class_id,
+            'class_name': self.class_name,
+            'track_id': self.track_id,
+            'predicted': predicted,
+        }
+
+
+class IoUTracker:
+    """Assign stable IDs to detections and predict boxes between detector runs"""
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, max_predict_seconds=1.0, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        # Tracks unmatched for more than max_missed detector runs are dropped
+        self.max_missed = max_missed
+        # Boxes are not extrapolated further than this past the last match
+        self.max_predict_seconds = max_predict_seconds
+        self.smoothing = smoothing
+        self.tracks = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.tracks = []
+
+    @property
+    def moving(self):
+        """True when any live track has a non-zero velocity"""
+        return any(track.missed == 0 and track.velocity.any() for track in self.tracks)
+
+    def update(self, detections, timestamp):
+        """Match a detector run (list of detection dicts) and return them with track ids"""
+        with self._lock:
+            boxes = np.array([d['bbox'] for d in detections], dtype=np.float64).reshape(-1, 4)
+            classes = np.array([d['class_id'] for d in detections], dtype=np.int64)
+            predicted = np.array([t.predict(timestamp) for t in self.tracks], dtype=np.float64).reshape(-1, 4)
+            track_classes = np.array([t.class_id for t in self.tracks], dtype=np.int64)
+
+            iou = box_iou(predicted, boxes)
+            if iou.size:
+                iou[track_classes[:, None] != classes[None, :]] = 0
+
+            matched_tracks = set()
+            assigned = [None] * len(detections)
+            # Greedy: take pairs from highest to lowest IoU
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                t, d = np.unravel_index(flat, iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or assigned[d] is not None:
+                    continue
+                matched_tracks.add(t)
+                assigned[d] = self.tracks[t]
+                self._correct(self.tracks[t], detections[d], boxes[d], timestamp)
+
+            survivors = []
+            for index, track in enumerate(self.tracks):
+                if index not in matched_tracks:
+                    track.missed += 1
+                    if track.missed > self.max_missed:
+                        continue
+                survivors.append(track)
+            self.tracks = survivors
+
+            results = []
+            for detection, track in zip(detections, assigned):
+                if track is None:
+                    track = Track(self._next_id, detection, timestamp)
+                    self._next_id += 1
+                    self.tracks.append(track)
+                results.append(dict(detection, track_id=track.track_id, predicted=False))
+            return results
+
+    def _correct(self, track, detection, box, timestamp):
+        dt = timestamp - track.timestamp
+        if dt > 0:
+            observed = (box - track.box) / dt
+            track.velocity += self.smoothing * (observed - track.velocity)
+        track.box = box
+        track.timestamp = timestamp
+        track.confidence = detection['confidence']
+        track.hits += 1
+        track.missed = 0
+
+    def predict(self, timestamp):
+        """Extrapolated boxes of the tracks matched in the last detector run"""
+        with self._lock:
+            results = []
+            for track in self.tracks:
+                if track.missed:
+                    continue
+                elapsed = min(timestamp - track.timestamp, self.max_predict_seconds)
+                box = track.box + track.velocity * max(0.0, elapsed)
+                results.append(track.to_dict(box, predicted=True))
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracks': len(self.tracks),
+                'active': sum(1 for track in self.tracks if track.missed == 0),
+                'next_id': self._next_id,
+            }
@@ -1,18 +1,32 @@
+# Imported first so startup timings start before the heavier imports below
+from model_manager import ModelManager, parse_shapes, with_input_sizes
 from flask import Flask, render_template, request, jsonify, Response
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import cv2
 import base64
-import numpy as np
-from ultralytics import YOLO
+import atexit
 import threading
 import time
-import json
-import io
-from PIL import Image
+from datetime import datetime
+
+import codec
+import config
+from adaptive_control import create_controller, parse_sizes
+from backends import load_configured_backend
+from capture_streams import MJPEG_MIMETYPE, StreamRegistry, parse_sources
+from flow_control import FrameGate
+from history_store import create_store
+from inference_pool import InferencePool
+from inference_scheduler import InferenceScheduler, SchedulerFull
+from metrics import create_registry
+from motion_gate import combined_stats, create_gate
+from postprocess import Detections, names_array
+from roi import Region, RoiSet, parse_regions
+from tracker import IoUTracker
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'yolo_detection_secret'
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", max_http_buffer_size=config.SOCKET_MAX_FRAME_BYTES)
 
 # Global variables
 model = None
@@ -20,119 +34,320 @@ detection_active = False
 latest_detections = []
 confidence_threshold = 0.5
 
-def load_model():
-    """Load YOLO model"""
+def run_batch(frames, conf):
+    """Run one batched forward pass for the inference scheduler"""
+    started = time.perf_counter()
+    # Frames are square at the controller's input size; run the model at that size
+    imgsz = max(frame.shape[0] for frame in frames)
+    results = model(frames, verbose=False, conf=conf, imgsz=imgsz)
+    model_manager.record_inference((time.perf_counter() - started) * 1000)
+    return results
+
+def on_model_ready(loaded_model):
+    """Publish the model once it is loaded and warmed up"""
     global model
+    model = loaded_model
+    annotator.preload(model.names)
+    socketio.emit('model_status', model_status())
+
+# Picks the model input size and the client frame-skip interval from measured latency
+controller = create_controller()
+
+# Loads and warms up the YOLO model in the background so the server can bind immediately;
+# every input size the controller can switch to is warmed up
+model_manager = ModelManager(
+    load_configured_backend,
+    warmup_shapes=with_input_sizes(parse_shapes(config.MODEL_WARMUP_SHAPES), controller.reachable_sizes()),
+    warmup_runs=config.MODEL_WARMUP_RUNS,
+    on_ready=on_model_ready,
+)
+
+inference_pool = None
+if config.INFERENCE_WORKERS > 0:
+    # Worker processes with their own models; frames are handed over through shared memory
+    max_size = max(parse_sizes(config.ADAPTIVE_INPUT_SIZES))
+    inference_pool = InferencePool(
+        config.INFERENCE_WORKERS,
+        load_configured_backend,
+        max_frame_bytes=max_size * max_size * 3,
+        slots_per_worker=config.INFERENCE_SLOTS_PER_WORKER,
+        max_queue_depth=config.BATCH_QUEUE_DEPTH,
+        on_ready=on_model_ready,
+    )
+    scheduler = inference_pool
+else:
+    # Central scheduler that batches frames from concurrent clients
+    scheduler = InferenceScheduler(
+        run_batch,
+        max_batch_size=config.BATCH_MAX_SIZE,
+        max_wait_ms=config.BATCH_MAX_WAIT_MS,
+        max_queue_depth=config.BATCH_QUEUE_DEPTH,
+    )
+
+def model_status():
+    """Readiness of the in-process model, or of the worker pool's models"""
+    if inference_pool is not None:
+        return inference_pool.status()
+    return model_manager.status()
+
+# At most one in-flight frame per streaming client, newest frame wins
+frame_gate = FrameGate()
+
+# Per-client object trackers; between detector runs boxes are predicted instead
+trackers = {}
+frame_counters = {}
+
+# Per-client motion gates; static frames reuse the client's previous detections
+motion_gates = {}
+previous_detections = {}
+
+# Draws boxes with cached label sprites (class names are pre-rendered once the model is ready)
+annotator = codec.Annotator()
+
+# Per-stage latency histograms, error counts and queue gauges served on /metrics
+metrics = create_registry()
+metrics.gauge('queue_depth', 'Frames waiting in the batching scheduler', lambda: scheduler.queue_depth)
+metrics.gauge('streaming_clients', 'Socket.IO clients with a frame in flight or waiting',
+              lambda: frame_gate.stats()['clients'])
+
+# Server-owned capture sources, detected once and fanned out to any number of MJPEG viewers
+streams = StreamRegistry()
+stream_subscribers = {}
+metrics.gauge('stream_viewers', 'MJPEG viewers across server-side streams', streams.total_viewers)
+
+# Every detection pass is appended to an on-disk columnar history, queryable on /api/history
+history = create_store()
+if history is not None:
+    metrics.gauge('history_pending_rows', 'Detections waiting to be written to the history',
+                  lambda: history.stats()['pending_rows'])
+    atexit.register(history.stop)
+
+# Regions of interest per source ('browser' or 'stream:<id>'); only these crops are inferred
+roi_sets = {}
+
+def load_configured_rois():
+    """Regions from YOLO_ROI_REGIONS; unscoped ones apply to the browser and every capture stream"""
     try:
-        model = YOLO('yolov8n.pt')
-        print("✅ YOLO model loaded successfully")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to load YOLO model: {e}")
-        return False
+        configured = parse_regions(config.ROI_REGIONS)
+    except ValueError as e:
+        print(f"⚠️ Ignoring YOLO_ROI_REGIONS: {e}")
+        return
+    sources = ['browser'] + [f'stream:{stream_id}' for stream_id, _ in parse_sources(config.CAPTURE_SOURCES)]
+    for source in sources + [key for key in configured if key is not None]:
+        regions = configured.get(source, configured.get(None))
+        if regions:
+            roi_sets[source] = RoiSet(regions, merge_threshold=config.ROI_MERGE_THRESHOLD)
+
+load_configured_rois()
+
+def get_tracker(client_id):
+    """Return the tracker for a client, creating it on first use"""
+    tracker = trackers.get(client_id)
+    if tracker is None:
+        tracker = trackers[client_id] = IoUTracker(
+            iou_threshold=config.TRACKING_IOU,
+            max_missed=config.TRACKING_MAX_MISSED,
+            max_predict_seconds=config.TRACKING_MAX_PREDICT_SECONDS,
+        )
+    return tracker
+
+def history_source(client_id):
+    """Source name recorded in the history: the server-side stream, or 'browser' for uploads"""
+    return client_id if client_id is not None and client_id.startswith('stream:') else 'browser'
+
+def detect_frame(frame, client_id=None, scale=1):
+    """Run detection on a BGR frame and return detections and the annotated frame.
+    
+    client_id names a continuous frame sequence (a Socket.IO sid or 'stream:<id>');
+    None is a one-off upload, which is never tracked across calls.
+    scale maps frame coordinates back to the uploaded image for the history.
+    """
+    roi_set = roi_sets.get(history_source(client_id))
+    tracker = get_tracker(client_id) if config.TRACKING_ENABLED and client_id is not None else None
+    if tracker is not None:
+        # Only every detect_every-th frame goes through the model; the rest use predicted boxes
+        counter = frame_counters.get(client_id, 0)
+        frame_counters[client_id] = counter + 1
+        if counter % controller.detect_every and tracker.tracks:
+            detections = tracker.predict(time.perf_counter())
+            return detections, annotate_frame(frame, detections, roi_set)
+    
+    # One-off uploads are unrelated images; only continuous sequences can reuse detections
+    if config.MOTION_GATE and client_id is not None:
+        gate = motion_gates.get(client_id)
+        if gate is None:
+            gate = motion_gates[client_id] = create_gate()
+        if not gate.should_infer(frame) and client_id in previous_detections:
+            detections = previous_detections[client_id]
+            return detections, annotate_frame(frame, detections, roi_set)
+    
+    size = controller.input_size
+    if roi_set:
+        # Infer only the regions; the crops are queued together (or rejected together) so they share a batch
+        with metrics.time('resize'):
+            crops = roi_set.crop(frame, size)
+        started = time.perf_counter()
+        futures = scheduler.submit_many(crops.crops, confidence_threshold)
+        results = [future.result() for future in futures]
+    else:
+        # Resize for faster processing
+        with metrics.time('resize'):
+            frame_resized = cv2.resize(frame, (size, size))
+        
+        # Run YOLO detection through the batching scheduler
+        started = time.perf_counter()
+        results = [scheduler.submit(frame_resized, confidence_threshold).result()]
+    inference_ms = (time.perf_counter() - started) * 1000
+    metrics.observe('inference', inference_ms / 1000)
+    controller.record(inference_ms, scheduler.queue_depth)
+    if client_id in motion_gates:
+        motion_gates[client_id].record_inference(inference_ms)
+    
+    # Filter and scale back to original frame size in one vectorized pass
+    with metrics.time('postprocess'):
+        if roi_set:
+            detections = roi_set.merge(crops, results, model.names, confidence_threshold, size)
+        else:
+            height, width = frame.shape[:2]
+            detections = (Detections.from_result(results[0], model.names)
+                          .filter(confidence_threshold)
+                          .rescale(width / size, height / size)
+                          .to_list())
+        if tracker is not None:
+            detections = tracker.update(detections, started)
+    if client_id is not None:
+        previous_detections[client_id] = detections
+    if history is not None:
+        history.append(codec.scale_detections(detections, scale), history_source(client_id))
+    
+    return detections, annotate_frame(frame, detections, roi_set)
+
+def annotate_frame(frame, detections, roi_set=None):
+    """Draw bounding boxes, labels and region outlines onto the decoded frame in place (it is not used afterwards)"""
+    with metrics.time('draw'):
+        if roi_set:
+            roi_set.draw(frame)
+        annotator.draw(frame, detections)
+    return frame
+
+def decode_image_bytes(image_bytes):
+    """Decode JPEG/PNG bytes to BGR, at reduced size when far wider than needed; returns (frame, scale)"""
+    return codec.decode_image(image_bytes, max_width=config.DECODE_MAX_WIDTH)
+
+def encode_jpeg(frame, quality=None):
+    """Encode a BGR frame as JPEG bytes"""
+    return codec.encode_jpeg(frame, quality)
 
 def process_frame(frame_data):
     """Process frame for object detection and return annotated frame"""
-    global model, confidence_threshold
-    
     if model is None:
         return [], frame_data
     
     try:
         # Decode base64 image
-        image_data = base64.b64decode(frame_data.split(',')[1])
-        image = Image.open(io.BytesIO(image_data))
-        frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Resize for faster processing
-        frame_resized = cv2.resize(frame, (416, 416))
-        
-        # Run YOLO detection
-        results = model(frame_resized, verbose=False, conf=confidence_threshold)
-        result = results[0]
+        with metrics.time('decode'):
+            frame, scale = decode_image_bytes(base64.b64decode(frame_data.split(',')[1]))
         
-        # Process detections
-        detections = []
-        annotated_frame = frame.copy()
+        detections, annotated_frame = detect_frame(frame, scale=scale)
+        # Report boxes in the coordinates of the uploaded image
+        detections = codec.scale_detections(detections, scale)
         
-        if result.boxes is not None:
-            boxes = result.boxes.xyxy.cpu().numpy()
-            confidences = result.boxes.conf.cpu().numpy()
-            class_ids = result.boxes.cls.cpu().numpy()
-            
-            # Scale back to original frame size
-            scale_x = frame.shape[1] / 416
-            scale_y = frame.shape[0] / 416
-            
-            for i in range(len(boxes)):
-                confidence = float(confidences[i])
-                if confidence >= confidence_threshold:
-                    # Scale bounding box coordinates
-                    x1, y1, x2, y2 = boxes[i] * [scale_x, scale_y, scale_x, scale_y]
-                    
-                    detection = {
-                        'bbox': [x1, y1, x2, y2],
-                        'confidence': confidence,
-                        'class_id': int(class_ids[i]),
-                        'class_name': model.names[int(class_ids[i])]
-                    }
-                    detections.append(detection)
-                    
-                    # Draw bounding box and label on frame
-                    annotated_frame = draw_detection_on_frame(annotated_frame, detection)
+        with metrics.time('encode'):
+            annotated_jpeg = encode_jpeg(annotated_frame)
         
         # Convert annotated frame back to base64
-        annotated_rgb = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-        annotated_pil = Image.fromarray(annotated_rgb)
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        annotated_pil.save(buffer, format='JPEG', quality=85)
-        annotated_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        annotated_data_url = f"data:image/jpeg;base64,{annotated_base64}"
+        with metrics.time('serialize'):
+            annotated_base64 = base64.b64encode(annotated_jpeg).decode('utf-8')
+            annotated_data_url = f"data:image/jpeg;base64,{annotated_base64}"
         
         return detections, annotated_data_url
         
+    except SchedulerFull:
+        raise
     except Exception as e:
+        metrics.error('detection')
         print(f"Detection error: {e}")
         return [], frame_data
 
+def process_frame_bytes(jpeg_bytes, client_id=None):
+    """Process a raw JPEG frame and return detections and annotated JPEG bytes"""
+    if model is None:
+        return [], jpeg_bytes
+    
+    try:
+        with metrics.time('decode'):
+            frame, scale = decode_image_bytes(jpeg_bytes)
+        detections, annotated_frame = detect_frame(frame, client_id, scale)
+        detections = codec.scale_detections(detections, scale)
+        with metrics.time('encode'):
+            annotated_jpeg = encode_jpeg(annotated_frame)
+        return detections, annotated_jpeg
+        
+    except SchedulerFull:
+        raise
+    except Exception as e:
+        metrics.error('detection')
+        print(f"Detection error: {e}")
+        return [], jpeg_bytes
+
+def process_stream_frame(frame, stream_id):
+    """Detect on a server-captured frame; boxes are drawn onto the frame in place"""
+    if model is None or not detection_active:
+        return [], frame
+    return detect_frame(frame, f'stream:{stream_id}')
+
+def publish_stream_detections(stream, frame):
+    """Send a stream's detections to the clients subscribed to it"""
+    if not stream_subscribers.get(stream.stream_id):
+        return
+    socketio.emit('stream_detections', {
+        'stream_id': stream.stream_id,
+        'seq': frame.seq,
+        'detections': frame.detections,
+        'count': len(frame.detections),
+        'timestamp': frame.timestamp
+    }, to=f'stream:{stream.stream_id}')
+
+streams_opened = False
+streams_lock = threading.Lock()
+
+def open_capture_streams():
+    """Open the capture sources listed in YOLO_CAPTURE_SOURCES (once, in the serving process)"""
+    global streams_opened
+    with streams_lock:
+        if streams_opened:
+            return
+        streams_opened = True
+    for stream_id, source in parse_sources(config.CAPTURE_SOURCES):
+        try:
+            streams.open(stream_id, source, process=process_stream_frame, encode=encode_jpeg,
+                         on_detections=publish_stream_detections, max_fps=config.CAPTURE_MAX_FPS)
+            print(f"📡 Stream '{stream_id}' capturing from {source}")
+        except ValueError as e:
+            print(f"⚠️ {e}")
+
 def draw_detection_on_frame(frame, detection):
     """Draw bounding box and label on frame"""
-    bbox = detection['bbox']
-    confidence = detection['confidence']
-    class_name = detection['class_name']
-    
-    # Extract coordinates
-    x1, y1, x2, y2 = map(int, bbox)
-    
-    # Ensure coordinates are within frame bounds
-    x1 = max(0, min(x1, frame.shape[1]))
-    y1 = max(0, min(y1, frame.shape[0]))
-    x2 = max(0, min(x2, frame.shape[1]))
-    y2 = max(0, min(y2, frame.shape[0]))
-    
-    # Draw bounding box with thickness based on confidence
-    thickness = max(2, int(4 * confidence))
-    color = (0, 255, 0)  # Green color
-    
-    cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
-    
-    # Prepare label text
-    label = f"{class_name}: {confidence:.2f}"
-    
-    # Get text size for background rectangle
-    font_scale = 0.7
-    thickness_text = 2
-    (text_width, text_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness_text)
-    
-    # Draw background rectangle for text
-    cv2.rectangle(frame, (x1, y1 - text_height - 10), (x1 + text_width, y1), color, -1)
-    
-    # Draw text
-    cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness_text)
-    
-    return frame
+    return annotator.draw(frame, [detection])
+
+@app.before_request
+def track_request_start():
+    """Count the request as in flight"""
+    metrics.in_flight.inc()
+
+@app.teardown_request
+def track_request_end(error=None):
+    """Request finished (or failed with an unhandled exception)"""
+    metrics.in_flight.dec()
+    if error is not None:
+        metrics.error('unhandled')
+
+@app.after_request
+def count_error_responses(response):
+    """Count 4xx/5xx responses by status code"""
+    if response.status_code >= 400:
+        metrics.error(f'http_{response.status_code}')
+    return response
 
 @app.route('/')
 def index():
@@ -142,7 +357,7 @@ def index():
 @app.route('/api/detect', methods=['POST'])
 def detect_objects():
     """API endpoint for object detection"""
-    global detection_active, latest_detections
+    global latest_detections
     
     try:
         data = request.get_json()
@@ -155,20 +370,24 @@ def detect_objects():
             detections, annotated_frame = process_frame(frame_data)
             latest_detections = detections
             
-            # Emit real-time updates via WebSocket
-            socketio.emit('detection_update', {
-                'detections': detections,
-                'count': len(detections),
-                'annotated_frame': annotated_frame,
-                'timestamp': time.time()
-            })
-            
-            return jsonify({
-                'success': True,
-                'detections': detections,
-                'count': len(detections),
-                'annotated_frame': annotated_frame
-            })
+            with metrics.time('serialize'):
+                # Emit real-time updates via WebSocket
+                socketio.emit('detection_update', {
+                    'detections': detections,
+                    'count': len(detections),
+                    'annotated_frame': annotated_frame,
+                    'timestamp': time.time()
+                })
+                
+                return jsonify({
+                    'success': True,
+                    'detections': detections,
+                    'count': len(detections),
+                    'annotated_frame': annotated_frame,
+                    'detect_every': controller.detect_every,
+                    # One-off uploads are never tracked, so the browser must keep skipping frames
+                    'tracking': False
+                })
         else:
             return jsonify({
                 'success': True,
@@ -177,6 +396,8 @@ def detect_objects():
                 'annotated_frame': frame_data
             })
             
+    except SchedulerFull as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -188,6 +409,11 @@ def toggle_detection():
     try:
         data = request.get_json()
         detection_active = data.get('active', False)
+        if not detection_active:
+            trackers.clear()
+            frame_counters.clear()
+            motion_gates.clear()
+            previous_detections.clear()
         
         socketio.emit('detection_status', {
             'active': detection_active,
@@ -231,9 +457,187 @@ def get_status():
         'detection_active': detection_active,
         'confidence_threshold': confidence_threshold,
         'model_loaded': model is not None,
-        'latest_detections': latest_detections
+        'model': model_status(),
+        'latest_detections': latest_detections,
+        'scheduler': scheduler.stats(),
+        'flow_control': frame_gate.stats(),
+        'adaptive': controller.decisions(),
+        'tracking': {client_id: tracker.stats() for client_id, tracker in list(trackers.items())},
+        'motion': combined_stats(list(motion_gates.values())),
+        'streams': [stream.status() for stream in streams.all()],
+        'rois': {source: roi_set.stats() for source, roi_set in list(roi_sets.items())}
     })
 
+@app.route('/api/rois', methods=['GET'])
+def get_rois():
+    """Regions of interest per source with per-region hits and the compute saved versus full frames"""
+    return jsonify({'sources': {source: roi_set.stats() for source, roi_set in list(roi_sets.items())}})
+
+@app.route('/api/rois', methods=['POST'])
+def set_rois():
+    """Replace the regions of one source; an empty list goes back to full-frame detection"""
+    data = request.get_json(silent=True) or {}
+    source = data.get('source', 'browser')
+    if source != 'browser' and not source.startswith('stream:'):
+        return jsonify({'error': "source must be 'browser' or 'stream:<id>'"}), 400
+    try:
+        regions = [Region.from_dict(item, f'roi{index + 1}') for index, item in enumerate(data.get('rois', []))]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid region: {e}'}), 400
+    
+    if regions:
+        roi_set = roi_sets.get(source)
+        if roi_set is None:
+            roi_set = roi_sets[source] = RoiSet(merge_threshold=config.ROI_MERGE_THRESHOLD)
+        roi_set.set_regions(regions)
+    else:
+        roi_sets.pop(source, None)
+    print(f"🎯 {source}: {len(regions)} region(s) of interest")
+    return jsonify({'success': True, 'source': source, 'rois': [region.to_dict() for region in regions]})
+
+def parse_time(value, default):
+    """Epoch seconds or an ISO 8601 timestamp from a query parameter"""
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def parse_classes(value):
+    """Class ids from a comma-separated list of class ids or names"""
+    if not value:
+        return None
+    names = model.names if model is not None else {}
+    by_name = {name: class_id for class_id, name in (names.items() if isinstance(names, dict) else enumerate(names))}
+    class_ids = []
+    for item in (item.strip() for item in value.split(',')):
+        if item.isdigit():
+            class_ids.append(int(item))
+        elif item in by_name:
+            class_ids.append(by_name[item])
+        else:
+            raise ValueError(f'Unknown class {item}')
+    return class_ids
+
+def history_range():
+    """(from, to, source ids) from the query string; defaults to the last hour of every source"""
+    end = parse_time(request.args.get('to'), time.time())
+    start = parse_time(request.args.get('from'), end - 3600)
+    sources = request.args.get('source')
+    source_ids = history.source_ids(item.strip() for item in sources.split(',')) if sources else None
+    return start, end, source_ids
+
+def history_class_names(class_ids):
+    names = names_array(model.names) if model is not None else []
+    return [names[class_id] if class_id < len(names) else str(class_id) for class_id in class_ids]
+
+def named_counts(counts):
+    return dict(zip(history_class_names(list(counts)), counts.values()))
+
+def history_disabled_response():
+    return jsonify({'error': 'Detection history is disabled (YOLO_HISTORY=false)'}), 404
+
+@app.route('/api/history')
+def get_history():
+    """Detections recorded between ?from= and ?to=, optionally filtered by ?class= and ?source="""
+    if history is None:
+        return history_disabled_response()
+    try:
+        start, end, source_ids = history_range()
+        class_ids = parse_classes(request.args.get('class'))
+        limit = min(int(request.args.get('limit', config.HISTORY_QUERY_LIMIT)), config.HISTORY_QUERY_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with metrics.time('history_query'):
+        columns, total = history.query(start, end, class_ids, source_ids, limit)
+        counts = history.class_counts(start, end, source_ids)
+        if class_ids is not None:
+            counts = {class_id: count for class_id, count in counts.items() if class_id in class_ids}
+    with metrics.time('serialize'):
+        detections = [
+            {'timestamp': timestamp, 'source': source, 'class_id': class_id, 'class_name': class_name,
+             'confidence': confidence, 'bbox': bbox}
+            for timestamp, source, class_id, class_name, confidence, bbox in zip(
+                columns['timestamp'].tolist(), columns['source_name'], columns['class_id'].tolist(),
+                history_class_names(columns['class_id'].tolist()), columns['confidence'].tolist(),
+                columns['box'].tolist())
+        ]
+        return jsonify({
+            'from': start,
+            'to': end,
+            'total': total,
+            'returned': len(detections),
+            'truncated': total > len(detections),
+            'counts': named_counts(counts),
+            'detections': detections
+        })
+
+@app.route('/api/history/counts')
+def get_history_counts():
+    """Per-class detection counts between ?from= and ?to=, optionally for ?source="""
+    if history is None:
+        return history_disabled_response()
+    try:
+        start, end, source_ids = history_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    with metrics.time('history_query'):
+        counts = history.class_counts(start, end, source_ids)
+    return jsonify({'from': start, 'to': end, 'total': sum(counts.values()), 'counts': named_counts(counts)})
+
+@app.route('/api/history/stats')
+def get_history_stats():
+    """Segments, rows, bytes and writer counters of the detection history"""
+    if history is None:
+        return history_disabled_response()
+    return jsonify(history.stats())
+
+@app.route('/api/streams')
+def list_streams():
+    """Server-side capture streams with viewer counts and stage timings"""
+    open_capture_streams()
+    return jsonify({'streams': [stream.status() for stream in streams.all()]})
+
+@app.route('/api/streams/<stream_id>/mjpeg')
+def stream_mjpeg(stream_id):
+    """Annotated frames of a server-side stream as multipart/x-mixed-replace MJPEG"""
+    open_capture_streams()
+    stream = streams.get(stream_id)
+    if stream is None:
+        return jsonify({'error': f'Unknown stream {stream_id}'}), 404
+    return Response(stream.frames(), mimetype=MJPEG_MIMETYPE,
+                    headers={'Cache-Control': 'no-cache, no-store', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/streams/<stream_id>/snapshot')
+def stream_snapshot(stream_id):
+    """Latest annotated JPEG of a server-side stream"""
+    open_capture_streams()
+    stream = streams.get(stream_id)
+    if stream is None:
+        return jsonify({'error': f'Unknown stream {stream_id}'}), 404
+    frame = stream.latest()
+    if frame is None or frame.jpeg is None:
+        return jsonify({'error': 'No frame encoded yet; open the MJPEG stream first'}), 503
+    return Response(frame.jpeg, mimetype='image/jpeg', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/metrics')
+def export_metrics():
+    """Per-stage latency histograms and gauges in Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled (YOLO_METRICS=false)'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/health')
+def health_check():
+    """Health check endpoint reporting model readiness"""
+    readiness = model_status()
+    if readiness['ready']:
+        return jsonify({'status': 'healthy', 'model': 'YOLOv8', 'readiness': readiness})
+    status = 'unhealthy' if readiness['phase'] == 'failed' else 'starting'
+    return jsonify({'status': status, 'model': 'YOLOv8', 'readiness': readiness}), 503
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
@@ -241,19 +645,132 @@ def handle_connect():
     emit('status', {
         'detection_active': detection_active,
         'confidence_threshold': confidence_threshold,
-        'model_loaded': model is not None
+        'model_loaded': model is not None,
+        'model_phase': model_status()['phase']
+    })
+
+@socketio.on('frame')
+def handle_frame(data):
+    """Handle a raw JPEG frame streamed as a binary Socket.IO event"""
+    global latest_detections
+    
+    if not isinstance(data, (bytes, bytearray)):
+        emit('detection_error', {'error': 'Frame must be sent as binary JPEG data'})
+        return
+    
+    if not detection_active:
+        emit('detection_result', {
+            'detections': [],
+            'count': 0,
+            'frame': None,
+            'timestamp': time.time()
+        })
+        return
+    
+    sid = request.sid
+    frame = frame_gate.offer(sid, bytes(data))
+    if frame is None:
+        # A frame is already in flight: this one waits in the latest slot
+        emit('flow_control', {
+            'paused': True,
+            'dropped': frame_gate.dropped(sid),
+            'timestamp': time.time()
+        })
+        return
+    
+    # Process this frame, then whatever replaced it in the latest slot meanwhile
+    while frame is not None:
+        metrics.in_flight.inc()
+        try:
+            detections, annotated_jpeg = process_frame_bytes(frame, sid)
+        except SchedulerFull as e:
+            detections, annotated_jpeg = None, None
+            metrics.error('scheduler_full')
+            emit('detection_error', {'error': str(e)})
+        finally:
+            metrics.in_flight.dec()
+        
+        frame = frame_gate.finish(sid)
+        if detections is None:
+            continue
+        
+        latest_detections = detections
+        
+        # Reply on the same connection with the annotated frame as binary data
+        with metrics.time('serialize'):
+            emit('detection_result', {
+                'detections': detections,
+                'count': len(detections),
+                'frame': annotated_jpeg,
+                'dropped': frame_gate.dropped(sid),
+                'busy': frame is not None,
+                'detect_every': controller.detect_every,
+                'tracking': config.TRACKING_ENABLED,
+                'timestamp': time.time()
+            })
+    
+    emit('flow_control', {
+        'paused': False,
+        'dropped': frame_gate.dropped(sid),
+        'timestamp': time.time()
     })
 
+@socketio.on('subscribe_stream')
+def handle_subscribe_stream(data):
+    """Receive stream_detections events for a server-side stream"""
+    stream_id = str((data or {}).get('stream_id', ''))
+    open_capture_streams()
+    stream = streams.get(stream_id)
+    if stream is None:
+        emit('detection_error', {'error': f'Unknown stream {stream_id}'})
+        return
+    join_room(f'stream:{stream_id}')
+    subscribers = stream_subscribers.setdefault(stream_id, set())
+    subscribers.add(request.sid)
+    stream.set_subscribers(len(subscribers))
+
+@socketio.on('unsubscribe_stream')
+def handle_unsubscribe_stream(data):
+    """Stop receiving a server-side stream's detections"""
+    stream_id = str((data or {}).get('stream_id', ''))
+    leave_room(f'stream:{stream_id}')
+    unsubscribe_stream(stream_id, request.sid)
+
+def unsubscribe_stream(stream_id, sid):
+    subscribers = stream_subscribers.get(stream_id)
+    if subscribers is None:
+        return
+    subscribers.discard(sid)
+    stream = streams.get(stream_id)
+    if stream is not None:
+        stream.set_subscribers(len(subscribers))
+
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
+    frame_gate.remove(request.sid)
+    for stream_id in list(stream_subscribers):
+        unsubscribe_stream(stream_id, request.sid)
+    trackers.pop(request.sid, None)
+    frame_counters.pop(request.sid, None)
+    motion_gates.pop(request.sid, None)
+    previous_detections.pop(request.sid, None)
     print(f"Client disconnected: {request.sid}")
 
 if __name__ == '__main__':
-    # Load YOLO model
-    if load_model():
-        print("🚀 Starting YOLO Web Detection Server...")
-        print("📱 Open your browser and go to: http://localhost:5000")
-        socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    # Load YOLO model in the background; /api/health reports progress
+    if inference_pool is not None:
+        inference_pool.start()
+        print(f"🧮 {inference_pool.num_workers} inference worker processes, "
+              f"{inference_pool.slots_per_worker} shared-memory slots each")
     else:
-        print("❌ Failed to start server - YOLO model not loaded")
+        model_manager.start()
+        scheduler.start()
+        print(f"🧮 Batching up to {scheduler.max_batch_size} frames, flushing after {scheduler.max_wait_ms:.0f} ms")
+        # With worker processes the in-process model is never loaded, so it has no timeline
+        model_manager.mark_listening()
+    print("🚀 Starting YOLO Web Detection Server...")
+    print("📱 Open your browser and go to: http://localhost:5000")
+    # The reloader would run this block again in a child process, starting a second
+    # set of worker processes (or a second model load) and shared-memory slots
+    socketio.run(app, debug=True, use_reloader=False, host='0.0.0.0', port=5000)